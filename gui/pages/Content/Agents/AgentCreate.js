@@ -42,7 +42,7 @@ export default function AgentCreate({sendAgentData, selectedProjectId, fetchAgen
   const modelRef = useRef(null);
   const [modelDropdown, setModelDropdown] = useState(false);
 
-  const agentTypes = ["Don't Maintain Task Queue", "Maintain Task Queue"]
+  const agentTypes = ["Don't Maintain Task Queue", "Maintain Task Queue", "Parallel Tool Calls"]
   const [agentType, setAgentType] = useState(agentTypes[0]);
   const agentRef = useRef(null);
   const [agentDropdown, setAgentDropdown] = useState(false);
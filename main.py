@@ -26,6 +26,7 @@ from superagi.controllers.agent_template import router as agent_template_router
 from superagi.controllers.agent_workflow import router as agent_workflow_router
 from superagi.controllers.budget import router as budget_router
 from superagi.controllers.config import router as config_router
+from superagi.controllers.model_api_key import router as model_api_key_router
 from superagi.controllers.organisation import router as organisation_router
 from superagi.controllers.project import router as project_router
 from superagi.controllers.resources import router as resources_router
@@ -97,6 +98,7 @@ app.include_router(tool_config_router, prefix="/tool_configs")
 app.include_router(config_router, prefix="/configs")
 app.include_router(agent_template_router, prefix="/agent_templates")
 app.include_router(agent_workflow_router, prefix="/agent_workflows")
+app.include_router(model_api_key_router, prefix="/model_api_keys")
 
 
 # in production you can use Settings management
@@ -173,6 +175,37 @@ async def startup_event():
         first_step.next_step_id = first_step.id
         session.commit()
 
+    def build_multi_tool_agent():
+        agent_workflow = session.query(AgentWorkflow).filter(
+            AgentWorkflow.name == "Goal Based Agent With Parallel Tools").first()
+
+        if agent_workflow is None:
+            agent_workflow = AgentWorkflow(name="Goal Based Agent With Parallel Tools",
+                                           description="Goal based agent running independent tool calls concurrently")
+            session.add(agent_workflow)
+            session.commit()
+
+        first_step = session.query(AgentWorkflowStep).filter(AgentWorkflowStep.unique_id == "gbp1").first()
+        output = AgentPromptBuilder.get_super_agi_multi_tool_prompt()
+        completion_prompt = "Determine which next tools to use, and respond using the format specified above:"
+        if first_step is None:
+            first_step = AgentWorkflowStep(unique_id="gbp1",
+                                           prompt=output["prompt"], variables=str(output["variables"]),
+                                           agent_workflow_id=agent_workflow.id, output_type="tools",
+                                           step_type="TRIGGER",
+                                           history_enabled=True,
+                                           completion_prompt=completion_prompt)
+            session.add(first_step)
+            session.commit()
+        else:
+            first_step.prompt = output["prompt"]
+            first_step.variables = str(output["variables"])
+            first_step.output_type = "tools"
+            first_step.completion_prompt = completion_prompt
+            session.commit()
+        first_step.next_step_id = first_step.id
+        session.commit()
+
     def build_task_based_agents():
         agent_workflow = session.query(AgentWorkflow).filter(AgentWorkflow.name == "Task Queue Agent With Seed").first()
         if agent_workflow is None:
@@ -257,6 +290,7 @@ async def startup_event():
         logger.info("Successfully registered local toolkits for all Organisations!")
 
     build_single_step_agent()
+    build_multi_tool_agent()
     build_task_based_agents()
     check_toolkit_registration()
     session.close()
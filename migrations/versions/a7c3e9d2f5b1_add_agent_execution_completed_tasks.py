@@ -0,0 +1,36 @@
+"""add agent execution completed tasks
+
+Revision ID: a7c3e9d2f5b1
+Revises: e2b6d8f4a1c9
+Create Date: 2023-06-22 14:18:37.190224
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7c3e9d2f5b1'
+down_revision = 'e2b6d8f4a1c9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('agent_execution_completed_tasks',
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('agent_execution_id', sa.Integer(), nullable=True),
+    sa.Column('task', sa.Text(), nullable=True),
+    sa.Column('response', sa.Text(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_agent_execution_completed_tasks_agent_execution_id'),
+                    'agent_execution_completed_tasks', ['agent_execution_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_agent_execution_completed_tasks_agent_execution_id'),
+                  table_name='agent_execution_completed_tasks')
+    op.drop_table('agent_execution_completed_tasks')
@@ -0,0 +1,24 @@
+"""add agent execution feeds created at index
+
+Revision ID: b3d5f7a9c1e2
+Revises: a7c3e9d2f5b1
+Create Date: 2023-06-23 10:42:15.583019
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'b3d5f7a9c1e2'
+down_revision = 'a7c3e9d2f5b1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_agent_execution_feeds_agent_execution_id_created_at', 'agent_execution_feeds',
+                    ['agent_execution_id', 'created_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_agent_execution_feeds_agent_execution_id_created_at', table_name='agent_execution_feeds')
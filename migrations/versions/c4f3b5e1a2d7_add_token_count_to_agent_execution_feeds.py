@@ -0,0 +1,24 @@
+"""add token count to agent execution feeds
+
+Revision ID: c4f3b5e1a2d7
+Revises: 7a3e336c0fba
+Create Date: 2023-06-20 10:12:41.318402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f3b5e1a2d7'
+down_revision = '7a3e336c0fba'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('agent_execution_feeds', sa.Column('token_count', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('agent_execution_feeds', 'token_count')
@@ -0,0 +1,40 @@
+"""add hot path indexes
+
+Revision ID: c8e2a4f6b0d3
+Revises: b3d5f7a9c1e2
+Create Date: 2023-06-23 16:05:48.271936
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c8e2a4f6b0d3'
+down_revision = 'b3d5f7a9c1e2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_agent_configurations_agent_id_key', 'agent_configurations', ['agent_id', 'key'],
+                    unique=False)
+    op.create_index('ix_agent_execution_feeds_agent_execution_id_role_created_at', 'agent_execution_feeds',
+                    ['agent_execution_id', 'role', 'created_at'], unique=False)
+    op.create_index(op.f('ix_agent_execution_permissions_agent_execution_id'), 'agent_execution_permissions',
+                    ['agent_execution_id'], unique=False)
+    op.create_index(op.f('ix_tools_toolkit_id'), 'tools', ['toolkit_id'], unique=False)
+    op.create_index('ix_tool_configs_toolkit_id_key', 'tool_configs', ['toolkit_id', 'key'], unique=False)
+    op.create_index('ix_agent_workflow_steps_agent_workflow_id_step_type', 'agent_workflow_steps',
+                    ['agent_workflow_id', 'step_type'], unique=False)
+    op.create_index(op.f('ix_resources_agent_id'), 'resources', ['agent_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_resources_agent_id'), table_name='resources')
+    op.drop_index('ix_agent_workflow_steps_agent_workflow_id_step_type', table_name='agent_workflow_steps')
+    op.drop_index('ix_tool_configs_toolkit_id_key', table_name='tool_configs')
+    op.drop_index(op.f('ix_tools_toolkit_id'), table_name='tools')
+    op.drop_index(op.f('ix_agent_execution_permissions_agent_execution_id'),
+                  table_name='agent_execution_permissions')
+    op.drop_index('ix_agent_execution_feeds_agent_execution_id_role_created_at', table_name='agent_execution_feeds')
+    op.drop_index('ix_agent_configurations_agent_id_key', table_name='agent_configurations')
@@ -0,0 +1,36 @@
+"""add model api keys
+
+Revision ID: d4f6a8c0e2b5
+Revises: c8e2a4f6b0d3
+Create Date: 2023-06-24 11:42:09.318420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f6a8c0e2b5'
+down_revision = 'c8e2a4f6b0d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('model_api_keys',
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('organisation_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('value', sa.Text(), nullable=True),
+    sa.Column('models', sa.String(), nullable=True),
+    sa.Column('weight', sa.Integer(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_model_api_keys_organisation_id'), 'model_api_keys', ['organisation_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_model_api_keys_organisation_id'), table_name='model_api_keys')
+    op.drop_table('model_api_keys')
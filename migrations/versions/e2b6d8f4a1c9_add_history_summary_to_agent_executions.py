@@ -0,0 +1,26 @@
+"""add history summary to agent executions
+
+Revision ID: e2b6d8f4a1c9
+Revises: c4f3b5e1a2d7
+Create Date: 2023-06-21 09:41:12.502811
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2b6d8f4a1c9'
+down_revision = 'c4f3b5e1a2d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('agent_executions', sa.Column('history_summary', sa.Text(), nullable=True))
+    op.add_column('agent_executions', sa.Column('last_summarized_feed_id', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('agent_executions', 'last_summarized_feed_id')
+    op.drop_column('agent_executions', 'history_summary')
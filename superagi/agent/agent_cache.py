@@ -0,0 +1,119 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+from superagi.models.agent import Agent
+from superagi.models.agent_workflow_step import AgentWorkflowStep
+
+REDIS_KEY_PREFIX = "agent_config_version"
+
+
+class AgentConfigCache:
+    """
+    Process level cache of the parsed agent configurations. Every agent has a version counter in redis
+    that the writes of its configuration bump, a configuration cached under an older version is read
+    again from the database, so the changes are seen by all workers on their next iteration.
+    """
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+    _max_entries = int(get_config("AGENT_CONFIG_CACHE_SIZE", 1000))
+    _db = None
+
+    @classmethod
+    def get_db(cls) -> redis.Redis:
+        if cls._db is None:
+            cls._db = redis.Redis.from_url("redis://" + get_config("REDIS_URL") + "/0", decode_responses=True)
+        return cls._db
+
+    @staticmethod
+    def _key(agent_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}:{agent_id}"
+
+    @classmethod
+    def get_configuration(cls, session, agent_id: int) -> dict:
+        """
+        Returns the parsed configuration of an agent, see `Agent.fetch_configuration`. The configuration
+        is a copy the caller is free to change.
+
+        Args:
+            session (Session): The database session.
+            agent_id (int): The id of the agent.
+
+        Returns:
+            dict: The parsed agent configuration.
+        """
+        try:
+            version = cls.get_db().get(cls._key(agent_id)) or "0"
+        except Exception as exception:
+            logger.warning(f"Unable to read the configuration version of agent {agent_id}: {exception}")
+            return Agent.fetch_configuration(session, agent_id)
+
+        with cls._lock:
+            entry = cls._entries.get(agent_id)
+            if entry is not None and entry[0] == version:
+                cls._entries.move_to_end(agent_id)
+                return copy.deepcopy(entry[1])
+
+        parsed_config = Agent.fetch_configuration(session, agent_id)
+        with cls._lock:
+            cls._entries[agent_id] = (version, copy.deepcopy(parsed_config))
+            cls._entries.move_to_end(agent_id)
+            while len(cls._entries) > cls._max_entries:
+                cls._entries.popitem(last=False)
+        return parsed_config
+
+    @classmethod
+    def invalidate(cls, agent_id: int):
+        """Bumps the configuration version of an agent, to be called once a change of its configuration is committed."""
+        with cls._lock:
+            cls._entries.pop(agent_id, None)
+        try:
+            cls.get_db().incr(cls._key(agent_id))
+        except Exception as exception:
+            logger.warning(f"Unable to bump the configuration version of agent {agent_id}: {exception}")
+
+
+class AgentWorkflowGraph:
+    """
+    The steps of an agent workflow, read in one query and kept for the life of the process so that
+    following `next_step_id` needs no database round trip. Workflows are only written by the seeding
+    at startup.
+
+    Attributes:
+        agent_workflow_id (int): The id of the agent workflow.
+        steps (Dict[int, AgentWorkflowStep]): The steps of the workflow by id, detached from any session.
+    """
+    _graphs: Dict[int, "AgentWorkflowGraph"] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, agent_workflow_id: int, steps: Dict[int, AgentWorkflowStep]):
+        self.agent_workflow_id = agent_workflow_id
+        self.steps = steps
+
+    @classmethod
+    def get(cls, session, agent_workflow_id: int) -> "AgentWorkflowGraph":
+        """Returns the compiled graph of a workflow, reading its steps on first use."""
+        graph = cls._graphs.get(agent_workflow_id)
+        if graph is None:
+            workflow_steps = session.query(AgentWorkflowStep).filter(
+                AgentWorkflowStep.agent_workflow_id == agent_workflow_id).all()
+            # transient copies, so the cached steps never expire with the session that read them
+            steps = {step.id: AgentWorkflowStep(**{column.name: getattr(step, column.name)
+                                                   for column in AgentWorkflowStep.__table__.columns})
+                     for step in workflow_steps}
+            graph = cls(agent_workflow_id, steps)
+            with cls._lock:
+                cls._graphs[agent_workflow_id] = graph
+        return graph
+
+    def get_step(self, step_id: int) -> Optional[AgentWorkflowStep]:
+        return self.steps.get(step_id)
+
+    def get_next_step(self, step_id: int) -> Optional[AgentWorkflowStep]:
+        step = self.steps.get(step_id)
+        return self.steps.get(step.next_step_id) if step is not None else None
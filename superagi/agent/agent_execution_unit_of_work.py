@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from superagi.lib.tracing import trace_span
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+
+
+class AgentExecutionUnitOfWork:
+    """
+    Write-behind buffer of the state produced by agent iterations. Feeds, call/token increments and
+    execution field updates are collected in memory and written in a single transaction by `flush`,
+    with one bulk insert for the feeds and one atomic update of the execution row.
+
+    Attributes:
+        agent_execution_id (int): The id of the agent execution.
+        agent_id (int): The id of the agent.
+        feeds (list): The feed rows to insert, in order.
+        calls (int): The number of llm calls to add to the execution.
+        tokens (int): The number of tokens to add to the execution.
+        execution_fields (dict): The execution columns to set, like status or current_step_id.
+    """
+
+    def __init__(self, agent_execution_id: int, agent_id: int):
+        self.agent_execution_id = agent_execution_id
+        self.agent_id = agent_id
+        self.reset()
+
+    def reset(self):
+        self.feeds = []
+        self.calls = 0
+        self.tokens = 0
+        self.execution_fields = {}
+
+    def add_feed(self, feed: str, role: str, token_count: int = None):
+        """
+        Adds a feed of the execution.
+
+        Args:
+            feed (str): The feed content.
+            role (str): The role of the feed, 'system', 'user' or 'assistant'.
+            token_count (int): The number of tokens of the feed content.
+        """
+        self.feeds.append({"agent_execution_id": self.agent_execution_id, "agent_id": self.agent_id,
+                           "feed": feed, "role": role, "token_count": token_count})
+
+    def add_usage(self, calls: int, tokens: int):
+        """
+        Adds llm calls and tokens to the counters of the execution.
+
+        Args:
+            calls (int): The number of llm calls.
+            tokens (int): The number of tokens.
+        """
+        self.calls += calls
+        self.tokens += tokens
+
+    def set_execution_fields(self, **fields):
+        """Sets columns of the execution, e.g. `set_execution_fields(status="COMPLETED")`."""
+        self.execution_fields.update(fields)
+
+    def is_empty(self) -> bool:
+        return len(self.feeds) == 0 and self.calls == 0 and self.tokens == 0 and len(self.execution_fields) == 0
+
+    @trace_span("persistence")
+    def flush(self, session):
+        """
+        Writes the buffered state in one transaction and empties the buffer.
+
+        Args:
+            session (Session): The database session.
+        """
+        if self.is_empty():
+            return
+        if len(self.feeds) > 0:
+            # explicit, strictly increasing timestamps keep the feeds ordered as they were added
+            created_at = datetime.utcnow()
+            for index, feed in enumerate(self.feeds):
+                feed["created_at"] = feed["updated_at"] = created_at + timedelta(microseconds=index)
+            session.execute(insert(AgentExecutionFeed.__table__), self.feeds)
+        values = dict(self.execution_fields)
+        if self.calls != 0:
+            values[AgentExecution.num_of_calls] = AgentExecution.num_of_calls + self.calls
+        if self.tokens != 0:
+            values[AgentExecution.num_of_tokens] = AgentExecution.num_of_tokens + self.tokens
+        if len(values) > 0:
+            session.query(AgentExecution).filter(AgentExecution.id == self.agent_execution_id) \
+                .update(values, synchronize_session=False)
+        session.commit()
+        self.reset()
@@ -1,17 +1,23 @@
 import json
 import re
+import threading
+from collections import OrderedDict
 
 from pydantic.types import List
 
+from superagi.config.config import get_config
 from superagi.helper.prompt_reader import PromptReader
+from superagi.helper.prompt_template import PromptTemplate
 from superagi.helper.token_counter import TokenCounter
-from superagi.lib.logger import logger
 from superagi.tools.base_tool import BaseTool
 
 FINISH_NAME = "finish"
 
 
 class AgentPromptBuilder:
+    _tools_string_cache = OrderedDict()
+    _tools_string_cache_lock = threading.Lock()
+    _tools_string_cache_size = int(get_config("TOOLS_PROMPT_CACHE_SIZE", 128))
 
     @staticmethod
     def add_list_items_to_string(items: List[str]) -> str:
@@ -23,8 +29,37 @@ class AgentPromptBuilder:
 
     @classmethod
     def add_tools_to_prompt(cls, tools: List[BaseTool], add_finish: bool = True) -> str:
+        """
+        Returns the numbered tool catalog of the prompt. Building it generates the json schema of every
+        tool, so catalogs are cached by the tools they list and the finish flag.
+
+        Args:
+            tools (List[BaseTool]): The tools to list.
+            add_finish (bool): Whether to add the finish tool to the catalog.
+
+        Returns:
+            str: The tool catalog.
+        """
+        key = (tuple(cls._tool_cache_key(tool) for tool in tools), add_finish)
+        with cls._tools_string_cache_lock:
+            tools_string = cls._tools_string_cache.get(key)
+            if tools_string is not None:
+                cls._tools_string_cache.move_to_end(key)
+                return tools_string
+        tools_string = cls._build_tools_string(tools, add_finish)
+        with cls._tools_string_cache_lock:
+            cls._tools_string_cache[key] = tools_string
+            while len(cls._tools_string_cache) > cls._tools_string_cache_size:
+                cls._tools_string_cache.popitem(last=False)
+        return tools_string
+
+    @classmethod
+    def _tool_cache_key(cls, tool: BaseTool):
+        return type(tool), tool.name, tool.description, getattr(tool, "args_schema", None)
+
+    @classmethod
+    def _build_tools_string(cls, tools: List[BaseTool], add_finish: bool = True) -> str:
         final_string = ""
-        print(tools)
         for i, item in enumerate(tools):
             final_string += f"{i + 1}. {cls._generate_command_string(item)}\n"
         finish_description = (
@@ -79,6 +114,27 @@ class AgentPromptBuilder:
                                                                                      formatted_response_format)
         return {"prompt": super_agi_prompt, "variables": ["goals", "instructions", "constraints", "tools"]}
 
+    @classmethod
+    def get_super_agi_multi_tool_prompt(cls):
+        response_format = {
+            "thoughts": {
+                "text": "thought",
+                "reasoning": "reasoning",
+                "plan": "- short bulleted\n- list that conveys\n- long-term plan",
+                "criticism": "constructive self-criticism",
+                "speak": "thoughts summary to say to user",
+            },
+            "tools": [{"name": "tool name/task name", "description": "tool or task description",
+                       "args": {"arg name": "value"}}]
+        }
+        formatted_response_format = json.dumps(response_format, indent=4)
+
+        super_agi_prompt = PromptReader.read_agent_prompt(__file__, "superagi_multi_tool.txt")
+
+        super_agi_prompt = AgentPromptBuilder.clean_prompt(super_agi_prompt).replace("{response_format}",
+                                                                                     formatted_response_format)
+        return {"prompt": super_agi_prompt, "variables": ["goals", "instructions", "constraints", "tools"]}
+
     @classmethod
     def start_task_based(cls):
         super_agi_prompt = PromptReader.read_agent_prompt(__file__, "initialize_tasks.txt")
@@ -110,53 +166,53 @@ class AgentPromptBuilder:
         return {"prompt": AgentPromptBuilder.clean_prompt(super_agi_prompt),
                 "variables": ["goals", "instructions", "last_task", "last_task_result", "pending_tasks"]}
 
+    @classmethod
+    def summarize_history(cls):
+        super_agi_prompt = PromptReader.read_agent_prompt(__file__, "summarize_history.txt")
+        return {"prompt": AgentPromptBuilder.clean_prompt(super_agi_prompt),
+                "variables": ["previous_summary", "new_messages"]}
+
     @classmethod
     def replace_main_variables(cls, super_agi_prompt: str, goals: List[str], instructions: List[str], constraints: List[str],
                                tools: List[BaseTool], add_finish_tool: bool = True):
-        super_agi_prompt = super_agi_prompt.replace("{goals}", AgentPromptBuilder.add_list_items_to_string(goals))
+        template = PromptTemplate.compile(super_agi_prompt)
+        values = {"goals": AgentPromptBuilder.add_list_items_to_string(goals)}
         if len(instructions) > 0 and len(instructions[0]) > 0:
             task_str = "INSTRUCTION(Follow these instruction to decide the flow of execution and decide the next steps for achieving the task):"
-            super_agi_prompt = super_agi_prompt.replace("{instructions}", "INSTRUCTION: " + '\n' +  AgentPromptBuilder.add_list_items_to_string(instructions))
-            super_agi_prompt = super_agi_prompt.replace("{task_instructions}", task_str + '\n' +  AgentPromptBuilder.add_list_items_to_string(instructions))
+            values["instructions"] = "INSTRUCTION: " + '\n' + AgentPromptBuilder.add_list_items_to_string(instructions)
+            values["task_instructions"] = task_str + '\n' + AgentPromptBuilder.add_list_items_to_string(instructions)
         else:
-            super_agi_prompt = super_agi_prompt.replace("{instructions}", '')
-        super_agi_prompt = super_agi_prompt.replace("{constraints}",
-                                                    AgentPromptBuilder.add_list_items_to_string(constraints))
-        
-    
-        logger.info(tools)
-        tools_string = AgentPromptBuilder.add_tools_to_prompt(tools, add_finish_tool)
-        super_agi_prompt = super_agi_prompt.replace("{tools}", tools_string)
-        return super_agi_prompt
+            values["instructions"] = ''
+        values["constraints"] = AgentPromptBuilder.add_list_items_to_string(constraints)
+        if "tools" in template.variables:
+            values["tools"] = AgentPromptBuilder.add_tools_to_prompt(tools, add_finish_tool)
+        return template.render(values)
 
     @classmethod
     def replace_task_based_variables(cls, super_agi_prompt: str, current_task: str, last_task: str,
                                      last_task_result: str, pending_tasks: List[str], completed_tasks: list, token_limit: int):
-        if "{current_task}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{current_task}", current_task)
-        if "{last_task}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{last_task}", last_task)
-        if "{last_task_result}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{last_task_result}", last_task_result)
-        if "{pending_tasks}" in super_agi_prompt:
-            super_agi_prompt = super_agi_prompt.replace("{pending_tasks}", str(pending_tasks))
+        template = PromptTemplate.compile(super_agi_prompt)
+        values = {"current_task": current_task, "last_task": last_task, "last_task_result": last_task_result,
+                  "pending_tasks": str(pending_tasks)}
 
         completed_tasks.reverse()
-        if "{completed_tasks}" in super_agi_prompt:
+        if "completed_tasks" in template.variables:
             completed_tasks_arr = []
             for task in completed_tasks:
                 completed_tasks_arr.append(task['task'])
-            super_agi_prompt = super_agi_prompt.replace("{completed_tasks}", str(completed_tasks_arr))
+            values["completed_tasks"] = str(completed_tasks_arr)
 
-        base_token_limit = TokenCounter.count_message_tokens([{"role": "user", "content": super_agi_prompt}])
-        pending_tokens = token_limit - base_token_limit
-        final_output = ""
-        if "{task_history}" in super_agi_prompt:
+        if "task_history" in template.variables:
+            base_token_limit = TokenCounter.count_message_tokens([{"role": "user", "content": template.render(values)}])
+            pending_tokens = token_limit - base_token_limit
+            final_output = ""
+            token_count = TokenCounter.tokens_per_message() + 3
             for task in reversed(completed_tasks[-10:]):
-                final_output = f"Task: {task['task']}\nResult: {task['response']}\n" + final_output
-                token_count = TokenCounter.count_message_tokens([{"role": "user", "content": final_output}])
+                task_output = f"Task: {task['task']}\nResult: {task['response']}\n"
+                final_output = task_output + final_output
+                token_count += TokenCounter.count_content_tokens(task_output)
                 # giving buffer of 100 tokens
                 if token_count > min(600, pending_tokens):
                     break
-            super_agi_prompt = super_agi_prompt.replace("{task_history}", "\n" + final_output + "\n")
-        return super_agi_prompt
+            values["task_history"] = "\n" + final_output + "\n"
+        return template.render(values)
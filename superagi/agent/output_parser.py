@@ -2,8 +2,8 @@ import json
 from abc import ABC, abstractmethod
 from typing import Dict, NamedTuple, List
 import re
-import json5
 from superagi.helper.json_cleaner import JsonCleaner
+from superagi.helper.tolerant_json_parser import TolerantJsonParser
 from superagi.lib.logger import logger
 
 
@@ -22,19 +22,123 @@ class BaseOutputParser(ABC):
     def parse(self, text: str) -> AgentGPTAction:
         """Return AgentGPTAction"""
 
+    def parse_actions(self, text: str) -> List[AgentGPTAction]:
+        """Return the list of AgentGPTAction of a reply, replies hold a single tool call by default"""
+        return [self.parse(text)]
+
+
+
+class StreamingToolCallParser:
+    """
+    Incremental parser for streamed agent replies. It follows the json structure of the reply as
+    deltas arrive and reports the tool call as soon as `tool.name` and the complete `tool.args`
+    object have been emitted, without waiting for the fields that trail them.
+
+    Attributes:
+        text (str): The reply received so far.
+        action (AgentGPTAction): The detected tool call, None until it is complete.
+    """
+
+    def __init__(self):
+        self.text = ""
+        self.action = None
+        self._position = 0
+        self._frames = []
+        self._in_string = False
+        self._escaped = False
+        self._string_start = None
+        self._tool_name = None
+        self._args = None
+        self._args_start = None
+        self._failed = False
+
+    def feed(self, delta: str):
+        """
+        Adds a streamed delta to the reply.
+
+        Args:
+            delta (str): The text received from the llm.
+
+        Returns:
+            AgentGPTAction: The tool call when this delta completed it, None otherwise.
+        """
+        self.text += delta
+        if self.action is not None or self._failed:
+            return None
+        while self._position < len(self.text):
+            try:
+                self._consume(self._position, self.text[self._position])
+            except ValueError:
+                # the full reply is still parsed once the stream ends, only the early detection is given up
+                self._failed = True
+                return None
+            self._position += 1
+            if self.action is not None:
+                return self.action
+        return None
+
+    def _path(self):
+        return [frame["parent_key"] for frame in self._frames[1:]]
+
+    def _consume(self, index: int, char: str):
+        if self._in_string:
+            if self._escaped:
+                self._escaped = False
+            elif char == "\\":
+                self._escaped = True
+            elif char == '"':
+                self._in_string = False
+                self._close_string(self.text[self._string_start:index + 1])
+            return
+        if len(self._frames) == 0:
+            if char == "{":
+                self._frames.append({"type": "object", "parent_key": None, "key": None, "expect": "key"})
+            return
+        frame = self._frames[-1]
+        if char == '"':
+            self._in_string = True
+            self._string_start = index
+        elif char in "{[":
+            parent_key = frame["key"] if frame["type"] == "object" else None
+            self._frames.append({"type": "object" if char == "{" else "array", "parent_key": parent_key,
+                                 "key": None, "expect": "key"})
+            if char == "{" and self._path() == ["tool", "args"]:
+                self._args_start = index
+        elif char in "}]":
+            path = self._path()
+            self._frames.pop()
+            if path == ["tool", "args"] and self._args_start is not None:
+                self._args = self._load(self.text[self._args_start:index + 1])
+            if path == ["tool"] and self._tool_name is not None and self._args is None:
+                self._args = {}
+            if self._tool_name is not None and self._args is not None:
+                self.action = AgentGPTAction(name=self._tool_name, args=self._args)
+        elif char == ":" and frame["type"] == "object":
+            frame["expect"] = "value"
+        elif char == "," and frame["type"] == "object":
+            frame["expect"] = "key"
+
+    def _close_string(self, raw: str):
+        frame = self._frames[-1]
+        value = self._load(raw)
+        if frame["type"] == "object" and frame["expect"] == "key":
+            frame["key"] = value
+        elif self._path() == ["tool"] and frame["key"] == "name":
+            self._tool_name = value
+            if self._args is not None:
+                self.action = AgentGPTAction(name=self._tool_name, args=self._args)
+
+    @staticmethod
+    def _load(raw: str):
+        return TolerantJsonParser.loads(raw)
 
 
 class AgentOutputParser(BaseOutputParser):
     def parse(self, text: str) -> AgentGPTAction:
-        try:
-            logger.info(text)
-            text = JsonCleaner.check_and_clean_json(text)
-            parsed = json5.loads(text)
-        except json.JSONDecodeError:
-            return AgentGPTAction(
-                name="ERROR",
-                args={"error": f"Could not parse invalid json: {text}"},
-            )
+        logger.info(text)
+        return self._parse_action(TolerantJsonParser.loads(text))
+
+    def _parse_action(self, parsed) -> AgentGPTAction:
         try:
             format_prefix_yellow = "\033[93m\033[1m"
             format_suffix_yellow = "\033[0m\033[0m"
@@ -72,6 +176,30 @@ class AgentOutputParser(BaseOutputParser):
                 name="ERROR", args={"error": f"Incomplete tool args: {parsed}"}
             )
 
+    def parse_actions(self, text: str) -> List[AgentGPTAction]:
+        """
+        Parses a reply that may hold several independent tool calls in a "tools" list, replies using
+        the single "tool" format are parsed with `parse`.
+
+        Args:
+            text (str): The reply of the llm.
+
+        Returns:
+            List[AgentGPTAction]: The tool calls of the reply.
+        """
+        logger.info(text)
+        parsed = TolerantJsonParser.loads(text)
+        if not isinstance(parsed, dict) or not isinstance(parsed.get("tools"), list):
+            return [self._parse_action(parsed)]
+        actions = []
+        for tool in parsed["tools"]:
+            if not isinstance(tool, dict) or "name" not in tool:
+                actions.append(AgentGPTAction(name="ERROR", args={"error": f"Incomplete tool args: {tool}"}))
+                continue
+            logger.info("Tool: " + str(tool["name"]))
+            actions.append(AgentGPTAction(name=tool["name"], args=tool.get("args", {})))
+        return actions
+
     def parse_tasks(self, text: str) -> AgentTasks:
         try:
             parsed = json.loads(text, strict=False)
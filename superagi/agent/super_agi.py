@@ -3,24 +3,31 @@
 # agent can run the task queue as well with long term memory
 from __future__ import annotations
 
+import json
 import time
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import accumulate
 from typing import Any, Dict
 from typing import Tuple
 
 from halo import Halo
 from pydantic import ValidationError
 from pydantic.types import List
-from sqlalchemy import desc, asc
+from sqlalchemy import desc, asc, insert, tuple_
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, scoped_session
 
+from superagi.agent.agent_execution_unit_of_work import AgentExecutionUnitOfWork
 from superagi.agent.agent_prompt_builder import AgentPromptBuilder
-from superagi.agent.output_parser import BaseOutputParser, AgentOutputParser
+from superagi.agent.output_parser import BaseOutputParser, AgentOutputParser, StreamingToolCallParser, \
+    AgentGPTAction
 from superagi.agent.task_queue import TaskQueue
+from superagi.helper.prompt_template import PromptTemplate
 from superagi.helper.token_counter import TokenCounter
+from superagi.lib.tracing import trace_span
 from superagi.llms.base_llm import BaseLlm
-from superagi.models.agent_config import AgentConfiguration
-from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_completed_task import AgentExecutionCompletedTask
 # from superagi.models.types.agent_with_config import AgentWithConfig
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 from superagi.models.agent_execution_permission import AgentExecutionPermission
@@ -46,7 +53,8 @@ S3 = "S3"
 
 engine = connect_db()
 Session = sessionmaker(bind=engine)
-session = Session()
+# the session of the current task, removed by the worker once the task is over
+session = scoped_session(Session)
 
 
 class SuperAgi:
@@ -67,6 +75,11 @@ class SuperAgi:
         self.output_parser = output_parser
         self.tools = tools
         self.agent_config = agent_config
+        self.opening_feed_ids = None
+        # the most recent feeds of the execution, kept between the iterations of a warm session
+        self.feed_window: List[dict] = []
+        # whether feeds left the window, or were never read into it, at the last fetch
+        self.feeds_evicted = False
         # Init Log
         # print("\033[92m\033[1m" + "\nWelcome to SuperAGI - The future of AGI" + "\033[0m\033[0m")
 
@@ -88,62 +101,247 @@ class SuperAgi:
             tools=tools
         )
 
-    def fetch_agent_feeds(self, session, agent_execution_id, agent_id):
-        memory_window = session.query(AgentConfiguration).filter(
-            AgentConfiguration.key == "memory_window",
-            AgentConfiguration.agent_id == agent_id
-        ).order_by(desc(AgentConfiguration.updated_at)).first().value
-
-        agent_feeds = session.query(AgentExecutionFeed.role, AgentExecutionFeed.feed) \
-            .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id) \
-            .order_by(asc(AgentExecutionFeed.created_at)) \
+    @trace_span("feed_fetch")
+    def fetch_agent_feeds(self, session, agent_execution_id):
+        """
+        Returns the most recent `memory_window` feeds of the execution in chronological order, without
+        its two opening system feeds. The window is kept between the iterations of a warm session, so
+        later calls only read the feeds added since the previous one.
+
+        Args:
+            session (Session): The database session.
+            agent_execution_id (int): The id of the agent execution.
+
+        Returns:
+            List[dict]: The feeds of the window, oldest first.
+        """
+        memory_window = int(self.agent_config["memory_window"])
+        if self.opening_feed_ids is None:
+            opening_feeds = session.query(AgentExecutionFeed.id) \
+                .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id) \
+                .order_by(asc(AgentExecutionFeed.created_at), asc(AgentExecutionFeed.id)) \
+                .limit(2) \
+                .all()
+            if len(opening_feeds) < 2:
+                return []
+            self.opening_feed_ids = [feed_id for (feed_id,) in opening_feeds]
+
+        query = session.query(AgentExecutionFeed.id, AgentExecutionFeed.role, AgentExecutionFeed.feed,
+                              AgentExecutionFeed.token_count, AgentExecutionFeed.created_at) \
+            .filter(AgentExecutionFeed.agent_execution_id == agent_execution_id,
+                    AgentExecutionFeed.id.notin_(self.opening_feed_ids))
+        if len(self.feed_window) > 0:
+            last_feed = self.feed_window[-1]
+            query = query.filter(tuple_(AgentExecutionFeed.created_at, AgentExecutionFeed.id) >
+                                 tuple_(last_feed["created_at"], last_feed["id"]))
+        new_feeds = query.order_by(desc(AgentExecutionFeed.created_at), desc(AgentExecutionFeed.id)) \
             .limit(memory_window) \
             .all()
-        return agent_feeds[2:]
+        new_feeds = [{"id": feed_id, "role": role, "content": feed, "token_count": token_count,
+                      "created_at": created_at}
+                     for feed_id, role, feed, token_count, created_at in reversed(new_feeds)]
+        self.backfill_feed_token_counts(session, new_feeds)
+        self.feeds_evicted = len(new_feeds) == memory_window or len(self.feed_window) + len(new_feeds) > memory_window
+        self.feed_window = (self.feed_window + new_feeds)[-memory_window:] if memory_window > 0 else []
+        return list(self.feed_window)
+
+    def fetch_evicted_feeds(self, session, last_summarized_feed_id):
+        """
+        Returns the feeds that left the memory window since the last summarized feed, oldest first.
+
+        Args:
+            session (Session): The database session.
+            last_summarized_feed_id (int): The id of the last summarized feed, None if there is none.
+
+        Returns:
+            List[dict]: The evicted feeds.
+        """
+        if len(self.feed_window) == 0:
+            return []
+        window_start = self.feed_window[0]
+        query = session.query(AgentExecutionFeed.id, AgentExecutionFeed.role, AgentExecutionFeed.feed,
+                              AgentExecutionFeed.token_count) \
+            .filter(AgentExecutionFeed.agent_execution_id == self.agent_config["agent_execution_id"],
+                    AgentExecutionFeed.id.notin_(self.opening_feed_ids),
+                    tuple_(AgentExecutionFeed.created_at, AgentExecutionFeed.id) <
+                    tuple_(window_start["created_at"], window_start["id"]))
+        if last_summarized_feed_id is not None:
+            query = query.filter(AgentExecutionFeed.id > last_summarized_feed_id)
+        evicted_feeds = [{"id": feed_id, "role": role, "content": feed, "token_count": token_count}
+                         for feed_id, role, feed, token_count in
+                         query.order_by(asc(AgentExecutionFeed.created_at), asc(AgentExecutionFeed.id)).all()]
+        self.backfill_feed_token_counts(session, evicted_feeds)
+        return evicted_feeds
+
+    def backfill_feed_token_counts(self, session, agent_feeds):
+        """Counts and stores the tokens of feeds that were written without a token count."""
+        missing_counts = []
+        for agent_feed in agent_feeds:
+            if agent_feed["token_count"] is None:
+                agent_feed["token_count"] = TokenCounter.count_content_tokens(agent_feed["content"],
+                                                                              self.llm.get_model())
+                missing_counts.append({"id": agent_feed["id"], "token_count": agent_feed["token_count"]})
+        if len(missing_counts) > 0:
+            session.bulk_update_mappings(AgentExecutionFeed, missing_counts)
+            session.commit()
 
     def split_history(self, history: List, pending_token_limit: int) -> Tuple[List[BaseMessage], List[BaseMessage]]:
-        hist_token_count = 0
-        i = len(history)
+        tokens_per_message = TokenCounter.tokens_per_message(self.llm.get_model())
+        message_token_counts = []
         for message in reversed(history):
-            token_count = TokenCounter.count_message_tokens([{"role": message["role"], "content": message["content"]}],
-                                                            self.llm.get_model())
-            hist_token_count += token_count
-            if hist_token_count > pending_token_limit:
-                return history[:i], history[i:]
-            i -= 1
-        return [], history
-
-    def execute(self, workflow_step: AgentWorkflowStep):
-
+            token_count = message.get("token_count")
+            if token_count is None:
+                token_count = TokenCounter.count_content_tokens(message["content"], self.llm.get_model())
+            message_token_counts.append(tokens_per_message + token_count)
+        # prefix sums over the newest messages, the history that fits is the longest prefix within the limit
+        kept_messages = bisect_right(list(accumulate(message_token_counts)), pending_token_limit)
+        split_index = len(history) - kept_messages
+        return history[:split_index], history[split_index:]
+
+    @staticmethod
+    def get_history_summary_token_limit() -> int:
+        """Returns the number of prompt tokens reserved for the history summary, 0 disables summarization."""
+        return int(get_config("HISTORY_SUMMARY_MAX_TOKENS", 300))
+
+    @trace_span("history_summary")
+    def update_history_summary(self, session, past_messages: List, unit_of_work: AgentExecutionUnitOfWork):
+        """
+        Folds the history evicted from the prompt into the running summary of the execution. Only the
+        feeds evicted since the last update are summarized, together with the previous summary, both the
+        ones that left the memory window and the ones of the window that do not fit in the prompt. The
+        summary read with the execution comes in through the agent configuration, the feeds that left the
+        window are only queried when the last fetch dropped some or the prompt overflowed.
+
+        Args:
+            session (Session): The database session.
+            past_messages (List): The history that does not fit in the prompt anymore, oldest first.
+            unit_of_work (AgentExecutionUnitOfWork): The buffer recording the new summary.
+
+        Returns:
+            str: The summary of the evicted history, None if there is none.
+        """
+        history_summary = self.agent_config.get("history_summary")
+        last_summarized_feed_id = self.agent_config.get("last_summarized_feed_id")
+        new_messages = [message for message in past_messages
+                        if last_summarized_feed_id is None or message["id"] > last_summarized_feed_id]
+        if self.feeds_evicted or len(past_messages) > 0:
+            new_messages = self.fetch_evicted_feeds(session, last_summarized_feed_id) + new_messages
+        if len(new_messages) == 0:
+            return history_summary
+
+        model = self.llm.get_model()
+        summary_token_limit = self.get_history_summary_token_limit()
+        prompt = AgentPromptBuilder.summarize_history()["prompt"]
+        chunk_token_limit = TokenCounter.token_limit(model) - summary_token_limit - \
+            TokenCounter.count_message_tokens([{"role": "system", "content": prompt}], model) - 500
+        chunks = [[]]
+        chunk_tokens = 0
+        for message in new_messages:
+            entry = f"{message['role']}: {message['content']}"
+            # an entry larger than a whole chunk is cut, about four characters per token
+            entry = entry[:chunk_token_limit * 4]
+            entry_tokens = min(message["token_count"] or 0, chunk_token_limit)
+            if chunk_tokens + entry_tokens > chunk_token_limit and len(chunks[-1]) > 0:
+                chunks.append([])
+                chunk_tokens = 0
+            chunks[-1].append((message["id"], entry))
+            chunk_tokens += entry_tokens
+
+        updated = False
+        for chunk in chunks:
+            rendered_prompt = PromptTemplate.compile(prompt).render({
+                "previous_summary": history_summary or "",
+                "new_messages": "\n".join(entry for _, entry in chunk)})
+            summary_messages = [{"role": "system", "content": rendered_prompt}]
+            response = self.llm.chat_completion(summary_messages, summary_token_limit)
+            if response.get("content") is None:
+                logger.info("Unable to summarize the agent history: " + str(response.get("error")))
+                break
+            history_summary = response["content"].strip()
+            last_summarized_feed_id = chunk[-1][0]
+            updated = True
+            unit_of_work.add_usage(0, TokenCounter.count_message_tokens(summary_messages, model) +
+                                   TokenCounter.count_content_tokens(history_summary, model))
+        if updated:
+            unit_of_work.set_execution_fields(history_summary=history_summary,
+                                              last_summarized_feed_id=last_summarized_feed_id)
+            self.agent_config["history_summary"] = history_summary
+            self.agent_config["last_summarized_feed_id"] = last_summarized_feed_id
+        return history_summary
+
+    def execute(self, workflow_step: AgentWorkflowStep, unit_of_work: AgentExecutionUnitOfWork = None):
+        """
+        Runs one iteration of the workflow step. The feeds, token usage and state produced by the
+        iteration are buffered in the unit of work; when no unit of work is given, the iteration's own
+        buffer is flushed before returning.
+
+        Args:
+            workflow_step (AgentWorkflowStep): The workflow step to run.
+            unit_of_work (AgentExecutionUnitOfWork): The buffer to record the iteration in.
+
+        Returns:
+            dict: The response of the iteration.
+        """
         session = Session()
+        owns_unit_of_work = unit_of_work is None
+        if owns_unit_of_work:
+            unit_of_work = AgentExecutionUnitOfWork(self.agent_config["agent_execution_id"],
+                                                    self.agent_config["agent_id"])
+        try:
+            return self.execute_step(session, workflow_step, unit_of_work)
+        finally:
+            if owns_unit_of_work:
+                unit_of_work.flush(session)
+            session.close()
+
+    def execute_step(self, session, workflow_step: AgentWorkflowStep, unit_of_work: AgentExecutionUnitOfWork):
         agent_execution_id = self.agent_config["agent_execution_id"]
         task_queue = TaskQueue(str(agent_execution_id))
 
         token_limit = TokenCounter.token_limit()
-        agent_feeds = self.fetch_agent_feeds(session, self.agent_config["agent_execution_id"],
-                                             self.agent_config["agent_id"])
+        agent_feeds = self.fetch_agent_feeds(session, self.agent_config["agent_execution_id"])
         current_calls = 0
         if len(agent_feeds) <= 0:
             task_queue.clear_tasks()
         messages = []
         max_token_limit = 600
+        model = self.llm.get_model()
+        tokens_per_message = TokenCounter.tokens_per_message(model)
         # adding history to the messages
         if workflow_step.history_enabled:
             prompt = self.build_agent_prompt(workflow_step.prompt, task_queue=task_queue,
                                              max_token_limit=max_token_limit)
             messages.append({"role": "system", "content": prompt})
             messages.append({"role": "system", "content": f"The current time and date is {time.strftime('%c')}"})
-            base_token_limit = TokenCounter.count_message_tokens(messages, self.llm.get_model())
-            full_message_history = [{'role': role, 'content': feed} for role, feed in agent_feeds]
-            past_messages, current_messages = self.split_history(full_message_history,
-                                                                 token_limit - base_token_limit - max_token_limit)
+            with trace_span("token_counting"):
+                message_token_counts = [TokenCounter.count_content_tokens(message["content"], model)
+                                        for message in messages]
+                base_token_limit = sum(message_token_counts) + tokens_per_message * len(messages) + 3
+                summary_token_limit = self.get_history_summary_token_limit()
+                past_messages, current_messages = self.split_history(
+                    agent_feeds, token_limit - base_token_limit - max_token_limit - summary_token_limit)
+            current_tokens = base_token_limit
+            if summary_token_limit > 0:
+                history_summary = self.update_history_summary(session, past_messages, unit_of_work)
+                if history_summary:
+                    summary_message = "Summary of the earlier history of this run:\n" + history_summary
+                    messages.append({"role": "system", "content": summary_message})
+                    message_token_counts.append(TokenCounter.count_content_tokens(summary_message, model))
+                    current_tokens += tokens_per_message + message_token_counts[-1]
             for history in current_messages:
                 messages.append({"role": history["role"], "content": history["content"]})
+                message_token_counts.append(history["token_count"])
+                current_tokens += tokens_per_message + history["token_count"]
             messages.append({"role": "user", "content": workflow_step.completion_prompt})
+            message_token_counts.append(TokenCounter.count_content_tokens(workflow_step.completion_prompt, model))
+            current_tokens += tokens_per_message + message_token_counts[-1]
         else:
             prompt = self.build_agent_prompt(workflow_step.prompt, task_queue=task_queue,
                                              max_token_limit=max_token_limit)
             messages.append({"role": "system", "content": prompt})
+            with trace_span("token_counting"):
+                message_token_counts = [TokenCounter.count_content_tokens(prompt, model)]
+            current_tokens = message_token_counts[0] + tokens_per_message + 3
             # agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_config["agent_execution_id"],
             #                                           agent_id=self.agent_config["agent_id"], feed=template_step.prompt,
             #                                           role="user")
@@ -151,90 +349,268 @@ class SuperAgi:
         logger.info(prompt)
         # print(messages)
         if len(agent_feeds) <= 0:
-            for message in messages:
-                agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_config["agent_execution_id"],
-                                                          agent_id=self.agent_config["agent_id"],
-                                                          feed=message["content"],
-                                                          role=message["role"])
-                session.add(agent_execution_feed)
-                session.commit()
-
-        current_tokens = TokenCounter.count_message_tokens(messages, self.llm.get_model())
-        response = self.llm.chat_completion(messages, token_limit - current_tokens)
+            for message, message_token_count in zip(messages, message_token_counts):
+                unit_of_work.add_feed(message["content"], message["role"], message_token_count)
+
+        early_tool_run = None
+        if self.is_streaming_enabled():
+            tool_executor = ThreadPoolExecutor(max_workers=1) if workflow_step.output_type == "tools" else None
+            assistant_reply, early_tool_run = self.stream_assistant_reply(messages, token_limit - current_tokens,
+                                                                          tool_executor)
+            if tool_executor is not None:
+                tool_executor.shutdown(wait=False)
+        else:
+            with trace_span("llm"):
+                response = self.llm.chat_completion(messages, token_limit - current_tokens)
+            assistant_reply = response.get('content')
         current_calls = current_calls + 1
-        total_tokens = current_tokens + TokenCounter.count_message_tokens(response, self.llm.get_model())
-        self.update_agent_execution_tokens(current_calls, total_tokens)
-
-        if response['content'] is None:
+        response_tokens = 0
+        if assistant_reply is not None:
+            with trace_span("token_counting"):
+                response_tokens = TokenCounter.count_content_tokens(assistant_reply, model)
+        total_tokens = current_tokens + response_tokens
+        unit_of_work.add_usage(current_calls, total_tokens)
+
+        if assistant_reply is None:
+            if early_tool_run is not None:
+                self.record_early_tool_run(early_tool_run, unit_of_work, model)
             raise RuntimeError(f"Failed to get response from llm")
-        assistant_reply = response['content']
 
         final_response = {"result": "PENDING", "retry": False}
 
         if workflow_step.output_type == "tools":
-            agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_config["agent_execution_id"],
-                                                      agent_id=self.agent_config["agent_id"], feed=assistant_reply,
-                                                      role="assistant")
-            session.add(agent_execution_feed)
-            session.commit()
+            unit_of_work.add_feed(assistant_reply, "assistant", response_tokens)
 
-            # check if permission is required for the tool in restricted mode
-            is_permission_required, response = self.check_permission_in_restricted_mode(assistant_reply)
-            if is_permission_required:
-                return response
-
-            tool_response = self.handle_tool_response(assistant_reply)
-            agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_config["agent_execution_id"],
-                                                      agent_id=self.agent_config["agent_id"],
-                                                      feed=tool_response["result"],
-                                                      role="system"
-                                                      )
-            session.add(agent_execution_feed)
+            with trace_span("parsing"):
+                actions = self.output_parser.parse_actions(assistant_reply)
+            permission_response = None
+            if len(actions) > 1:
+                tool_response, permission_response = self.handle_tool_responses(actions, early_tool_run)
+            else:
+                # the reply is parsed once, its action is handed to the permission check and the tool run
+                action = actions[0]
+                # check if permission is required for the tool in restricted mode, tools started while the
+                # reply was streaming never require it
+                if early_tool_run is None:
+                    is_permission_required, response = self.check_permission_in_restricted_mode(assistant_reply,
+                                                                                                 action)
+                    if is_permission_required:
+                        return response
+
+                tool_response = self.handle_tool_response(assistant_reply, early_tool_run, action)
+            if permission_response is not None:
+                if tool_response["result"] != "":
+                    unit_of_work.add_feed(tool_response["result"], "system",
+                                          TokenCounter.count_content_tokens(tool_response["result"], model))
+                return permission_response
+            unit_of_work.add_feed(tool_response["result"], "system",
+                                  TokenCounter.count_content_tokens(tool_response["result"], model))
             final_response = tool_response
-            final_response["pending_task_count"] = len(task_queue.get_tasks())
+            final_response["pending_task_count"] = task_queue.count_tasks()
         elif workflow_step.output_type == "replace_tasks":
             tasks = eval(assistant_reply)
-            task_queue.clear_tasks()
-            for task in reversed(tasks):
-                task_queue.add_task(task)
+            task_queue.replace_tasks(tasks)
             if len(tasks) > 0:
                 logger.info("Tasks reprioritized in order: " + str(tasks))
-            current_tasks = task_queue.get_tasks()
-            if len(current_tasks) == 0:
+            pending_task_count = task_queue.count_tasks()
+            if pending_task_count == 0:
                 final_response = {"result": "COMPLETE", "pending_task_count": 0}
             else:
-                final_response = {"result": "PENDING", "pending_task_count": len(current_tasks)}
+                final_response = {"result": "PENDING", "pending_task_count": pending_task_count}
         elif workflow_step.output_type == "tasks":
             tasks = eval(assistant_reply)
-            for task in reversed(tasks):
-                task_queue.add_task(task)
+            task_queue.add_tasks(tasks)
             if len(tasks) > 0:
                 logger.info("Adding task to queue: " + str(tasks))
             for task in tasks:
-                agent_execution_feed = AgentExecutionFeed(agent_execution_id=self.agent_config["agent_execution_id"],
-                                                          agent_id=self.agent_config["agent_id"],
-                                                          feed="New Task Added: " + task,
-                                                          role="system")
-                session.add(agent_execution_feed)
-            current_tasks = task_queue.get_tasks()
-            if len(current_tasks) == 0:
+                unit_of_work.add_feed("New Task Added: " + task, "system",
+                                      TokenCounter.count_content_tokens("New Task Added: " + task, model))
+            pending_task_count = task_queue.count_tasks()
+            if pending_task_count == 0:
                 final_response = {"result": "COMPLETE", "pending_task_count": 0}
             else:
-                final_response = {"result": "PENDING", "pending_task_count": len(current_tasks)}
+                final_response = {"result": "PENDING", "pending_task_count": pending_task_count}
 
         if workflow_step.output_type == "tools" and final_response["retry"] == False:
-            task_queue.complete_task(final_response["result"])
-            current_tasks = task_queue.get_tasks()
-            if len(current_tasks) > 0 and final_response["result"] == "COMPLETE":
+            pending_task_count = task_queue.complete_task(final_response["result"])
+            if task_queue.archive_size > 0:
+                self.archive_completed_tasks(session, task_queue)
+            if pending_task_count > 0 and final_response["result"] == "COMPLETE":
                 final_response["result"] = "PENDING"
-        session.commit()
 
         logger.info("Iteration completed moving to next iteration!")
-        session.close()
         return final_response
 
-    def handle_tool_response(self, assistant_reply):
-        action = self.output_parser.parse(assistant_reply)
+    def archive_completed_tasks(self, session, task_queue: TaskQueue):
+        """
+        Moves the completed tasks that left the window of the task queue to the database. The tasks stay
+        in the archive list of the queue until they are committed, a failed attempt is retried on the
+        next completed task.
+
+        Args:
+            session (Session): The database session.
+            task_queue (TaskQueue): The task queue of the execution.
+        """
+        tasks = task_queue.get_archived_tasks()
+        if len(tasks) == 0:
+            return
+        try:
+            session.execute(insert(AgentExecutionCompletedTask.__table__),
+                            [{"agent_execution_id": self.agent_config["agent_execution_id"], "task": task["task"],
+                              "response": task["response"]} for task in tasks])
+            session.commit()
+        except SQLAlchemyError as exception:
+            session.rollback()
+            logger.warning(f"Unable to archive the completed tasks: {exception}")
+            return
+        task_queue.remove_archived_tasks(len(tasks))
+
+    @staticmethod
+    def is_streaming_enabled() -> bool:
+        return str(get_config("STREAM_LLM_RESPONSES", False)).lower() == "true"
+
+    @trace_span("llm")
+    def stream_assistant_reply(self, messages, max_tokens, tool_executor: ThreadPoolExecutor = None):
+        """
+        Streams the reply of the llm. When a tool executor is given, the tool call is started on it as
+        soon as its name and args are complete, while the rest of the reply is still being generated.
+
+        Args:
+            messages (list): The messages to send to the llm.
+            max_tokens (int): The maximum number of tokens of the reply.
+            tool_executor (ThreadPoolExecutor): The executor to start the tool on.
+
+        Returns:
+            Tuple[str, Tuple[AgentGPTAction, Future]]: The reply, None if the llm failed, and the action
+            and future of the tool started early, if any.
+        """
+        parser = StreamingToolCallParser()
+        early_tool_run = None
+        try:
+            for delta in self.llm.chat_completion_stream(messages, max_tokens):
+                action = parser.feed(delta)
+                if action is not None and tool_executor is not None:
+                    early_tool_run = self.start_tool_early(action, tool_executor)
+        except Exception as exception:
+            logger.info("Exception:", exception)
+            return None, early_tool_run
+        return parser.text, early_tool_run
+
+    def start_tool_early(self, action, tool_executor: ThreadPoolExecutor):
+        """Starts the tool of a streamed action unless it finishes the run or needs a permission."""
+        tools = {t.name.lower(): t for t in self.tools}
+        tool = tools.get(action.name.lower())
+        if tool is None or action.name.lower() == FINISH:
+            return None
+        if self.agent_config["permission_type"].upper() == "RESTRICTED" and tool.permission_required:
+            return None
+        self.load_tool_configs(tool)
+        logger.info("Starting tool " + tool.name + " while the reply is streaming")
+        return action, tool_executor.submit(tool.execute, action.args)
+
+    def record_early_tool_run(self, early_tool_run, unit_of_work: AgentExecutionUnitOfWork, model: str):
+        """
+        Waits for the tool started while a failed reply was streaming and records its output, so that
+        the step does not fail while the tool still uses the session and its retry does not run it again.
+        """
+        tool_response = self.execute_action(*early_tool_run)
+        unit_of_work.add_feed(tool_response["result"], "system",
+                              TokenCounter.count_content_tokens(tool_response["result"], model))
+
+    @staticmethod
+    def uses_database_session(tool) -> bool:
+        """Returns whether the tool reads or writes through the database session of the agent."""
+        return hasattr(tool, "resource_manager") or hasattr(tool, "tool_response_manager")
+
+    @staticmethod
+    def load_tool_configs(tool):
+        """Loads the toolkit configuration of a tool before it runs in another thread than the session's."""
+        toolkit_config = getattr(tool, "toolkit_config", None)
+        if toolkit_config is not None:
+            toolkit_config.load_tool_configs()
+
+    @trace_span("tool")
+    def handle_tool_response(self, assistant_reply, early_tool_run=None, action: AgentGPTAction = None):
+        if early_tool_run is not None:
+            action, observation_future = early_tool_run
+        else:
+            observation_future = None
+            if action is None:
+                action = self.output_parser.parse(assistant_reply)
+        return self.execute_action(action, observation_future)
+
+    @trace_span("tool")
+    def handle_tool_responses(self, actions: List[AgentGPTAction], early_tool_run=None):
+        """
+        Runs the independent tool calls of a multi tool reply concurrently in a bounded thread pool and
+        joins their results into one response. Calls needing a permission in restricted mode are not run,
+        a permission is requested for the first of them and the others are reported back to the agent.
+
+        Args:
+            actions (List[AgentGPTAction]): The tool calls of the reply.
+            early_tool_run (Tuple[AgentGPTAction, Future]): The call started while the reply was streaming,
+                it is not run again.
+
+        Returns:
+            Tuple[dict, dict]: The joined tool response, and the permission response if a permission was
+            requested.
+        """
+        tools = {t.name.lower(): t for t in self.tools}
+        notes = []
+        permission_response = None
+        runnable_groups = {}
+        observation_futures = {}
+        if early_tool_run is not None:
+            early_action, observation_future = early_tool_run
+            early_index = next((index for index, action in enumerate(actions) if action == early_action), None)
+            if early_index is None:
+                # the started call is reported even when the complete reply reads differently
+                actions = list(actions) + [early_action]
+                early_index = len(actions) - 1
+            observation_futures[early_index] = observation_future
+            if self.uses_database_session(tools.get(early_action.name.lower())):
+                # the started call may be using the session, the other calls wait until it is over
+                wait([observation_future])
+        for index, action in enumerate(actions):
+            if index in observation_futures:
+                runnable_groups[index] = [(index, action)]
+                continue
+            if action.name.lower() == FINISH or action.name == "":
+                notes.append(f"The {FINISH} tool must be used on its own, it was ignored.")
+                continue
+            if self.is_permission_required(action):
+                if permission_response is None:
+                    assistant_reply = json.dumps({"thoughts": {}, "tool": {"name": action.name, "args": action.args}})
+                    permission_response = self.request_permission(action, assistant_reply)
+                else:
+                    notes.append(f"Tool {action.name} was not run as it needs a permission, use it again in a "
+                                 f"later step.")
+                continue
+            tool = tools.get(action.name.lower())
+            # the session is not thread safe: the toolkit configurations are read before the calls are
+            # started and the tools using the session through their managers run one after the other
+            if tool is not None:
+                self.load_tool_configs(tool)
+            group = "database_session" if self.uses_database_session(tool) else index
+            runnable_groups.setdefault(group, []).append((index, action))
+
+        outputs = {}
+        if len(runnable_groups) > 0:
+            max_workers = min(int(get_config("MAX_PARALLEL_TOOL_CALLS", 4)), len(runnable_groups))
+            with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as tool_executor:
+                for group_outputs in tool_executor.map(lambda group: self._execute_actions(group, observation_futures),
+                                                       runnable_groups.values()):
+                    outputs.update(group_outputs)
+        results = [outputs[index]["result"] for index in sorted(outputs)] + notes
+        retry = permission_response is None and len(outputs) > 0 and all(
+            output["retry"] for output in outputs.values())
+        return {"result": "\n".join(results), "retry": retry}, permission_response
+
+    def _execute_actions(self, indexed_actions, observation_futures):
+        return {index: self.execute_action(action, observation_futures.get(index))
+                for index, action in indexed_actions}
+
+    def execute_action(self, action: AgentGPTAction, observation_future=None):
         tools = {t.name.lower(): t for t in self.tools}
 
         if action.name.lower() == FINISH or action.name == "":
@@ -244,7 +620,10 @@ class SuperAgi:
         if action.name.lower() in tools:
             tool = tools[action.name.lower()]
             try:
-                observation = tool.execute(action.args)
+                if observation_future is not None:
+                    observation = observation_future.result()
+                else:
+                    observation = tool.execute(action.args)
                 logger.info("Tool Observation : ")
                 logger.info(observation)
 
@@ -272,16 +651,11 @@ class SuperAgi:
         logger.info("Tool Response : " + str(output) + "\n")
         return output
 
-    def update_agent_execution_tokens(self, current_calls, total_tokens):
-        agent_execution = session.query(AgentExecution).filter(
-            AgentExecution.id == self.agent_config["agent_execution_id"]).first()
-        agent_execution.num_of_calls += current_calls
-        agent_execution.num_of_tokens += total_tokens
-        session.commit()
-
+    @trace_span("prompt_building")
     def build_agent_prompt(self, prompt: str, task_queue: TaskQueue, max_token_limit: int):
-        pending_tasks = task_queue.get_tasks()
-        completed_tasks = task_queue.get_completed_tasks()
+        snapshot = task_queue.get_snapshot()
+        pending_tasks = snapshot.pending_tasks
+        completed_tasks = snapshot.completed_tasks
         add_finish_tool = True
         if len(pending_tasks) > 0 or len(completed_tasks) > 0:
             add_finish_tool = False
@@ -289,7 +663,7 @@ class SuperAgi:
         prompt = AgentPromptBuilder.replace_main_variables(prompt, self.agent_config["goal"], self.agent_config["instruction"],
                                                            self.agent_config["constraints"], self.tools, add_finish_tool)
 
-        response = task_queue.get_last_task_details()
+        response = snapshot.last_task_details
 
         last_task = ""
         last_task_result = ""
@@ -298,28 +672,36 @@ class SuperAgi:
         if response is not None:
             last_task = response["task"]
             last_task_result = response["response"]
-        current_task = task_queue.get_first_task() or ""
+        current_task = snapshot.first_task or ""
         token_limit = TokenCounter.token_limit() - max_token_limit
         prompt = AgentPromptBuilder.replace_task_based_variables(prompt, current_task, last_task, last_task_result,
                                                                  pending_tasks, completed_tasks, token_limit)
         return prompt
 
-    def check_permission_in_restricted_mode(self, assistant_reply: str):
-        action = self.output_parser.parse(assistant_reply)
+    @trace_span("parsing")
+    def check_permission_in_restricted_mode(self, assistant_reply: str, action: AgentGPTAction = None):
+        if action is None:
+            action = self.output_parser.parse(assistant_reply)
+        if self.is_permission_required(action):
+            return True, self.request_permission(action, assistant_reply)
+        return False, None
+
+    def is_permission_required(self, action: AgentGPTAction) -> bool:
         tools = {t.name: t for t in self.tools}
 
         excluded_tools = [FINISH, '', None]
 
-        if self.agent_config["permission_type"].upper() == "RESTRICTED" and action.name not in excluded_tools and \
-                tools.get(action.name) and tools[action.name].permission_required:
-            new_agent_execution_permission = AgentExecutionPermission(
-                agent_execution_id=self.agent_config["agent_execution_id"],
-                status="PENDING",
-                agent_id=self.agent_config["agent_id"],
-                tool_name=action.name,
-                assistant_reply=assistant_reply)
+        return self.agent_config["permission_type"].upper() == "RESTRICTED" and action.name not in excluded_tools \
+            and tools.get(action.name) is not None and tools[action.name].permission_required
 
-            session.add(new_agent_execution_permission)
-            session.commit()
-            return True, {"result": "WAITING_FOR_PERMISSION", "permission_id": new_agent_execution_permission.id}
-        return False, None
+    def request_permission(self, action: AgentGPTAction, assistant_reply: str):
+        new_agent_execution_permission = AgentExecutionPermission(
+            agent_execution_id=self.agent_config["agent_execution_id"],
+            status="PENDING",
+            agent_id=self.agent_config["agent_id"],
+            tool_name=action.name,
+            assistant_reply=assistant_reply)
+
+        session.add(new_agent_execution_permission)
+        session.commit()
+        return {"result": "WAITING_FOR_PERMISSION", "permission_id": new_agent_execution_permission.id}
@@ -1,24 +1,120 @@
+import ast
 import json
+import os
+import threading
+from typing import List, NamedTuple, Optional
 
 import redis
 
 from superagi.config.config import get_config
 
 redis_url = get_config('REDIS_URL')
+
+# pops the first pending task and records it with its response in one atomic step. Once the completed
+# list outgrows the window by a whole batch, its oldest entries are moved to the archive list to be
+# written to the database. Returns the number of tasks still pending and the size of the archive list.
+COMPLETE_TASK_SCRIPT = """
+local task = redis.call('LPOP', KEYS[1])
+local completed = cjson.encode({task = task or cjson.null, response = ARGV[1]})
+redis.call('LPUSH', KEYS[2], completed)
+local overflow = redis.call('LLEN', KEYS[2]) - tonumber(ARGV[2])
+if overflow >= tonumber(ARGV[3]) then
+    for _ = 1, overflow do
+        redis.call('RPOPLPUSH', KEYS[2], KEYS[3])
+    end
+end
+return {redis.call('LLEN', KEYS[1]), redis.call('LLEN', KEYS[3])}
+"""
+
+
+class TaskQueueSnapshot(NamedTuple):
+    pending_tasks: List[str]
+    completed_tasks: List[dict]
+
+    @property
+    def first_task(self) -> Optional[str]:
+        return self.pending_tasks[0] if len(self.pending_tasks) > 0 else None
+
+    @property
+    def last_task_details(self) -> Optional[dict]:
+        return self.completed_tasks[0] if len(self.completed_tasks) > 0 else None
+
+
 """TaskQueue manages current tasks and past tasks in Redis """
 class TaskQueue:
+    _pool = None
+    _pool_pid = None
+    _pool_lock = threading.Lock()
+
     def __init__(self, queue_name: str):
         self.queue_name = queue_name + "_q"
         self.completed_tasks = queue_name + "_q_completed"
-        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+        self.archived_tasks = queue_name + "_q_archive"
+        self.db = redis.Redis(connection_pool=self.get_connection_pool())
+        self._complete_task_script = self.db.register_script(COMPLETE_TASK_SCRIPT)
+        self.completed_window = int(get_config("TASK_QUEUE_COMPLETED_WINDOW", 50))
+        self.archive_batch_size = int(get_config("TASK_QUEUE_ARCHIVE_BATCH_SIZE", 20))
+        self.archive_size = 0
+
+    @classmethod
+    def get_connection_pool(cls) -> redis.ConnectionPool:
+        """Returns the redis connection pool shared by the queues of the process."""
+        with cls._pool_lock:
+            if cls._pool is None or cls._pool_pid != os.getpid():
+                cls._pool = redis.ConnectionPool.from_url("redis://" + redis_url + "/0", decode_responses=True)
+                cls._pool_pid = os.getpid()
+            return cls._pool
+
+    @staticmethod
+    def _decode_completed_task(value: str) -> dict:
+        try:
+            return json.loads(value)
+        except ValueError:
+            # tasks completed before the json encoding was introduced are stored as python dict literals
+            return ast.literal_eval(value)
 
     def add_task(self, task: str):
         self.db.lpush(self.queue_name, task)
-        # print("Added task. New tasks:", str(self.get_tasks()))
 
-    def complete_task(self, response):
-        task = self.db.lpop(self.queue_name)
-        self.db.lpush(self.completed_tasks, str({"task": task, "response": response}))
+    def add_tasks(self, tasks: List[str]):
+        """Adds tasks in front of the queue, the first task of the list is the next to run."""
+        if len(tasks) > 0:
+            self.db.lpush(self.queue_name, *reversed(tasks))
+
+    def replace_tasks(self, tasks: List[str]):
+        """Atomically replaces the pending tasks, the first task of the list is the next to run."""
+        pipeline = self.db.pipeline()
+        pipeline.delete(self.queue_name)
+        if len(tasks) > 0:
+            pipeline.lpush(self.queue_name, *reversed(tasks))
+        pipeline.execute()
+
+    def complete_task(self, response) -> int:
+        """
+        Marks the first pending task as completed with its response. Only the last
+        TASK_QUEUE_COMPLETED_WINDOW completed tasks are kept in the queue, older ones are moved to the
+        archive list in batches and `archive_size` tells how many of them wait to be archived.
+
+        Args:
+            response (str): The response of the task.
+
+        Returns:
+            int: The number of tasks still pending.
+        """
+        pending_task_count, self.archive_size = self._complete_task_script(
+            keys=[self.queue_name, self.completed_tasks, self.archived_tasks],
+            args=[str(response), self.completed_window, self.archive_batch_size])
+        return pending_task_count
+
+    def get_archived_tasks(self) -> List[dict]:
+        """Returns the completed tasks waiting to be archived, oldest first."""
+        tasks = self.db.lrange(self.archived_tasks, 0, -1)
+        return [self._decode_completed_task(task) for task in reversed(tasks)]
+
+    def remove_archived_tasks(self, count: int):
+        """Removes the `count` oldest tasks of the archive list, once they are stored elsewhere."""
+        self.db.ltrim(self.archived_tasks, 0, -(count + 1))
+        self.archive_size = max(self.archive_size - count, 0)
 
     def get_first_task(self):
         return self.db.lindex(self.queue_name, 0)
@@ -26,9 +122,26 @@ class TaskQueue:
     def get_tasks(self):
         return self.db.lrange(self.queue_name, 0, -1)
 
+    def count_tasks(self) -> int:
+        return self.db.llen(self.queue_name)
+
     def get_completed_tasks(self):
         tasks = self.db.lrange(self.completed_tasks, 0, -1)
-        return [eval(task) for task in tasks]
+        return [self._decode_completed_task(task) for task in tasks]
+
+    def get_snapshot(self) -> TaskQueueSnapshot:
+        """
+        Reads the pending and completed tasks in a single round trip.
+
+        Returns:
+            TaskQueueSnapshot: The pending tasks and the completed tasks of the window, most recent first.
+        """
+        pipeline = self.db.pipeline(transaction=False)
+        pipeline.lrange(self.queue_name, 0, -1)
+        pipeline.lrange(self.completed_tasks, 0, -1)
+        pending_tasks, completed_tasks = pipeline.execute()
+        return TaskQueueSnapshot(pending_tasks=pending_tasks,
+                                 completed_tasks=[self._decode_completed_task(task) for task in completed_tasks])
 
     def clear_tasks(self):
         self.db.delete(self.queue_name)
@@ -38,4 +151,4 @@ class TaskQueue:
         if response is None:
             return None
 
-        return eval(response)
+        return self._decode_completed_task(response)
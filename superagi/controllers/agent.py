@@ -1,6 +1,7 @@
 from fastapi_sqlalchemy import db
 from fastapi import HTTPException, Depends, Request
 from fastapi_jwt_auth import AuthJWT
+from superagi.agent.agent_cache import AgentConfigCache
 from superagi.models.agent import Agent
 from superagi.models.agent_template import AgentTemplate
 from superagi.models.agent_template_config import AgentTemplateConfig
@@ -114,6 +115,7 @@ def update_agent(agent_id: int, agent: sqlalchemy_to_pydantic(Agent, exclude=["i
     db_agent.description = agent.description
 
     db.session.commit()
+    AgentConfigCache.invalidate(agent_id)
     return db_agent
 
 
@@ -1,8 +1,11 @@
+import json
+
 from fastapi import APIRouter
 from fastapi import HTTPException, Depends
 from fastapi_jwt_auth import AuthJWT
 from fastapi_sqlalchemy import db
 from pydantic_sqlalchemy import sqlalchemy_to_pydantic
+from superagi.agent.agent_cache import AgentConfigCache
 from superagi.helper.auth import check_auth
 from superagi.models.agent import Agent
 from superagi.models.agent_config import AgentConfiguration
@@ -36,6 +39,7 @@ def create_agent_config(agent_config: sqlalchemy_to_pydantic(AgentConfiguration,
     db_agent_config = AgentConfiguration(agent_id=agent_config.agent_id, key=agent_config.key, value=agent_config.value)
     db.session.add(db_agent_config)
     db.session.commit()
+    AgentConfigCache.invalidate(agent_config.agent_id)
     return db_agent_config
 
 
@@ -84,12 +88,12 @@ def update_agent(agent_config: AgentConfig,
 
     db_agent_config.key = agent_config.key
     if isinstance(agent_config.value, list):
-        # Convert the list to a string using the str() function
-        db_agent_config.value = str(agent_config.value)
+        db_agent_config.value = json.dumps(agent_config.value)
     else:
         db_agent_config.value = agent_config.value
     db.session.commit()
     db.session.flush()
+    AgentConfigCache.invalidate(agent_config.agent_id)
     return db_agent_config
 
 
@@ -4,6 +4,7 @@ from fastapi import HTTPException, Depends
 from fastapi_jwt_auth import AuthJWT
 
 from superagi.helper.time_helper import get_time_difference
+from superagi.lib.tracing import TimingStore, summarize_timings
 from superagi.models.agent_workflow import AgentWorkflow
 from superagi.worker import execute_agent
 from superagi.models.agent_execution import AgentExecution
@@ -72,6 +73,31 @@ def get_agent_execution(agent_execution_id: int,
     return db_agent_execution
 
 
+@router.get("/{agent_execution_id}/timings")
+def get_agent_execution_timings(agent_execution_id: int,
+                                Authorize: AuthJWT = Depends(check_auth)):
+    """
+    Get the latency breakdown of the iterations of an agent execution.
+
+    Args:
+        agent_execution_id (int): The ID of the agent execution.
+
+    Returns:
+        dict: The number of traced iterations and the count, mean, p50 and p95 in milliseconds of every
+            phase, like bootstrap, prompt_building, token_counting, llm, parsing, tool and persistence.
+
+    Raises:
+        HTTPException (Status Code=404): If the agent execution is not found.
+    """
+
+    db_agent_execution = db.session.query(AgentExecution.id).filter(AgentExecution.id == agent_execution_id).first()
+    if not db_agent_execution:
+        raise HTTPException(status_code=404, detail="Agent execution not found")
+    iterations = TimingStore().get(agent_execution_id)
+    return {"agent_execution_id": agent_execution_id, "iterations": len(iterations),
+            "phases": summarize_timings(iterations)}
+
+
 @router.put("/update/{agent_execution_id}", response_model=sqlalchemy_to_pydantic(AgentExecution))
 def update_agent_execution(agent_execution_id: int,
                            agent_execution: sqlalchemy_to_pydantic(AgentExecution, exclude=["id"]),
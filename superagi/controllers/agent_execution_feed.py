@@ -5,7 +5,8 @@ from fastapi import HTTPException, Depends
 from fastapi_jwt_auth import AuthJWT
 from fastapi_sqlalchemy import db
 from pydantic_sqlalchemy import sqlalchemy_to_pydantic
-from sqlalchemy.sql import asc
+from sqlalchemy import func
+from sqlalchemy.sql import asc, desc
 
 from superagi.agent.task_queue import TaskQueue
 from superagi.helper.auth import check_auth
@@ -13,6 +14,7 @@ from superagi.helper.time_helper import get_time_difference
 from superagi.models.agent_execution_permission import AgentExecutionPermission
 from superagi.helper.feed_parser import parse_feed
 from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_completed_task import AgentExecutionCompletedTask
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 
 router = APIRouter()
@@ -163,25 +165,54 @@ def get_agent_execution_feed(agent_execution_id: int,
 
 @router.get("/get/tasks/{agent_execution_id}")
 def get_execution_tasks(agent_execution_id: int,
+                        page: int = 0,
+                        page_size: int = 50,
                         Authorize: AuthJWT = Depends(check_auth)):
     """
-    Get agent execution tasks and completed tasks.
+    Get agent execution tasks and a page of the completed tasks. Page 0 holds the most recent completed
+    tasks, the tasks of a page are listed oldest first.
 
     Args:
         agent_execution_id (int): The ID of the agent execution.
+        page (int): The page of completed tasks, counted from the most recent one.
+        page_size (int): The number of completed tasks per page.
 
     Returns:
-        dict: The tasks and completed tasks for the agent execution.
+        dict: The tasks, the page of completed tasks and the total number of completed tasks.
+
+    Raises:
+        HTTPException (Status Code=400): If the page or page size is invalid.
     """
+    if page < 0 or page_size <= 0:
+        raise HTTPException(status_code=400, detail="Invalid page")
     task_queue = TaskQueue(str(agent_execution_id))
+    snapshot = task_queue.get_snapshot()
     tasks = []
-    for task in task_queue.get_tasks():
+    for task in snapshot.pending_tasks:
         tasks.append({"name": task})
+
+    # the recent completed tasks are in the queue, followed by the ones waiting in its archive list to be
+    # written to the database and by the ones already archived in the database
+    queued_tasks = snapshot.completed_tasks + list(reversed(task_queue.get_archived_tasks()))
+    archived_count = db.session.query(func.count(AgentExecutionCompletedTask.id)).filter(
+        AgentExecutionCompletedTask.agent_execution_id == agent_execution_id).scalar()
+    start = page * page_size
+    end = start + page_size
+    page_tasks = [task["task"] for task in queued_tasks[start:end]]
+    if end > len(queued_tasks) and archived_count > 0:
+        offset = max(start - len(queued_tasks), 0)
+        archived_tasks = db.session.query(AgentExecutionCompletedTask.task).filter(
+            AgentExecutionCompletedTask.agent_execution_id == agent_execution_id) \
+            .order_by(desc(AgentExecutionCompletedTask.id)).offset(offset).limit(page_size - len(page_tasks)).all()
+        page_tasks.extend(task for (task,) in archived_tasks)
     completed_tasks = []
-    for task in reversed(task_queue.get_completed_tasks()):
-        completed_tasks.append({"name": task['task']})
+    for task in reversed(page_tasks):
+        completed_tasks.append({"name": task})
 
     return {
         "tasks": tasks,
-        "completed_tasks": completed_tasks
-    }
\ No newline at end of file
+        "completed_tasks": completed_tasks,
+        "completed_task_count": len(queued_tasks) + archived_count,
+        "page": page,
+        "page_size": page_size
+    }
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 from pydantic_sqlalchemy import sqlalchemy_to_pydantic
-from superagi.models.configuration import Configuration
+from superagi.models.configuration import Configuration, ModelApiKeyCache
 from superagi.models.organisation import Organisation
 from fastapi_sqlalchemy import db
 from fastapi import HTTPException, Depends, Request
@@ -49,6 +49,8 @@ def create_config(config: sqlalchemy_to_pydantic(Configuration, exclude=["id"]),
         existing_config.value = config.value
         db.session.commit()
         db.session.flush()
+        if config.key == "model_api_key":
+            ModelApiKeyCache.invalidate(organisation_id)
         return existing_config
 
     logger.info("NEW CONFIG")
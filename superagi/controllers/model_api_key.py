@@ -0,0 +1,93 @@
+from fastapi import APIRouter
+from fastapi import HTTPException, Depends
+from fastapi_jwt_auth import AuthJWT
+from fastapi_sqlalchemy import db
+from pydantic_sqlalchemy import sqlalchemy_to_pydantic
+
+from superagi.helper.auth import check_auth, get_user_organisation
+from superagi.helper.encyption_helper import encrypt_data, decrypt_data
+from superagi.llms.api_key_pool import ApiKeyPool
+from superagi.models.configuration import Configuration
+from superagi.models.model_api_key import ModelApiKey
+from superagi.models.organisation import Organisation
+
+router = APIRouter()
+
+ModelApiKeyIn = sqlalchemy_to_pydantic(ModelApiKey, exclude=["id", "organisation_id"])
+
+
+def get_organisation_or_404(organisation_id: int) -> Organisation:
+    db_organisation = db.session.query(Organisation).filter(Organisation.id == organisation_id).first()
+    if not db_organisation:
+        raise HTTPException(status_code=404, detail="Organisation not found")
+    return db_organisation
+
+
+@router.post("/add/organisation/{organisation_id}", status_code=201)
+def create_model_api_key(model_api_key: ModelApiKeyIn, organisation_id: int, Authorize: AuthJWT = Depends(check_auth)):
+    """
+    Adds an api key to the key pool of an organisation.
+
+    Args:
+        model_api_key (ModelApiKey): The name, value, comma separated allowed models and weight of the key.
+        organisation_id (int): ID of the organisation.
+
+    Returns:
+        dict: The created key, with its value masked.
+    """
+    get_organisation_or_404(organisation_id)
+    if not model_api_key.value:
+        raise HTTPException(status_code=400, detail="Api key value is required")
+    if model_api_key.weight is not None and model_api_key.weight < 0:
+        raise HTTPException(status_code=400, detail="Api key weight can not be negative")
+
+    db_model_api_key = ModelApiKey(organisation_id=organisation_id, name=model_api_key.name,
+                                   value=encrypt_data(model_api_key.value), models=model_api_key.models,
+                                   weight=1 if model_api_key.weight is None else model_api_key.weight)
+    db.session.add(db_model_api_key)
+    db.session.commit()
+    return {"id": db_model_api_key.id, "name": db_model_api_key.name, "value": "..." + model_api_key.value[-4:],
+            "models": db_model_api_key.get_models(), "weight": db_model_api_key.weight}
+
+
+@router.get("/get/organisation/{organisation_id}", status_code=200)
+def get_model_api_keys(organisation_id: int, Authorize: AuthJWT = Depends(check_auth)):
+    """
+    Get the key pool of an organisation with the utilization of every key.
+
+    Args:
+        organisation_id (int): ID of the organisation.
+
+    Returns:
+        List[dict]: The keys, the `model_api_key` configuration first, with their masked value, whether
+            they are quarantined, the part of their quota left and their requests, tokens and errors.
+    """
+    get_organisation_or_404(organisation_id)
+    config = db.session.query(Configuration).filter(Configuration.organisation_id == organisation_id,
+                                                    Configuration.key == "model_api_key").first()
+    model_api_keys = db.session.query(ModelApiKey).filter(ModelApiKey.organisation_id == organisation_id).all()
+    default_api_key = decrypt_data(config.value) if config is not None and config.value else None
+    return ApiKeyPool.from_model_api_keys(model_api_keys, default_api_key).get_utilization()
+
+
+@router.delete("/delete/{model_api_key_id}", status_code=200)
+def delete_model_api_key(model_api_key_id: int, organisation: Organisation = Depends(get_user_organisation)):
+    """
+    Removes an api key from the key pool of the organisation of the user.
+
+    Args:
+        model_api_key_id (int): ID of the key.
+
+    Returns:
+        dict: The ID of the removed key.
+
+    Raises:
+        HTTPException (status_code=404): If the organisation of the user has no key with this ID.
+    """
+    db_model_api_key = db.session.query(ModelApiKey).filter(ModelApiKey.id == model_api_key_id,
+                                                            ModelApiKey.organisation_id == organisation.id).first()
+    if not db_model_api_key:
+        raise HTTPException(status_code=404, detail="Model api key not found")
+    db.session.delete(db_model_api_key)
+    db.session.commit()
+    return {"id": model_api_key_id}
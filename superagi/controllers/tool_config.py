@@ -8,6 +8,7 @@ from superagi.helper.auth import get_user_organisation
 from superagi.models.organisation import Organisation
 from superagi.models.tool_config import ToolConfig
 from superagi.models.toolkit import Toolkit
+from superagi.tools.tool_pool import ToolPool
 
 router = APIRouter()
 
@@ -48,6 +49,7 @@ def update_tool_config(toolkit_name: str, configs: list, organisation: Organisat
                     # Update existing tool config
                     tool_config.value = value
                     db.session.commit()
+        ToolPool.invalidate_toolkit(toolkit.id)
 
         return {"message": "Tool configs updated successfully"}
 
@@ -94,6 +96,7 @@ def create_or_update_tool_config(toolkit_name: str, tool_configs,
 
     db.session.commit()
     db.session.refresh(toolkit)
+    ToolPool.invalidate_toolkit(toolkit.id)
 
     return toolkit
 
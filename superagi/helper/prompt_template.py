@@ -0,0 +1,67 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Union
+
+PLACEHOLDER_PATTERN = re.compile(r"\{(\w+)\}")
+
+
+class Placeholder(str):
+    """Name of a variable slot in a compiled prompt template."""
+
+
+class PromptTemplate:
+    """
+    A prompt parsed once into literal segments and variable placeholders like `{goals}`, so that
+    rendering only fills the dynamic slots instead of scanning the whole prompt once per variable.
+
+    Attributes:
+        template (str): The raw prompt.
+        segments (List[Union[str, Placeholder]]): The literal text and placeholders in prompt order.
+        variables (set): The names of the placeholders found in the prompt.
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        self.segments: List[Union[str, Placeholder]] = []
+        position = 0
+        for match in PLACEHOLDER_PATTERN.finditer(template):
+            if match.start() > position:
+                self.segments.append(template[position:match.start()])
+            self.segments.append(Placeholder(match.group(1)))
+            position = match.end()
+        if position < len(template):
+            self.segments.append(template[position:])
+        self.variables = {segment for segment in self.segments if isinstance(segment, Placeholder)}
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def compile(template: str) -> "PromptTemplate":
+        """
+        Returns the compiled template of a prompt, prompts are parsed once per process.
+
+        Args:
+            template (str): The raw prompt.
+
+        Returns:
+            PromptTemplate: The compiled template.
+        """
+        return PromptTemplate(template)
+
+    def render(self, values: Dict[str, str]) -> str:
+        """
+        Fills the placeholders with the given values. Placeholders without a value are kept as they are
+        so that a prompt can be rendered in several passes.
+
+        Args:
+            values (Dict[str, str]): The values of the placeholders.
+
+        Returns:
+            str: The rendered prompt.
+        """
+        parts = []
+        for segment in self.segments:
+            if isinstance(segment, Placeholder):
+                parts.append(values[segment] if segment in values else "{" + segment + "}")
+            else:
+                parts.append(segment)
+        return "".join(parts)
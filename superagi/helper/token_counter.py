@@ -1,11 +1,34 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
 from typing import List
 
 import tiktoken
 
+from superagi.config.config import get_config
 from superagi.types.common import BaseMessage
 from superagi.lib.logger import logger
 
+MODEL_TOKEN_LIMITS = {"gpt-3.5-turbo-0301": 4032, "gpt-4-0314": 8092, "gpt-3.5-turbo": 4032, "gpt-4": 8092,
+                      "gpt-3.5-turbo-16k": 16184, "gpt-4-32k": 32768, "gpt-4-32k-0314": 32768}
+MODEL_TOKENS_PER_MESSAGE = {"gpt-3.5-turbo-0301": 4, "gpt-4-0314": 3, "gpt-3.5-turbo": 4, "gpt-4": 3,
+                            "gpt-3.5-turbo-16k": 4, "gpt-4-32k": 3, "gpt-4-32k-0314": 3}
+DEFAULT_ENCODING = "cl100k_base"
+
+# tiktoken reads its BPE files from this directory before trying to download them, bundling the
+# files there (see the Dockerfiles) lets workers start without network access to the BPE host.
+if get_config("TIKTOKEN_CACHE_DIR") is not None and "TIKTOKEN_CACHE_DIR" not in os.environ:
+    os.environ["TIKTOKEN_CACHE_DIR"] = str(get_config("TIKTOKEN_CACHE_DIR"))
+
+
 class TokenCounter:
+    _encodings = {}
+    _encodings_lock = threading.Lock()
+    _token_count_cache = OrderedDict()
+    _token_count_cache_lock = threading.Lock()
+    _token_count_cache_size = int(get_config("TOKEN_COUNT_CACHE_SIZE", 4096))
+
     @staticmethod
     def token_limit(model: str = "gpt-3.5-turbo-0301") -> int:
         """
@@ -21,12 +44,126 @@ class TokenCounter:
             int: The token limit.
         """
         try:
-            model_token_limit_dict = {"gpt-3.5-turbo-0301": 4032, "gpt-4-0314": 8092, "gpt-3.5-turbo": 4032, "gpt-4": 8092,"gpt-3.5-turbo-16k": 16184, "gpt-4-32k": 32768, "gpt-4-32k-0314": 32768}
-            return model_token_limit_dict[model]
+            return MODEL_TOKEN_LIMITS[model]
         except KeyError:
             logger.warning("Warning: model not found. Using cl100k_base encoding.")
             return 8092
 
+    @staticmethod
+    def tokens_per_message(model: str = "gpt-3.5-turbo-0301") -> int:
+        """
+        Function to return the number of tokens the chat format adds for every message.
+
+        Args:
+            model (str): The model to return the per message overhead for.
+
+        Raises:
+            KeyError: If the model is not found.
+
+        Returns:
+            int: The number of tokens added per message.
+        """
+        return MODEL_TOKENS_PER_MESSAGE[model]
+
+    @staticmethod
+    def get_encoding(model: str = "gpt-3.5-turbo-0301") -> tiktoken.Encoding:
+        """
+        Function to return the encoding of a model. Encoders are resolved once per model and reused.
+
+        Args:
+            model (str): The model, or the name of an encoding, to return the encoding for.
+
+        Returns:
+            tiktoken.Encoding: The encoding of the model.
+        """
+        encoding = TokenCounter._encodings.get(model)
+        if encoding is not None:
+            return encoding
+        with TokenCounter._encodings_lock:
+            if model not in TokenCounter._encodings:
+                try:
+                    encoding = tiktoken.encoding_for_model(model)
+                except KeyError:
+                    if model not in tiktoken.list_encoding_names():
+                        logger.warning("Warning: model not found. Using cl100k_base encoding.")
+                        model_encoding = DEFAULT_ENCODING
+                    else:
+                        model_encoding = model
+                    encoding = tiktoken.get_encoding(model_encoding)
+                TokenCounter._encodings[model] = encoding
+            return TokenCounter._encodings[model]
+
+    @staticmethod
+    def _cache_key(encoding: tiktoken.Encoding, content: str):
+        return encoding.name, hashlib.sha1(content.encode("utf-8", "surrogatepass")).digest()
+
+    @staticmethod
+    def _get_cached_count(key):
+        with TokenCounter._token_count_cache_lock:
+            count = TokenCounter._token_count_cache.get(key)
+            if count is not None:
+                TokenCounter._token_count_cache.move_to_end(key)
+            return count
+
+    @staticmethod
+    def _set_cached_count(key, count: int):
+        if TokenCounter._token_count_cache_size <= 0:
+            return
+        with TokenCounter._token_count_cache_lock:
+            TokenCounter._token_count_cache[key] = count
+            TokenCounter._token_count_cache.move_to_end(key)
+            while len(TokenCounter._token_count_cache) > TokenCounter._token_count_cache_size:
+                TokenCounter._token_count_cache.popitem(last=False)
+
+    @staticmethod
+    def count_content_tokens(content: str, model: str = "gpt-3.5-turbo-0301") -> int:
+        """
+        Function to count the number of tokens in the content of a single message, without the per
+        message overhead. This is the value stored alongside agent execution feeds.
+
+        Args:
+            content (str): The message content to count the tokens for.
+            model (str): The model to count the tokens for.
+
+        Returns:
+            int: The number of tokens in the content.
+        """
+        return TokenCounter._count_tokens(TokenCounter.get_encoding(model), content)
+
+    @staticmethod
+    def _count_tokens(encoding: tiktoken.Encoding, content: str) -> int:
+        key = TokenCounter._cache_key(encoding, content)
+        count = TokenCounter._get_cached_count(key)
+        if count is None:
+            count = len(encoding.encode(content))
+            TokenCounter._set_cached_count(key, count)
+        return count
+
+    @staticmethod
+    def count_many(contents: List[str], model: str = "gpt-3.5-turbo-0301") -> List[int]:
+        """
+        Function to count the tokens of many texts at once. Texts that are not cached yet are encoded
+        in a single batch spread over tiktoken's thread pool.
+
+        Args:
+            contents (List[str]): The texts to count the tokens for.
+            model (str): The model to count the tokens for.
+
+        Returns:
+            List[int]: The number of tokens of every text, in the same order.
+        """
+        encoding = TokenCounter.get_encoding(model)
+        keys = [TokenCounter._cache_key(encoding, content) for content in contents]
+        counts = [TokenCounter._get_cached_count(key) for key in keys]
+        missing = [index for index, count in enumerate(counts) if count is None]
+        if len(missing) > 0:
+            num_threads = int(get_config("TOKEN_COUNT_THREADS", 8))
+            encoded = encoding.encode_batch([contents[index] for index in missing], num_threads=num_threads)
+            for index, tokens in zip(missing, encoded):
+                counts[index] = len(tokens)
+                TokenCounter._set_cached_count(keys[index], counts[index])
+        return counts
+
     @staticmethod
     def count_message_tokens(messages: List[BaseMessage], model: str = "gpt-3.5-turbo-0301") -> int:
         """
@@ -42,30 +179,9 @@ class TokenCounter:
         Returns:
             int: The number of tokens in the messages.
         """
-        try:
-            model_token_per_message_dict = {"gpt-3.5-turbo-0301": 4, "gpt-4-0314": 3, "gpt-3.5-turbo": 4, "gpt-4": 3,"gpt-3.5-turbo-16k":4, "gpt-4-32k": 3, "gpt-4-32k-0314": 3}
-            encoding = tiktoken.encoding_for_model(model)
-        except KeyError:
-            logger.warning("Warning: model not found. Using cl100k_base encoding.")
-            encoding = tiktoken.get_encoding("cl100k_base")
-
-        tokens_per_message = model_token_per_message_dict[model]
-        if tokens_per_message is None:
-            raise NotImplementedError(
-                f"num_tokens_from_messages() is not implemented for model {model}.\n"
-                " See https://github.com/openai/openai-python/blob/main/chatml.md for"
-                " information on how messages are converted to tokens."
-            )
-
-        num_tokens = 0
-        for message in messages:
-            if isinstance(message, str):
-                message = {'content': message}
-            num_tokens += tokens_per_message
-            num_tokens += len(encoding.encode(message['content']))
-
-        num_tokens += 3
-        return num_tokens
+        tokens_per_message = TokenCounter.tokens_per_message(model)
+        contents = [message if isinstance(message, str) else message['content'] for message in messages]
+        return sum(TokenCounter.count_many(contents, model)) + tokens_per_message * len(contents) + 3
 
     @staticmethod
     def count_text_tokens(message: str) -> int:
@@ -78,6 +194,5 @@ class TokenCounter:
         Returns:
             int: The number of tokens in the text.
         """
-        encoding = tiktoken.get_encoding("cl100k_base")
-        num_tokens = len(encoding.encode(message)) + 4
+        num_tokens = TokenCounter._count_tokens(TokenCounter.get_encoding(DEFAULT_ENCODING), message) + 4
         return num_tokens
@@ -0,0 +1,153 @@
+import json
+import re
+
+IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_$][\w$]*")
+VALID_ESCAPES = '"\\/bfnrtu'
+PYTHON_LITERALS = {"True": "true", "False": "false", "None": "null"}
+CONTROL_CHARACTER_ESCAPES = {"\n": "\\n", "\r": "\\r", "\t": "\\t", "\b": "\\b", "\f": "\\f"}
+
+
+class TolerantJsonParser:
+    """
+    Parses the json replies of llms. Valid json is parsed by the standard library right away, otherwise
+    the reply is repaired in a single scan and parsed once. The repairs cover the usual defects of llm
+    replies: code fences or prose around the json, trailing commas, unquoted keys, single quoted
+    strings, comments, python literals, raw newlines or invalid escapes in strings and unbalanced braces.
+    """
+
+    @classmethod
+    def loads(cls, text: str):
+        """
+        Parses a json document, repairing it if needed.
+
+        Args:
+            text (str): The reply holding the json document.
+
+        Returns:
+            The parsed document.
+
+        Raises:
+            ValueError: If the document can not be repaired.
+        """
+        try:
+            return json.loads(text, strict=False)
+        except ValueError:
+            pass
+        try:
+            return json.loads(cls.repair(text), strict=False)
+        except json.JSONDecodeError as error:
+            raise ValueError(f"Could not parse invalid json: {error}") from error
+
+    @classmethod
+    def repair(cls, text: str) -> str:
+        """
+        Rewrites the first json object (or array when there is no object) of a text as valid json.
+
+        Args:
+            text (str): The text holding the json document.
+
+        Returns:
+            str: The repaired json, it may still be invalid if the document is too broken.
+        """
+        start = text.find("{")
+        if start == -1:
+            start = text.find("[")
+        if start == -1:
+            return text
+
+        output = []
+        # one entry per open container: [closing char, whether an object key is expected]
+        stack = []
+        quote = None
+        index = start
+        length = len(text)
+        while index < length:
+            char = text[index]
+            if quote is not None:
+                if char == "\\":
+                    next_char = text[index + 1] if index + 1 < length else ""
+                    if next_char == "'":
+                        output.append("'")
+                        index += 2
+                        continue
+                    if next_char != "" and next_char in VALID_ESCAPES:
+                        output.append(char + next_char)
+                        index += 2
+                        continue
+                    output.append("\\\\")
+                elif char == quote:
+                    output.append('"')
+                    quote = None
+                elif char == '"':
+                    output.append('\\"')
+                elif char in CONTROL_CHARACTER_ESCAPES:
+                    output.append(CONTROL_CHARACTER_ESCAPES[char])
+                else:
+                    output.append(char)
+                index += 1
+                continue
+
+            if char in "\"'":
+                quote = char
+                output.append('"')
+                if len(stack) > 0 and stack[-1][1]:
+                    stack[-1][1] = False
+            elif char in "{[":
+                stack.append(["}" if char == "{" else "]", char == "{"])
+                output.append(char)
+            elif char in "}]":
+                if not any(closing == char for closing, _ in stack):
+                    # a stray closing brace, e.g. one too many at the end of the reply
+                    index += 1
+                    continue
+                cls._remove_trailing_comma(output)
+                while stack[-1][0] != char:
+                    output.append(stack.pop()[0])
+                output.append(stack.pop()[0])
+                if len(stack) == 0:
+                    break
+            elif char == ",":
+                output.append(char)
+                if len(stack) > 0 and stack[-1][0] == "}":
+                    stack[-1][1] = True
+            elif char == "/" and text.startswith("//", index):
+                end = text.find("\n", index)
+                index = length if end == -1 else end
+                continue
+            elif char == "/" and text.startswith("/*", index):
+                end = text.find("*/", index + 2)
+                index = length if end == -1 else end + 2
+                continue
+            elif char == "`":
+                # the closing code fence of a reply whose braces are unbalanced
+                break
+            else:
+                match = IDENTIFIER_PATTERN.match(text, index) if char.isalpha() or char in "_$" else None
+                if match is None:
+                    output.append(char)
+                    index += 1
+                    continue
+                identifier = match.group(0)
+                if len(stack) > 0 and stack[-1][1]:
+                    output.append('"' + identifier + '"')
+                    stack[-1][1] = False
+                else:
+                    output.append(PYTHON_LITERALS.get(identifier, identifier))
+                index = match.end()
+                continue
+            index += 1
+
+        if quote is not None:
+            output.append('"')
+        cls._remove_trailing_comma(output)
+        while len(stack) > 0:
+            output.append(stack.pop()[0])
+        return "".join(output)
+
+    @staticmethod
+    def _remove_trailing_comma(output: list):
+        position = len(output) - 1
+        while position >= 0 and output[position].isspace():
+            position -= 1
+        if position >= 0 and output[position] == ",":
+            del output[position:]
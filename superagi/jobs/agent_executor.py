@@ -1,21 +1,27 @@
-import importlib
+import time
 from datetime import datetime, timedelta
 
 from fastapi import HTTPException
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import and_
+from sqlalchemy.orm import sessionmaker, scoped_session
 
 import superagi.worker
+from superagi.agent.agent_cache import AgentConfigCache, AgentWorkflowGraph
+from superagi.agent.agent_execution_unit_of_work import AgentExecutionUnitOfWork
 from superagi.agent.super_agi import SuperAgi
 from superagi.config.config import get_config
-from superagi.helper.encyption_helper import decrypt_data
 from superagi.lib.logger import logger
+from superagi.lib.tracing import IterationTrace
+from superagi.llms.api_key_pool import ApiKeyPool
+from superagi.llms.async_openai import AsyncOpenAi
+from superagi.llms.cached_llm import CachedLlm, AGENT_SCOPE
 from superagi.llms.openai import OpenAi
 from superagi.models.agent import Agent
 from superagi.models.agent_execution import AgentExecution
 from superagi.models.agent_execution_feed import AgentExecutionFeed
 from superagi.models.agent_execution_permission import AgentExecutionPermission
 from superagi.models.agent_workflow_step import AgentWorkflowStep
-from superagi.models.configuration import Configuration
+from superagi.models.configuration import Configuration, ModelApiKeyCache
 from superagi.models.db import connect_db
 from superagi.models.organisation import Organisation
 from superagi.models.project import Project
@@ -24,14 +30,17 @@ from superagi.models.tool_config import ToolConfig
 from superagi.tools.base_tool import BaseToolkitConfiguration
 from superagi.resource_manager.manager import ResourceManager
 from superagi.tools.thinking.tools import ThinkingTool
+from superagi.tools.tool_pool import ToolClassRegistry, ToolPool
 from superagi.tools.tool_response_query_manager import ToolResponseQueryManager
+from superagi.vector_store.embedding.cached_embedding import CachedEmbedding
 from superagi.vector_store.embedding.openai import OpenAiEmbedding
 from superagi.vector_store.vector_factory import VectorFactory
 import yaml
 # from superagi.helper.tool_helper import get_tool_config_by_key
 
 engine = connect_db()
-Session = sessionmaker(bind=engine)
+# one session per task, removed by the worker once the task is over
+Session = scoped_session(sessionmaker(bind=engine))
 
 
 class DBToolkitConfiguration(BaseToolkitConfiguration):
@@ -41,11 +50,23 @@ class DBToolkitConfiguration(BaseToolkitConfiguration):
     def __init__(self, session=None, toolkit_id=None):
         self.session = session
         self.toolkit_id = toolkit_id
+        # the configurations of the toolkit once loaded, read without the session afterwards
+        self.tool_configs = None
+
+    def load_tool_configs(self):
+        """Reads every configuration of the toolkit, so that tools run in other threads do not use the session."""
+        if self.tool_configs is None:
+            self.tool_configs = {tool_config.key: tool_config.value for tool_config in
+                                 self.session.query(ToolConfig).filter_by(toolkit_id=self.toolkit_id).all()}
 
     def get_tool_config(self, key: str):
-        tool_config = self.session.query(ToolConfig).filter_by(key=key, toolkit_id=self.toolkit_id).first()
-        if tool_config and tool_config.value:
-            return tool_config.value
+        if self.tool_configs is not None:
+            value = self.tool_configs.get(key)
+        else:
+            tool_config = self.session.query(ToolConfig).filter_by(key=key, toolkit_id=self.toolkit_id).first()
+            value = tool_config.value if tool_config else None
+        if value:
+            return value
         return super().get_tool_config(key=key)
 
 class AgentExecutor:
@@ -85,11 +106,8 @@ class AgentExecutor:
 
         # module_name = f"superagi.tools.{folder_name}.{file_name}"
 
-        # Load the module dynamically
-        module = importlib.import_module(module_name)
-
-        # Get the class from the loaded module
-        obj_class = getattr(module, tool.class_name)
+        # the module is imported and the class resolved once per process
+        obj_class = ToolClassRegistry.get_tool_class(module_name, tool.class_name)
 
         # Create an instance of the class
         new_object = obj_class()
@@ -99,7 +117,8 @@ class AgentExecutor:
     @staticmethod
     def get_model_api_key_from_execution(agent_execution, session):
         """
-        Get the model API key from the agent execution.
+        Get the model API key from the agent execution. The agent, its project, organisation and key
+        are read in one query and the decrypted key is cached per organisation.
 
         Args:
             agent_execution (AgentExecution): The agent execution.
@@ -108,22 +127,24 @@ class AgentExecutor:
         Returns:
             str: The model API key.
         """
-        agent_id = agent_execution.agent_id
-        agent = session.query(Agent).filter(Agent.id == agent_id).first()
-        if not agent:
+        row = session.query(Agent.id, Project.id, Organisation.id, Configuration.id, Configuration.value) \
+            .select_from(Agent) \
+            .outerjoin(Project, Project.id == Agent.project_id) \
+            .outerjoin(Organisation, Organisation.id == Project.organisation_id) \
+            .outerjoin(Configuration, and_(Configuration.organisation_id == Organisation.id,
+                                           Configuration.key == "model_api_key")) \
+            .filter(Agent.id == agent_execution.agent_id) \
+            .first()
+        if row is None:
             raise HTTPException(status_code=404, detail="Agent not found")
-        project = session.query(Project).filter(Project.id == agent.project_id).first()
-        if not project:
+        _, project_id, organisation_id, config_id, encrypted_key = row
+        if project_id is None:
             raise HTTPException(status_code=404, detail="Project not found")
-        organisation = session.query(Organisation).filter(Organisation.id == project.organisation_id).first()
-        if not organisation:
+        if organisation_id is None:
             raise HTTPException(status_code=404, detail="Organisation not found")
-        config = session.query(Configuration).filter(Configuration.organisation_id == organisation.id,
-                                                     Configuration.key == "model_api_key").first()
-        if not config:
+        if config_id is None:
             raise HTTPException(status_code=404, detail="Configuration not found")
-        model_api_key = decrypt_data(config.value)
-        return model_api_key
+        return ModelApiKeyCache.get_decrypted_key(organisation_id, encrypted_key)
 
     def execute_next_action(self, agent_execution_id):
         """
@@ -135,10 +156,15 @@ class AgentExecutor:
         Returns:
             None
         """
-        global engine
-        # try:
-        engine.dispose()
         session = Session()
+        try:
+            return self._execute_next_action(session, agent_execution_id)
+        finally:
+            # the connection goes back to the pool on every path, early returns included
+            Session.remove()
+
+    def _execute_next_action(self, session, agent_execution_id):
+        bootstrap_started_at = time.perf_counter()
         agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
         '''Avoiding running old agent executions'''
         if agent_execution.created_at < datetime.utcnow() - timedelta(days=1):
@@ -156,7 +182,7 @@ class AgentExecutor:
             ThinkingTool()
         ]
 
-        parsed_config = Agent.fetch_configuration(session, agent.id)
+        parsed_config = AgentConfigCache.get_configuration(session, agent.id)
         max_iterations = (parsed_config["max_iterations"])
         total_calls = agent_execution.num_of_calls
 
@@ -168,63 +194,170 @@ class AgentExecutor:
             return "ITERATION_LIMIT_CROSSED"
 
         parsed_config["agent_execution_id"] = agent_execution.id
+        parsed_config["history_summary"] = agent_execution.history_summary
+        parsed_config["last_summarized_feed_id"] = agent_execution.last_summarized_feed_id
 
         model_api_key = AgentExecutor.get_model_api_key_from_execution(agent_execution, session)
+        api_key_pool = ApiKeyPool.for_agent(session, agent.id, model_api_key)
 
         try:
             if parsed_config["LTM_DB"] == "Pinecone":
                 memory = VectorFactory.get_vector_storage("PineCone", "super-agent-index1",
-                                                          OpenAiEmbedding(model_api_key))
+                                                          CachedEmbedding.wrap(OpenAiEmbedding(model_api_key)))
             else:
                 memory = VectorFactory.get_vector_storage("PineCone", "super-agent-index1",
-                                                          OpenAiEmbedding(model_api_key))
+                                                          CachedEmbedding.wrap(OpenAiEmbedding(model_api_key)))
         except:
             logger.info("Unable to setup the pinecone connection...")
             memory = None
 
         user_tools = session.query(Tool).filter(Tool.id.in_(parsed_config["tools"])).all()
+        toolkit_versions = ToolPool.get_toolkit_versions({tool.toolkit_id for tool in user_tools})
+        pooled_tools = []
         for tool in user_tools:
-            tool = AgentExecutor.create_object(tool,session)
-            tools.append(tool)
+            version = toolkit_versions.get(tool.toolkit_id)
+            agent_tool = ToolPool.acquire(tool.id, version)
+            if agent_tool is None:
+                agent_tool = AgentExecutor.create_object(tool, session)
+            else:
+                agent_tool.toolkit_config = DBToolkitConfiguration(session=session, toolkit_id=tool.toolkit_id)
+            pooled_tools.append((tool.id, version, agent_tool))
+            tools.append(agent_tool)
 
         tools = self.set_default_params_tools(tools, parsed_config, agent_execution.agent_id,
-                                              model_api_key=model_api_key, session=session)
+                                              model_api_key=model_api_key, session=session,
+                                              api_key_pool=api_key_pool)
 
 
         spawned_agent = SuperAgi(ai_name=parsed_config["name"], ai_role=parsed_config["description"],
-                                 llm=OpenAi(model=parsed_config["model"], api_key=model_api_key), tools=tools,
+                                 llm=CachedLlm.wrap(self.get_llm_class()(model=parsed_config["model"],
+                                                                          api_key=model_api_key,
+                                                                          api_key_pool=api_key_pool), AGENT_SCOPE),
+                                 tools=tools,
                                  memory=memory,
                                  agent_config=parsed_config)
 
         try:
             self.handle_wait_for_permission(agent_execution, spawned_agent, session)
         except ValueError:
+            self.release_tools(pooled_tools)
             return
 
-        agent_workflow_step = session.query(AgentWorkflowStep).filter(
-            AgentWorkflowStep.id == agent_execution.current_step_id).first()
-        response = spawned_agent.execute(agent_workflow_step)
-        if "retry" in response and response["retry"]:
-            response = spawned_agent.execute(agent_workflow_step)
-        agent_execution.current_step_id = agent_workflow_step.next_step_id
-        session.commit()
-        if response["result"] == "COMPLETE":
-            db_agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
-            db_agent_execution.status = "COMPLETED"
-            session.commit()
-        elif response["result"] == "WAITING_FOR_PERMISSION":
-            db_agent_execution = session.query(AgentExecution).filter(AgentExecution.id == agent_execution_id).first()
-            db_agent_execution.status = "WAITING_FOR_PERMISSION"
-            db_agent_execution.permission_id = response.get("permission_id", None)
-            session.commit()
-        else:
-            logger.info(f"Starting next job for agent execution id: {agent_execution_id}")
-            superagi.worker.execute_agent.delay(agent_execution_id, datetime.now())
+        time_slice = AgentExecutor.get_warm_session_time_slice()
+        session_started_at = time.monotonic()
+        unit_of_work = AgentExecutionUnitOfWork(agent_execution.id, agent_execution.agent_id)
+        workflow_graph = AgentWorkflowGraph.get(session, agent.agent_workflow_id)
+        current_step_id = agent_execution.current_step_id
+        bootstrap_time = time.perf_counter() - bootstrap_started_at
+        while True:
+            # the setup of the job is accounted to its first iteration
+            trace = IterationTrace(agent_execution.id)
+            trace.add("bootstrap", bootstrap_time)
+            bootstrap_time = 0.0
+            with trace.activate():
+                with trace.span("feed_fetch"):
+                    agent_workflow_step = workflow_graph.get_step(current_step_id)
+                    if agent_workflow_step is None:
+                        agent_workflow_step = session.query(AgentWorkflowStep).filter(
+                            AgentWorkflowStep.id == current_step_id).first()
+                try:
+                    response = spawned_agent.execute(agent_workflow_step, unit_of_work)
+                    if "retry" in response and response["retry"]:
+                        # the retry has to see the feeds of the failed attempt
+                        unit_of_work.flush(session)
+                        response = spawned_agent.execute(agent_workflow_step, unit_of_work)
+                except Exception:
+                    unit_of_work.flush(session)
+                    trace.save()
+                    raise
+                # the feeds, token usage and state changes of the iteration are written in one transaction
+                current_step_id = agent_workflow_step.next_step_id
+                unit_of_work.set_execution_fields(current_step_id=current_step_id)
+                if response["result"] == "COMPLETE":
+                    unit_of_work.set_execution_fields(status="COMPLETED")
+                elif response["result"] == "WAITING_FOR_PERMISSION":
+                    unit_of_work.set_execution_fields(status="WAITING_FOR_PERMISSION",
+                                                      permission_id=response.get("permission_id", None))
+                unit_of_work.flush(session)
+            trace.save()
+            if response["result"] in ("COMPLETE", "WAITING_FOR_PERMISSION"):
+                break
+            if time.monotonic() - session_started_at < time_slice and \
+                    self.can_continue_warm_session(session, agent_execution, max_iterations):
+                logger.info(f"Continuing warm session for agent execution id: {agent_execution_id}")
+            else:
+                # the status may have been changed by the iteration or by another session meanwhile
+                session.refresh(agent_execution)
+                if agent_execution.status == "RUNNING":
+                    logger.info(f"Starting next job for agent execution id: {agent_execution_id}")
+                    superagi.worker.execute_agent.delay(agent_execution_id, datetime.now())
+                break
+
+        self.release_tools(pooled_tools)
+
+    @staticmethod
+    def release_tools(pooled_tools):
+        """
+        Returns the tools checked out by the job to the tool pool. Tools of a failed job are dropped.
+
+        Args:
+            pooled_tools (list): The (tool id, toolkit config version, tool) of the checked out tools.
+        """
+        for tool_id, version, tool in pooled_tools:
+            ToolPool.release(tool_id, version, tool)
+
+    @staticmethod
+    def get_warm_session_time_slice():
+        """
+        Get the number of seconds a worker may keep iterating an agent execution in-process before
+        re-enqueuing it. A value of 0 disables warm sessions and runs one iteration per task.
+
+        Returns:
+            float: The warm session time slice in seconds.
+        """
+        try:
+            return float(get_config("AGENT_WARM_SESSION_TIME_SLICE", 0) or 0)
+        except (TypeError, ValueError):
+            logger.warning("Invalid AGENT_WARM_SESSION_TIME_SLICE, disabling warm sessions")
+            return 0
+
+    @staticmethod
+    def get_llm_class():
+        """
+        Get the llm client used by agents and their tools. With LLM_ASYNC_CLIENT enabled, the asyncio
+        client with pooled connections and per key concurrency limits is used through its sync facade.
+
+        Returns:
+            type: The llm class.
+        """
+        if str(get_config("LLM_ASYNC_CLIENT", False)).lower() == "true":
+            return AsyncOpenAi
+        return OpenAi
+
+    def can_continue_warm_session(self, session, agent_execution, max_iterations):
+        """
+        Check whether the next iteration can run in the current warm session. The execution is re-read
+        so that pauses, terminations and token/call updates made by other sessions are picked up.
 
-        session.close()
-        engine.dispose()
+        Args:
+            session (Session): The database session.
+            agent_execution (AgentExecution): The agent execution.
+            max_iterations (int): The maximum number of iterations for the agent.
+
+        Returns:
+            bool: True if the next iteration can run in-process.
+        """
+        session.refresh(agent_execution)
+        if agent_execution.status != "RUNNING" or agent_execution.current_step_id is None:
+            return False
+        if max_iterations <= agent_execution.num_of_calls:
+            agent_execution.status = "ITERATION_LIMIT_EXCEEDED"
+            session.commit()
+            logger.info("ITERATION_LIMIT_CROSSED")
+            return False
+        return True
 
-    def set_default_params_tools(self, tools, parsed_config, agent_id, model_api_key, session):
+    def set_default_params_tools(self, tools, parsed_config, agent_id, model_api_key, session, api_key_pool=None):
         """
         Set the default parameters for the tools.
 
@@ -233,29 +366,50 @@ class AgentExecutor:
             parsed_config (dict): The parsed configuration.
             agent_id (int): The ID of the agent.
             model_api_key (str): The API key of the model.
+            api_key_pool (ApiKeyPool): The api keys of the organisation, None if it only has model_api_key.
 
         Returns:
             list: The list of tools with default parameters.
         """
         new_tools = []
+        # the llms and managers hold no per tool state, they are built once and shared by the tools
+        tool_llms = {}
+        image_llm = None
+        resource_manager = None
+        tool_response_manager = None
         for tool in tools:
             if hasattr(tool, 'goals'):
                 tool.goals = parsed_config["goal"]
             if hasattr(tool, 'instructions'):
                 tool.instructions = parsed_config["instruction"]
-            if hasattr(tool, 'llm') and (parsed_config["model"] == "gpt4" or parsed_config["model"] == "gpt-3.5-turbo"):
-                tool.llm = OpenAi(model="gpt-3.5-turbo", api_key=model_api_key, temperature=0.3)
-            elif hasattr(tool, 'llm'):
-                tool.llm = OpenAi(model=parsed_config["model"], api_key=model_api_key, temperature=0.3)
+            if hasattr(tool, 'llm'):
+                # the tools of the scopes cached by similarity get a deterministic llm of their own
+                temperature = CachedLlm.get_temperature(tool.name, 0.3)
+                if temperature not in tool_llms:
+                    if parsed_config["model"] == "gpt4" or parsed_config["model"] == "gpt-3.5-turbo":
+                        tool_llms[temperature] = self.get_llm_class()(model="gpt-3.5-turbo", api_key=model_api_key,
+                                                                      temperature=temperature,
+                                                                      api_key_pool=api_key_pool)
+                    else:
+                        tool_llms[temperature] = self.get_llm_class()(model=parsed_config["model"],
+                                                                      api_key=model_api_key, temperature=temperature,
+                                                                      api_key_pool=api_key_pool)
+                tool.llm = CachedLlm.wrap(tool_llms[temperature], tool.name)
             if hasattr(tool, 'image_llm'):
-                tool.image_llm = OpenAi(model=parsed_config["model"], api_key=model_api_key)
+                if image_llm is None:
+                    image_llm = self.get_llm_class()(model=parsed_config["model"], api_key=model_api_key)
+                tool.image_llm = image_llm
             if hasattr(tool, 'agent_id'):
                 tool.agent_id = agent_id
             if hasattr(tool, 'resource_manager'):
-                tool.resource_manager = ResourceManager(session=session, agent_id=agent_id)
+                if resource_manager is None:
+                    resource_manager = ResourceManager(session=session, agent_id=agent_id)
+                tool.resource_manager = resource_manager
             if hasattr(tool, 'tool_response_manager'):
-                tool.tool_response_manager = ToolResponseQueryManager(session=session, agent_execution_id=parsed_config[
-                    "agent_execution_id"])
+                if tool_response_manager is None:
+                    tool_response_manager = ToolResponseQueryManager(
+                        session=session, agent_execution_id=parsed_config["agent_execution_id"])
+                tool.tool_response_manager = tool_response_manager
 
             new_tools.append(tool)
         return tools
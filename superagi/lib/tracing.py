@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+import numpy as np
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+
+REDIS_KEY_PREFIX = "agent_execution_timings"
+TOTAL_PHASE = "total"
+# time to live of the timings of an execution, refreshed on every iteration
+TIMINGS_TTL = 7 * 24 * 60 * 60
+
+_current_trace: ContextVar[Optional["IterationTrace"]] = ContextVar("current_trace", default=None)
+
+
+def is_tracing_enabled() -> bool:
+    return str(get_config("AGENT_TRACING_ENABLED", True)).lower() == "true"
+
+
+class IterationTrace:
+    """
+    Timing breakdown of one agent iteration. Time spent in each phase, like the llm call or the tool
+    run, is summed over the spans of the phase and the breakdown is appended to the redis stream of
+    the execution once the iteration is over.
+
+    Attributes:
+        agent_execution_id (int): The id of the agent execution.
+        phases (Dict[str, float]): The seconds spent per phase.
+        started_at (float): The start of the iteration, in perf_counter seconds.
+    """
+
+    def __init__(self, agent_execution_id: int):
+        self.agent_execution_id = agent_execution_id
+        self.phases: Dict[str, float] = {}
+        self.started_at = time.perf_counter()
+
+    def add(self, phase: str, seconds: float):
+        """Adds time to a phase, e.g. for work that happened before the trace was created."""
+        self.phases[phase] = self.phases.get(phase, 0.0) + seconds
+
+    @contextmanager
+    def span(self, phase: str):
+        """Times the wrapped block as part of a phase."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - started_at)
+
+    @contextmanager
+    def activate(self):
+        """Makes the trace the target of `trace_span` in the wrapped block."""
+        token = _current_trace.set(self)
+        try:
+            yield self
+        finally:
+            _current_trace.reset(token)
+
+    def to_fields(self) -> Dict[str, float]:
+        """Returns the phases of the iteration and its total duration, in milliseconds."""
+        fields = {phase: round(seconds * 1000, 3) for phase, seconds in self.phases.items()}
+        fields[TOTAL_PHASE] = round((time.perf_counter() - self.started_at) * 1000, 3)
+        return fields
+
+    def save(self, store: "TimingStore" = None):
+        """Appends the breakdown of the iteration to the timings of the execution, if tracing is enabled."""
+        if not is_tracing_enabled():
+            return
+        try:
+            (store or TimingStore()).add(self.agent_execution_id, self.to_fields())
+        except Exception as exception:
+            logger.warning(f"Unable to save the timings of agent execution {self.agent_execution_id}: {exception}")
+
+
+@contextmanager
+def trace_span(phase: str):
+    """
+    Times the wrapped block as part of a phase of the current iteration. It does nothing outside of an
+    active trace, so traced code also runs unchanged in tests and tools. It can be used as a decorator.
+
+    Args:
+        phase (str): The name of the phase, like "llm" or "tool".
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    with trace.span(phase):
+        yield
+
+
+class TimingStore:
+    """Per execution redis streams of iteration timings, capped to the last AGENT_TRACE_MAX_ITERATIONS entries."""
+
+    def __init__(self, redis_url: str = None):
+        redis_url = redis_url or get_config("REDIS_URL")
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+        self.max_iterations = int(get_config("AGENT_TRACE_MAX_ITERATIONS", 1000))
+
+    @staticmethod
+    def _key(agent_execution_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}:{agent_execution_id}"
+
+    def add(self, agent_execution_id: int, fields: Dict[str, float]):
+        key = self._key(agent_execution_id)
+        pipeline = self.db.pipeline()
+        pipeline.xadd(key, fields, maxlen=self.max_iterations, approximate=True)
+        pipeline.expire(key, TIMINGS_TTL)
+        pipeline.execute()
+
+    def get(self, agent_execution_id: int) -> List[Dict[str, float]]:
+        """Returns the timings of the iterations of an execution, oldest first."""
+        return [{phase: float(value) for phase, value in fields.items()}
+                for _, fields in self.db.xrange(self._key(agent_execution_id))]
+
+
+def summarize_timings(iterations: List[Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """
+    Computes the latency percentiles of every phase over the traced iterations.
+
+    Args:
+        iterations (List[Dict[str, float]]): The milliseconds spent per phase, one dict per iteration.
+
+    Returns:
+        Dict[str, Dict[str, float]]: The count, mean, p50 and p95 in milliseconds of every phase.
+    """
+    durations: Dict[str, List[float]] = {}
+    for iteration in iterations:
+        for phase, milliseconds in iteration.items():
+            durations.setdefault(phase, []).append(milliseconds)
+    summary = {}
+    for phase, values in durations.items():
+        values = np.array(values)
+        summary[phase] = {"count": int(values.size),
+                          "mean": round(float(values.mean()), 3),
+                          "p50": round(float(np.percentile(values, 50)), 3),
+                          "p95": round(float(np.percentile(values, 95)), 3)}
+    return summary
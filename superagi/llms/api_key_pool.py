@@ -0,0 +1,266 @@
+import asyncio
+import random
+import threading
+from typing import Awaitable, Callable, Dict, Iterable, List, NamedTuple, Optional
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.helper.encyption_helper import decrypt_data
+from superagi.lib.logger import logger
+from superagi.llms.rate_limiter import LlmRateLimiter, get_key_hash
+from superagi.models.model_api_key import ModelApiKey
+
+QUARANTINE_KEY_PREFIX = "llm_key_quarantine"
+USAGE_KEY_PREFIX = "llm_key_usage"
+USAGE_TTL = 7 * 24 * 60 * 60
+# keys with an exhausted quota keep a small share, their buckets are only refilled on use
+MIN_REMAINING_FRACTION = 0.01
+
+
+class PooledApiKey(NamedTuple):
+    id: Optional[int]
+    name: str
+    value: str
+    models: Optional[List[str]]
+    weight: int
+
+    def allows(self, model: str) -> bool:
+        return self.models is None or model in self.models
+
+    def get_masked_value(self) -> str:
+        return "..." + self.value[-4:]
+
+
+def is_key_error(exception: Exception) -> bool:
+    """Returns True if a request failed because of its api key: invalid, not allowed or out of quota."""
+    http_status = getattr(exception, "http_status", None)
+    return http_status in (401, 403) or (http_status == 429 and
+                                         getattr(exception, "code", None) == "insufficient_quota")
+
+
+class ApiKeyPool:
+    """
+    The model api keys of an organisation, the llm calls are spread over them in proportion to their
+    weight and to the part of their quota left in the rate limiter. A key rejected as invalid or out of
+    quota is quarantined for all workers for LLM_KEY_QUARANTINE_SECONDS and the call moves on to another
+    key. The requests, tokens and errors of every key are counted in redis.
+
+    Attributes:
+        keys (List[PooledApiKey]): The keys of the pool, the `model_api_key` configuration first.
+    """
+    _db = None
+    _decrypted: Dict[str, str] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, keys: List[PooledApiKey]):
+        self.keys = keys
+
+    @classmethod
+    def get_db(cls) -> redis.Redis:
+        if cls._db is None:
+            cls._db = redis.Redis.from_url("redis://" + get_config("REDIS_URL") + "/0", decode_responses=True)
+        return cls._db
+
+    @classmethod
+    def _decrypt(cls, encrypted_key: str) -> str:
+        api_key = cls._decrypted.get(encrypted_key)
+        if api_key is None:
+            api_key = decrypt_data(encrypted_key)
+            with cls._lock:
+                if len(cls._decrypted) >= 1000:
+                    cls._decrypted.clear()
+                cls._decrypted[encrypted_key] = api_key
+        return api_key
+
+    @classmethod
+    def from_model_api_keys(cls, model_api_keys: Iterable[ModelApiKey], default_api_key: str = None) -> "ApiKeyPool":
+        """
+        Builds the pool of an organisation.
+
+        Args:
+            model_api_keys (Iterable[ModelApiKey]): The additional keys of the organisation.
+            default_api_key (str): The decrypted `model_api_key` configuration of the organisation.
+
+        Returns:
+            ApiKeyPool: The pool.
+        """
+        keys = [] if default_api_key is None else [PooledApiKey(None, "model_api_key", default_api_key, None, 1)]
+        for model_api_key in model_api_keys:
+            keys.append(PooledApiKey(model_api_key.id, model_api_key.name, cls._decrypt(model_api_key.value),
+                                     model_api_key.get_models(),
+                                     1 if model_api_key.weight is None else model_api_key.weight))
+        return cls(keys)
+
+    @classmethod
+    def for_agent(cls, session, agent_id: int, default_api_key: str) -> Optional["ApiKeyPool"]:
+        """
+        Returns the pool of the organisation of an agent.
+
+        Args:
+            session (Session): The database session.
+            agent_id (int): The ID of the agent.
+            default_api_key (str): The decrypted `model_api_key` configuration of the organisation.
+
+        Returns:
+            ApiKeyPool: The pool, None if the organisation has no additional keys.
+        """
+        model_api_keys = ModelApiKey.fetch_agent_keys(session, agent_id)
+        if len(model_api_keys) == 0:
+            return None
+        return cls.from_model_api_keys(model_api_keys, default_api_key)
+
+    @staticmethod
+    def _quarantine_key(key: PooledApiKey) -> str:
+        return f"{QUARANTINE_KEY_PREFIX}:{get_key_hash(key.value)}"
+
+    @staticmethod
+    def _usage_key(key: PooledApiKey) -> str:
+        return f"{USAGE_KEY_PREFIX}:{get_key_hash(key.value)}"
+
+    def get_key_states(self, keys: List[PooledApiKey]) -> List[dict]:
+        """
+        Reads the quarantine, rate limiter and usage state of keys in one round trip.
+
+        Args:
+            keys (List[PooledApiKey]): The keys.
+
+        Returns:
+            List[dict]: For every key, whether it is quarantined, the part of its quota left and its usage
+                counters. Keys are seen as available with their whole quota when redis is unavailable.
+        """
+        limiters = [LlmRateLimiter.for_api_key(key.value) for key in keys]
+        try:
+            pipeline = self.get_db().pipeline(transaction=False)
+            for key, limiter in zip(keys, limiters):
+                pipeline.exists(self._quarantine_key(key))
+                pipeline.hgetall(self._usage_key(key))
+                if limiter is not None:
+                    pipeline.hmget(limiter.state_key, "requests", "tokens", "updated_at")
+            results = iter(pipeline.execute())
+        except Exception as exception:
+            logger.warning(f"Unable to read the state of the model api keys: {exception}")
+            return [{"quarantined": False, "remaining_quota": 1.0, "usage": {}} for _ in keys]
+
+        states = []
+        for limiter in limiters:
+            quarantined, usage = next(results), next(results)
+            remaining_quota = 1.0 if limiter is None else limiter.get_remaining_fraction(*next(results))
+            states.append({"quarantined": bool(quarantined), "remaining_quota": remaining_quota,
+                           "usage": {name: int(float(value)) for name, value in usage.items()}})
+        return states
+
+    def select(self, model: str, excluded: Iterable[str] = ()) -> Optional[PooledApiKey]:
+        """
+        Picks the key of the next call to a model.
+
+        Args:
+            model (str): The model of the call.
+            excluded (Iterable[str]): The api keys already rejected during the call.
+
+        Returns:
+            PooledApiKey: The key, None if no key allowed for the model is left.
+        """
+        excluded = set(excluded)
+        candidates = [key for key in self.keys if key.allows(model) and key.value not in excluded]
+        if len(candidates) <= 1:
+            return candidates[0] if len(candidates) == 1 else None
+        states = self.get_key_states(candidates)
+        available = [(key, state) for key, state in zip(candidates, states) if not state["quarantined"]]
+        if len(available) == 0:
+            logger.warning(f"All the api keys allowed for {model} are quarantined, using them anyway")
+            available = list(zip(candidates, states))
+        weights = [max(key.weight, 0) * max(state["remaining_quota"], MIN_REMAINING_FRACTION)
+                   for key, state in available]
+        if sum(weights) == 0:
+            weights = None
+        return random.choices([key for key, _ in available], weights=weights)[0]
+
+    def quarantine(self, key: PooledApiKey, exception: Exception):
+        logger.warning(f"Quarantining the api key {key.name}: {exception}")
+        try:
+            self.get_db().set(self._quarantine_key(key), 1, ex=int(get_config("LLM_KEY_QUARANTINE_SECONDS", 600)))
+        except Exception as redis_exception:
+            logger.warning(f"Unable to quarantine the api key {key.name}: {redis_exception}")
+
+    def record_usage(self, key: PooledApiKey, response: dict = None, exception: Exception = None):
+        """Counts a call of a key, its tokens when it succeeded."""
+        try:
+            usage_key = self._usage_key(key)
+            pipeline = self.get_db().pipeline(transaction=False)
+            pipeline.hincrby(usage_key, "requests", 1)
+            if exception is not None:
+                pipeline.hincrby(usage_key, "errors", 1)
+            else:
+                usage = (response or {}).get("usage") or {}
+                pipeline.hincrby(usage_key, "tokens", int(usage.get("total_tokens") or 0))
+            pipeline.expire(usage_key, USAGE_TTL)
+            pipeline.execute()
+        except Exception as redis_exception:
+            logger.warning(f"Unable to record the usage of the api key {key.name}: {redis_exception}")
+
+    def _on_error(self, key: PooledApiKey, exception: Exception, model: str, tried: List[str]) -> bool:
+        """Records a failed call, returns True if the call can move on to another key."""
+        self.record_usage(key, exception=exception)
+        if not is_key_error(exception):
+            return False
+        self.quarantine(key, exception)
+        tried.append(key.value)
+        return any(other.allows(model) and other.value not in tried for other in self.keys)
+
+    def run(self, model: str, request: Callable[[str], dict]) -> dict:
+        """
+        Runs a request with a key of the pool, moving on to another key if the key is rejected.
+
+        Args:
+            model (str): The model of the request.
+            request (Callable[[str], dict]): The request, given the api key to use and raising on failure.
+
+        Returns:
+            dict: The response of the request.
+        """
+        tried = []
+        while True:
+            key = self.select(model, tried)
+            if key is None:
+                raise ValueError(f"No api key allowed for the model {model}")
+            try:
+                response = request(key.value)
+            except Exception as exception:
+                if self._on_error(key, exception, model, tried):
+                    continue
+                raise
+            self.record_usage(key, response=response)
+            return response
+
+    async def arun(self, model: str, request: Callable[[str], Awaitable[dict]]) -> dict:
+        """
+        Same as `run` for a coroutine function. The redis calls picking the key and recording its usage
+        are made from a thread of the loop's executor, so they do not hold back the other requests of the
+        loop.
+        """
+        tried = []
+        while True:
+            key = await asyncio.to_thread(self.select, model, list(tried))
+            if key is None:
+                raise ValueError(f"No api key allowed for the model {model}")
+            try:
+                response = await request(key.value)
+            except Exception as exception:
+                if await asyncio.to_thread(self._on_error, key, exception, model, tried):
+                    continue
+                raise
+            await asyncio.to_thread(self.record_usage, key, response=response)
+            return response
+
+    def get_utilization(self) -> List[dict]:
+        """
+        Returns the state of every key of the pool.
+
+        Returns:
+            List[dict]: The id, name, masked value, models and weight of every key, whether it is
+                quarantined, the part of its quota left and its requests, tokens and errors.
+        """
+        return [{"id": key.id, "name": key.name, "value": key.get_masked_value(), "models": key.models,
+                 "weight": key.weight, **state}
+                for key, state in zip(self.keys, self.get_key_states(self.keys))]
@@ -0,0 +1,225 @@
+import asyncio
+import os
+import threading
+
+import aiohttp
+from openai.openai_object import OpenAIObject
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+from superagi.llms.base_llm import BaseLlm
+from superagi.llms.rate_limiter import LlmApiError, LlmRateLimitError, LlmRateLimiter
+
+
+class AsyncLlmClientPool:
+    """
+    Process wide asyncio machinery shared by the async llm clients: one event loop running on a
+    daemon thread, one pooled aiohttp session and one concurrency semaphore per api key. The pool is
+    recreated after a fork so that prefork celery workers do not inherit the parent's loop thread.
+    """
+    _lock = threading.Lock()
+    _pid = None
+    _loop = None
+    _session = None
+    _semaphores = {}
+
+    @classmethod
+    def get_loop(cls) -> asyncio.AbstractEventLoop:
+        """
+        Returns the event loop of the process, starting it on first use.
+
+        Returns:
+            asyncio.AbstractEventLoop: The running event loop.
+        """
+        with cls._lock:
+            if cls._loop is None or cls._pid != os.getpid():
+                cls._pid = os.getpid()
+                cls._session = None
+                cls._semaphores = {}
+                cls._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=cls._loop.run_forever, name="llm-event-loop", daemon=True)
+                thread.start()
+            return cls._loop
+
+    @classmethod
+    def get_session(cls) -> aiohttp.ClientSession:
+        """Returns the shared http session, it must be called from the event loop of the pool."""
+        if cls._session is None or cls._session.closed:
+            connector = aiohttp.TCPConnector(limit=int(get_config("LLM_HTTP_POOL_SIZE", 100)))
+            cls._session = aiohttp.ClientSession(connector=connector)
+        return cls._session
+
+    @classmethod
+    def get_semaphore(cls, api_key: str) -> asyncio.Semaphore:
+        """Returns the semaphore bounding the in-flight requests of an api key."""
+        semaphore = cls._semaphores.get(api_key)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(int(get_config("LLM_MAX_CONCURRENT_REQUESTS_PER_KEY", 10)))
+            cls._semaphores[api_key] = semaphore
+        return semaphore
+
+    @classmethod
+    def run(cls, coroutine):
+        """
+        Runs a coroutine on the event loop of the pool and waits for its result. This is the sync
+        facade used by callers that are not async themselves.
+
+        Args:
+            coroutine: The coroutine to run.
+
+        Returns:
+            The result of the coroutine.
+        """
+        return asyncio.run_coroutine_threadsafe(coroutine, cls.get_loop()).result()
+
+
+class AsyncOpenAi(BaseLlm):
+    def __init__(self, api_key, image_model=None, model="gpt-4", temperature=0.6,
+                 max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT"), top_p=1, frequency_penalty=0, presence_penalty=0,
+                 number_of_results=1, request_timeout=None, api_key_pool=None):
+        """
+        Args:
+            api_key (str): The OpenAI API key.
+            image_model (str): The image model.
+            model (str): The model.
+            temperature (float): The temperature.
+            max_tokens (int): The maximum number of tokens.
+            top_p (float): The top p.
+            frequency_penalty (float): The frequency penalty.
+            presence_penalty (float): The presence penalty.
+            number_of_results (int): The number of results.
+            request_timeout (float): The timeout of a request in seconds.
+            api_key_pool (ApiKeyPool): The keys of the organisation the calls are spread over, None to only
+                use api_key.
+        """
+        self.model = model
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.top_p = top_p
+        self.frequency_penalty = frequency_penalty
+        self.presence_penalty = presence_penalty
+        self.number_of_results = number_of_results
+        self.api_key = api_key
+        self.api_key_pool = api_key_pool
+        self.image_model = image_model
+        self.api_base = get_config("OPENAI_API_BASE", "https://api.openai.com/v1")
+        if request_timeout is None:
+            request_timeout = float(get_config("LLM_REQUEST_TIMEOUT", 600))
+        self.request_timeout = request_timeout
+
+    def get_model(self):
+        """
+        Returns:
+            str: The model.
+        """
+        return self.model
+
+    def get_image_model(self):
+        """
+        Returns:
+            str: The image model.
+        """
+        return self.image_model
+
+    async def _post(self, path: str, payload: dict, api_key: str = None) -> dict:
+        api_key = api_key or self.api_key
+        session = AsyncLlmClientPool.get_session()
+        headers = {"Authorization": f"Bearer {api_key}"}
+        async with AsyncLlmClientPool.get_semaphore(api_key):
+            async with session.post(self.api_base.rstrip("/") + path, json=payload, headers=headers,
+                                    timeout=aiohttp.ClientTimeout(total=self.request_timeout)) as response:
+                body = await response.json(content_type=None)
+                if response.status >= 400:
+                    error = body.get("error") if isinstance(body, dict) else None
+                    code = error.get("code") if isinstance(error, dict) else None
+                    if response.status == 429:
+                        retry_after = response.headers.get("Retry-After")
+                        raise LlmRateLimitError(f"OpenAI request rate limited: {body}",
+                                                float(retry_after) if retry_after else None, code)
+                    raise LlmApiError(f"OpenAI request failed with status {response.status}: {body}",
+                                      response.status, code)
+                return body
+
+    async def achat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the OpenAI chat completion API without blocking the event loop.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The response.
+        """
+        async def create(api_key):
+            def request():
+                return self._post("/chat/completions", {
+                    "n": self.number_of_results,
+                    "model": self.model,
+                    "messages": messages,
+                    "temperature": self.temperature,
+                    "max_tokens": max_tokens,
+                    "top_p": self.top_p,
+                    "frequency_penalty": self.frequency_penalty,
+                    "presence_penalty": self.presence_penalty
+                }, api_key)
+
+            rate_limiter = LlmRateLimiter.for_api_key(api_key)
+            if rate_limiter is None:
+                return await request()
+            return await rate_limiter.arun(LlmRateLimiter.estimate_tokens(messages, max_tokens, self.model),
+                                           request)
+
+        try:
+            if self.api_key_pool is None:
+                response = await create(self.api_key)
+            else:
+                response = await self.api_key_pool.arun(self.model, create)
+            content = response["choices"][0]["message"]["content"]
+            return {"response": response, "content": content}
+        except Exception as exception:
+            logger.info("Exception:", exception)
+            return {"error": exception}
+
+    def chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the OpenAI chat completion API, blocking until the response arrives.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The response.
+        """
+        return AsyncLlmClientPool.run(self.achat_completion(messages, max_tokens))
+
+    async def agenerate_image(self, prompt: str, size: int = 512, num: int = 2):
+        """
+        Call the OpenAI image API without blocking the event loop.
+
+        Args:
+            prompt (str): The prompt.
+            size (int): The size.
+            num (int): The number of images.
+
+        Returns:
+            OpenAIObject: The response.
+        """
+        response = await self._post("/images/generations", {"prompt": prompt, "n": num, "size": f"{size}x{size}"})
+        # same response type as openai.Image.create, the image tools read it as an OpenAIObject
+        return OpenAIObject.construct_from(response)
+
+    def generate_image(self, prompt: str, size: int = 512, num: int = 2):
+        """
+        Call the OpenAI image API, blocking until the response arrives.
+
+        Args:
+            prompt (str): The prompt.
+            size (int): The size.
+            num (int): The number of images.
+
+        Returns:
+            dict: The response.
+        """
+        return AsyncLlmClientPool.run(self.agenerate_image(prompt, size, num))
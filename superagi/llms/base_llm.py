@@ -6,6 +6,27 @@ class BaseLlm(ABC):
     def chat_completion(self, prompt):
         pass
 
+    def chat_completion_stream(self, messages, max_tokens=None):
+        """
+        Yields the reply of a chat completion as text deltas. Llms without a streaming api yield the
+        whole reply at once.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Raises:
+            RuntimeError: If the llm did not return a reply.
+
+        Returns:
+            Iterator[str]: The text deltas of the reply.
+        """
+        response = self.chat_completion(messages, max_tokens) if max_tokens is not None \
+            else self.chat_completion(messages)
+        if response.get("content") is None:
+            raise RuntimeError(f"Failed to get response from llm: {response.get('error')}")
+        yield response["content"]
+
     @abstractmethod
     def get_model(self):
         pass
@@ -0,0 +1,288 @@
+import hashlib
+import json
+from typing import List, Optional
+
+import numpy as np
+
+from superagi.config.config import get_config
+from superagi.helper.token_counter import TokenCounter
+from superagi.lib.logger import logger
+from superagi.llms.base_llm import BaseLlm
+from superagi.llms.response_cache import BaseResponseCache, DiskResponseCache, RedisResponseCache
+from superagi.vector_store.embedding.cached_embedding import CachedEmbedding
+from superagi.vector_store.embedding.openai import OpenAiEmbedding
+
+AGENT_SCOPE = "agent"
+# messages starting with these prefixes change on every call without changing the answer, e.g. the
+# current time given to the agent, they are left out of the cache key
+VOLATILE_MESSAGE_PREFIXES = ("The current time and date is",)
+MAX_EMBEDDING_TOKENS = 8000
+
+
+class CachedLlm(BaseLlm):
+    """
+    Llm wrapper caching chat completions. Responses are cached on (model, temperature, max tokens,
+    messages) and, when the similarity mode is enabled, temperature 0 prompts also reuse the response
+    of a cached prompt whose embedding is close enough, found through an lsh index of the prompts.
+
+    Attributes:
+        llm (BaseLlm): The wrapped llm.
+        cache (BaseResponseCache): The storage of the responses.
+        scope (str): The name of the caller, either "agent" or a tool name, used for metrics.
+        similarity_threshold (float): The cosine similarity above which a cached response is reused,
+            None disables the similarity mode.
+    """
+    _cache = None
+
+    def __init__(self, llm: BaseLlm, cache: BaseResponseCache, scope: str, similarity_threshold: float = None):
+        self.llm = llm
+        self.cache = cache
+        self.scope = scope
+        self.similarity_threshold = similarity_threshold
+        self.embedding_model = None
+
+    @classmethod
+    def get_cache(cls) -> Optional[BaseResponseCache]:
+        """
+        Returns the response cache configured with LLM_RESPONSE_CACHE, created once per process.
+
+        Returns:
+            BaseResponseCache: The response cache, None if caching is disabled.
+        """
+        backend = str(get_config("LLM_RESPONSE_CACHE", "off")).lower()
+        if backend not in ("redis", "disk"):
+            return None
+        if cls._cache is None:
+            ttl = int(get_config("LLM_RESPONSE_CACHE_TTL", 86400))
+            max_entries = int(get_config("LLM_RESPONSE_CACHE_MAX_ENTRIES", 10000))
+            if backend == "redis":
+                cls._cache = RedisResponseCache(ttl, max_entries)
+            else:
+                cls._cache = DiskResponseCache(ttl, max_entries,
+                                               get_config("LLM_RESPONSE_CACHE_PATH", "workspace/llm_cache.sqlite"))
+        return cls._cache
+
+    @staticmethod
+    def get_enabled_scopes() -> List[str]:
+        scopes = get_config("LLM_RESPONSE_CACHE_SCOPES", "")
+        if isinstance(scopes, str):
+            scopes = scopes.split(",")
+        return [scope.strip() for scope in scopes if scope.strip() != ""]
+
+    @classmethod
+    def wrap(cls, llm: BaseLlm, scope: str) -> BaseLlm:
+        """
+        Wraps an llm with the response cache when caching is enabled for the scope.
+
+        Args:
+            llm (BaseLlm): The llm to wrap.
+            scope (str): "agent" for the agent loop, otherwise the name of the tool using the llm.
+
+        Returns:
+            BaseLlm: The cached llm, or the llm itself when the scope is not cached.
+        """
+        if scope not in cls.get_enabled_scopes():
+            return llm
+        cache = cls.get_cache()
+        if cache is None:
+            return llm
+        similarity_threshold = None
+        if cls.is_semantic_enabled():
+            similarity_threshold = float(get_config("LLM_RESPONSE_CACHE_SIMILARITY", 0.97))
+        return cls(llm, cache, scope, similarity_threshold)
+
+    @staticmethod
+    def is_semantic_enabled() -> bool:
+        return str(get_config("LLM_RESPONSE_CACHE_SEMANTIC", False)).lower() == "true"
+
+    @classmethod
+    def get_temperature(cls, scope: str, temperature: float) -> float:
+        """
+        Returns the temperature to build the llm of a scope with. The similarity mode only reuses the
+        responses of deterministic llms, so the llms of the scopes it applies to are built at temperature 0.
+
+        Args:
+            scope (str): "agent" for the agent loop, otherwise the name of the tool using the llm.
+            temperature (float): The temperature of the llm when the similarity mode does not apply.
+
+        Returns:
+            float: The temperature of the llm.
+        """
+        backend = str(get_config("LLM_RESPONSE_CACHE", "off")).lower()
+        if backend in ("redis", "disk") and cls.is_semantic_enabled() and scope in cls.get_enabled_scopes():
+            return 0
+        return temperature
+
+    def __getattr__(self, name):
+        # expose the settings of the wrapped llm, like temperature or api_key
+        if "llm" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__["llm"], name)
+
+    def get_model(self):
+        return self.llm.get_model()
+
+    def get_image_model(self):
+        return self.llm.get_image_model()
+
+    def generate_image(self, prompt: str, size: int = 512, num: int = 2):
+        return self.llm.generate_image(prompt, size, num)
+
+    def cache_key(self, messages, max_tokens=None) -> str:
+        """
+        Returns the exact match key of a prompt.
+
+        Args:
+            messages (list): The messages of the prompt.
+            max_tokens (int): The maximum number of tokens of the response.
+
+        Returns:
+            str: The cache key.
+        """
+        key_messages = [{"role": message["role"], "content": message["content"]} for message in messages
+                        if not message["content"].startswith(VOLATILE_MESSAGE_PREFIXES)]
+        key = json.dumps({"model": self.llm.get_model(), "temperature": getattr(self.llm, "temperature", None),
+                          "max_tokens": max_tokens, "messages": key_messages}, sort_keys=True)
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    def chat_completion(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Returns the cached response of the prompt, or calls the wrapped llm and caches its response.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            dict: The response, cached responses only hold the content.
+        """
+        key = self.cache_key(messages, max_tokens)
+        content, embedding = self._lookup(messages, key, max_tokens)
+        if content is not None:
+            return {"content": content, "cached": True}
+
+        response = self.llm.chat_completion(messages, max_tokens)
+        if response.get("content") is not None:
+            self._set_cached(key, response["content"], embedding, max_tokens)
+        return response
+
+    def chat_completion_stream(self, messages, max_tokens=None):
+        """
+        Yields the cached response of the prompt at once, or streams the reply of the wrapped llm and
+        caches it once complete.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            Iterator[str]: The text deltas of the reply.
+        """
+        key = self.cache_key(messages, max_tokens)
+        content, embedding = self._lookup(messages, key, max_tokens)
+        if content is not None:
+            yield content
+            return
+
+        deltas = []
+        stream = self.llm.chat_completion_stream(messages, max_tokens) if max_tokens is not None \
+            else self.llm.chat_completion_stream(messages)
+        for delta in stream:
+            deltas.append(delta)
+            yield delta
+        self._set_cached(key, "".join(deltas), embedding, max_tokens)
+
+    def _lookup(self, messages, key: str, max_tokens):
+        """
+        Reads the response of a prompt from the cache and records the hit or miss.
+
+        Returns:
+            Tuple[str, List[float]]: The cached response, None on a miss, and the prompt embedding to
+            store with the response of a miss in the similarity mode.
+        """
+        content = self._get_cached(key)
+        if content is not None:
+            self._incr_metric("hit")
+            return content, None
+
+        embedding = None
+        if self._is_similarity_enabled():
+            embedding = self._get_prompt_embedding(messages)
+            content = self._get_similar(embedding, max_tokens)
+            if content is not None:
+                self._incr_metric("semantic_hit")
+                return content, None
+
+        self._incr_metric("miss")
+        return None, embedding
+
+    def _get_cached(self, key: str) -> Optional[str]:
+        try:
+            return self.cache.get(key)
+        except Exception as exception:
+            logger.warning(f"Unable to read the llm response cache: {exception}")
+            return None
+
+    def _set_cached(self, key: str, content: str, embedding, max_tokens):
+        try:
+            self.cache.set(key, content)
+            if embedding is not None:
+                self.cache.add_embedding(self._namespace(max_tokens), key, embedding)
+        except Exception as exception:
+            logger.warning(f"Unable to write the llm response cache: {exception}")
+
+    def _incr_metric(self, name: str):
+        try:
+            self.cache.incr_metric(self.scope, name)
+        except Exception as exception:
+            logger.warning(f"Unable to update the llm response cache metrics: {exception}")
+
+    def _is_similarity_enabled(self) -> bool:
+        return self.similarity_threshold is not None and getattr(self.llm, "temperature", None) == 0
+
+    def _namespace(self, max_tokens) -> str:
+        return f"{self.scope}:{self.llm.get_model()}:{max_tokens}"
+
+    def _get_prompt_embedding(self, messages):
+        text = "\n".join(message["content"] for message in messages
+                         if not message["content"].startswith(VOLATILE_MESSAGE_PREFIXES))
+        if TokenCounter.count_text_tokens(text) > MAX_EMBEDDING_TOKENS:
+            return None
+        if self.embedding_model is None:
+            self.embedding_model = CachedEmbedding.wrap(OpenAiEmbedding(api_key=getattr(self.llm, "api_key", None)))
+        embedding = self.embedding_model.get_embedding(text)
+        if isinstance(embedding, dict):
+            logger.warning(f"Unable to embed the prompt for the llm response cache: {embedding.get('error')}")
+            return None
+        return embedding
+
+    def _get_similar(self, embedding, max_tokens) -> Optional[str]:
+        if embedding is None:
+            return None
+        try:
+            # only the prompts sharing an lsh bucket with the prompt are compared
+            cached_embeddings = self.cache.get_similar_embeddings(self._namespace(max_tokens), embedding)
+        except Exception as exception:
+            logger.warning(f"Unable to read the llm response cache: {exception}")
+            return None
+        if len(cached_embeddings) == 0:
+            return None
+        keys = [key for key, _ in cached_embeddings]
+        matrix = np.stack([cached_embedding for _, cached_embedding in cached_embeddings])
+        query = np.array(embedding, dtype=np.float32)
+        similarities = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-10)
+        best = int(np.argmax(similarities))
+        if similarities[best] < self.similarity_threshold:
+            return None
+        return self._get_cached(keys[best])
+
+    @classmethod
+    def get_metrics(cls):
+        """
+        Returns the hit/miss counters of the response cache per scope.
+
+        Returns:
+            dict: The counters, empty when caching is disabled.
+        """
+        cache = cls.get_cache()
+        return {} if cache is None else cache.get_metrics()
@@ -6,12 +6,14 @@ import openai
 from superagi.llms.base_llm import BaseLlm
 from superagi.config.config import get_config
 from superagi.lib.logger import logger
+from superagi.llms.api_key_pool import is_key_error
+from superagi.llms.rate_limiter import LlmRateLimiter
 
 
 class OpenAi(BaseLlm):
     def __init__(self, api_key, image_model=None, model="gpt-4", temperature=0.6, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT"), top_p=1,
                  frequency_penalty=0,
-                 presence_penalty=0, number_of_results=1):
+                 presence_penalty=0, number_of_results=1, api_key_pool=None):
         """
         Args:
             api_key (str): The OpenAI API key.
@@ -23,6 +25,8 @@ class OpenAi(BaseLlm):
             frequency_penalty (float): The frequency penalty.
             presence_penalty (float): The presence penalty.
             number_of_results (int): The number of results.
+            api_key_pool (ApiKeyPool): The keys of the organisation the calls are spread over, None to only
+                use api_key.
         """
         self.model = model
         self.temperature = temperature
@@ -32,9 +36,9 @@ class OpenAi(BaseLlm):
         self.presence_penalty = presence_penalty
         self.number_of_results = number_of_results
         self.api_key = api_key
+        self.api_key_pool = api_key_pool
         self.image_model = image_model
-        openai.api_key = api_key
-        openai.api_base = get_config("OPENAI_API_BASE", "https://api.openai.com/v1")
+        self.api_base = get_config("OPENAI_API_BASE", "https://api.openai.com/v1")
 
     def get_model(self):
         """
@@ -61,8 +65,58 @@ class OpenAi(BaseLlm):
         Returns:
             dict: The response.
         """
+        def create(api_key):
+            def request():
+                return openai.ChatCompletion.create(
+                    n=self.number_of_results,
+                    model=self.model,
+                    messages=messages,
+                    temperature=self.temperature,
+                    max_tokens=max_tokens,
+                    top_p=self.top_p,
+                    frequency_penalty=self.frequency_penalty,
+                    presence_penalty=self.presence_penalty,
+                    api_key=api_key,
+                    api_base=self.api_base
+                )
+
+            rate_limiter = LlmRateLimiter.for_api_key(api_key)
+            if rate_limiter is None:
+                return request()
+            return rate_limiter.run(LlmRateLimiter.estimate_tokens(messages, max_tokens, self.model), request)
+
         try:
             # openai.api_key = get_config("OPENAI_API_KEY")
+            if self.api_key_pool is None:
+                response = create(self.api_key)
+            else:
+                response = self.api_key_pool.run(self.model, create)
+            content = response.choices[0].message["content"]
+            return {"response": response, "content": content}
+        except Exception as exception:
+            logger.info("Exception:", exception)
+            return {"error": exception}
+
+    def chat_completion_stream(self, messages, max_tokens=get_config("MAX_MODEL_TOKEN_LIMIT")):
+        """
+        Call the OpenAI chat completion API in streaming mode.
+
+        Args:
+            messages (list): The messages.
+            max_tokens (int): The maximum number of tokens.
+
+        Returns:
+            Iterator[str]: The content deltas of the response, as they arrive.
+        """
+        pooled_key = None if self.api_key_pool is None else self.api_key_pool.select(self.model)
+        api_key = self.api_key if pooled_key is None else pooled_key.value
+        rate_limiter = LlmRateLimiter.for_api_key(api_key)
+        lease = None
+        failure = None
+        if rate_limiter is not None:
+            estimated_tokens = LlmRateLimiter.estimate_tokens(messages, max_tokens, self.model)
+            lease = rate_limiter.acquire(estimated_tokens)
+        try:
             response = openai.ChatCompletion.create(
                 n=self.number_of_results,
                 model=self.model,
@@ -71,13 +125,28 @@ class OpenAi(BaseLlm):
                 max_tokens=max_tokens,
                 top_p=self.top_p,
                 frequency_penalty=self.frequency_penalty,
-                presence_penalty=self.presence_penalty
+                presence_penalty=self.presence_penalty,
+                api_key=api_key,
+                api_base=self.api_base,
+                stream=True
             )
-            content = response.choices[0].message["content"]
-            return {"response": response, "content": content}
+            for chunk in response:
+                if len(chunk["choices"]) == 0:
+                    continue
+                content = chunk["choices"][0].get("delta", {}).get("content")
+                if content:
+                    yield content
         except Exception as exception:
-            logger.info("Exception:", exception)
-            return {"error": exception}
+            failure = exception
+            raise
+        finally:
+            if rate_limiter is not None:
+                # streamed responses carry no usage, the reserved tokens are kept
+                rate_limiter.release(lease, estimated_tokens, exception=failure)
+            if pooled_key is not None:
+                self.api_key_pool.record_usage(pooled_key, exception=failure)
+                if failure is not None and is_key_error(failure):
+                    self.api_key_pool.quarantine(pooled_key, failure)
 
     def generate_image(self, prompt: str, size: int = 512, num: int = 2):
         """
@@ -94,6 +163,8 @@ class OpenAi(BaseLlm):
         response = openai.Image.create(
             prompt=prompt,
             n=num,
-            size=f"{size}x{size}"
+            size=f"{size}x{size}",
+            api_key=self.api_key,
+            api_base=self.api_base
         )
         return response
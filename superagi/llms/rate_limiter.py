@@ -0,0 +1,388 @@
+import asyncio
+import hashlib
+import random
+import time
+import uuid
+from typing import Callable, Optional
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.helper.token_counter import TokenCounter
+from superagi.lib.logger import logger
+
+REDIS_KEY_PREFIX = "llm_rate_limit"
+# seconds to back off after a 429 without a Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+# seconds between two admission attempts while all the in-flight slots of a key are taken
+POLL_INTERVAL = 0.1
+MIN_CONCURRENCY = 1
+
+# refills the request and token buckets of an api key for the time elapsed since the last call and
+# admits the request if both buckets hold enough, the key is not backing off after a 429 and one of
+# its in-flight slots is free. Leases of requests whose worker died expire after ARGV[5] ms.
+# Returns 0 when admitted, the milliseconds to wait otherwise, -1 when only the slots are missing.
+ACQUIRE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local rpm = tonumber(ARGV[1])
+local tpm = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local max_concurrency = tonumber(ARGV[6])
+local state = redis.call('HMGET', KEYS[1], 'requests', 'tokens', 'updated_at', 'blocked_until', 'concurrency')
+local elapsed = math.max(now - (tonumber(state[3]) or now), 0)
+local requests = math.min(rpm, (tonumber(state[1]) or rpm) + elapsed * rpm / 60000)
+local tokens = math.min(tpm, (tonumber(state[2]) or tpm) + elapsed * tpm / 60000)
+local concurrency = math.min(tonumber(state[5]) or max_concurrency, max_concurrency)
+redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now)
+
+local wait = math.max((tonumber(state[4]) or 0) - now, 0)
+if rpm > 0 and requests < 1 then
+    wait = math.max(wait, (1 - requests) * 60000 / rpm)
+end
+if tpm > 0 then
+    -- a request larger than the whole bucket waits for a full bucket instead of forever
+    cost = math.min(cost, tpm)
+    if tokens < cost then
+        wait = math.max(wait, (cost - tokens) * 60000 / tpm)
+    end
+end
+if wait == 0 and redis.call('ZCARD', KEYS[2]) >= math.floor(concurrency) then
+    wait = -1
+end
+if wait == 0 then
+    if rpm > 0 then
+        requests = requests - 1
+    end
+    if tpm > 0 then
+        tokens = tokens - cost
+    end
+    redis.call('ZADD', KEYS[2], now + tonumber(ARGV[5]), ARGV[4])
+end
+redis.call('HSET', KEYS[1], 'requests', requests, 'tokens', tokens, 'updated_at', now)
+redis.call('PEXPIRE', KEYS[1], 3600000)
+redis.call('PEXPIRE', KEYS[2], tonumber(ARGV[5]))
+return math.ceil(wait)
+"""
+
+# frees the in-flight slot of a request and adapts the concurrency of the key: additive increase on
+# success, halved on a 429 (once per back off, the 429s of the requests already in flight do not count
+# again) with all requests of the key held until Retry-After. The tokens over-reserved by the request
+# estimate are given back.
+RELEASE_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+local max_concurrency = tonumber(ARGV[5])
+redis.call('ZREM', KEYS[2], ARGV[1])
+local state = redis.call('HMGET', KEYS[1], 'blocked_until', 'concurrency')
+local concurrency = math.min(tonumber(state[2]) or max_concurrency, max_concurrency)
+if ARGV[2] == 'throttled' then
+    local blocked_until = tonumber(state[1]) or 0
+    if blocked_until <= now then
+        concurrency = math.max(tonumber(ARGV[6]), concurrency / 2)
+    end
+    redis.call('HSET', KEYS[1], 'blocked_until', math.max(blocked_until, now + tonumber(ARGV[4])))
+elseif ARGV[2] == 'ok' then
+    concurrency = math.min(max_concurrency, concurrency + 1 / concurrency)
+end
+if tonumber(ARGV[3]) ~= 0 then
+    redis.call('HINCRBYFLOAT', KEYS[1], 'tokens', ARGV[3])
+end
+redis.call('HSET', KEYS[1], 'concurrency', concurrency)
+return tostring(concurrency)
+"""
+
+
+class LlmApiError(RuntimeError):
+    """
+    A request rejected by the llm api.
+
+    Attributes:
+        http_status (int): The http status of the response.
+        code (str): The error code of the response, e.g. "insufficient_quota", None if it has none.
+    """
+
+    def __init__(self, message: str, http_status: int = None, code: str = None):
+        super().__init__(message)
+        self.http_status = http_status
+        self.code = code
+
+
+class LlmRateLimitError(LlmApiError):
+    """
+    A request rejected by the llm api with a 429, or not admitted by the rate limiter in time.
+
+    Attributes:
+        retry_after (float): The seconds to wait before the next request, None if unknown.
+    """
+
+    def __init__(self, message: str, retry_after: Optional[float] = None, code: str = None):
+        super().__init__(message, 429, code)
+        self.retry_after = retry_after
+
+
+def get_key_hash(api_key: str) -> str:
+    """Returns the id of an api key in the redis keys, the key itself is never stored."""
+    return hashlib.sha256(str(api_key).encode("utf-8")).hexdigest()[:16]
+
+
+def get_retry_after(exception: Exception) -> Optional[float]:
+    """
+    Returns the seconds to back off after a failed request.
+
+    Args:
+        exception (Exception): The exception raised by the request.
+
+    Returns:
+        float: The Retry-After of a 429, DEFAULT_RETRY_AFTER if it has none, None if the exception is
+            not a 429 or the quota of the key is exhausted, which waiting does not fix.
+    """
+    if getattr(exception, "http_status", None) != 429 or getattr(exception, "code", None) == "insufficient_quota":
+        return None
+    if isinstance(exception, LlmRateLimitError):
+        return DEFAULT_RETRY_AFTER if exception.retry_after is None else exception.retry_after
+    headers = getattr(exception, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after") or headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return DEFAULT_RETRY_AFTER
+
+
+class LlmRateLimiter:
+    """
+    Rate limiter of the llm calls of an api key shared by all workers through redis. Every key has a
+    requests per minute and a tokens per minute token bucket, and an adaptive number of in-flight
+    requests (AIMD) that grows with the successful requests and is halved on a 429. A 429 holds back all
+    the requests of the key until its Retry-After, the waiting workers are then admitted one at a time
+    by the buckets instead of all retrying at once. When redis is unavailable requests are not limited.
+
+    Attributes:
+        api_key (str): The api key the requests are counted against.
+        requests_per_minute (int): The requests per minute of the key, 0 for no limit.
+        tokens_per_minute (int): The prompt and completion tokens per minute of the key, 0 for no limit.
+        max_concurrency (int): The upper bound of the in-flight requests of the key.
+        max_wait (float): The seconds a request waits to be admitted before giving up.
+        max_retries (int): The number of times a request rejected with a 429 is retried.
+    """
+    _db = None
+    _acquire_script = None
+    _release_script = None
+
+    def __init__(self, api_key: str, requests_per_minute: int = 0, tokens_per_minute: int = 0,
+                 max_concurrency: int = 50, max_wait: float = 300, max_retries: int = 3):
+        self.api_key = api_key
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.max_wait = max_wait
+        self.max_retries = max_retries
+        key_hash = get_key_hash(api_key)
+        self.state_key = f"{REDIS_KEY_PREFIX}:{key_hash}"
+        self.leases_key = f"{REDIS_KEY_PREFIX}:{key_hash}:leases"
+
+    @classmethod
+    def get_db(cls) -> redis.Redis:
+        if cls._db is None:
+            cls._db = redis.Redis.from_url("redis://" + get_config("REDIS_URL") + "/0", decode_responses=True)
+            cls._acquire_script = cls._db.register_script(ACQUIRE_SCRIPT)
+            cls._release_script = cls._db.register_script(RELEASE_SCRIPT)
+        return cls._db
+
+    @classmethod
+    def for_api_key(cls, api_key: str) -> Optional["LlmRateLimiter"]:
+        """
+        Returns the rate limiter of an api key configured with the LLM_RATE_LIMIT_* settings.
+
+        Args:
+            api_key (str): The api key of the llm.
+
+        Returns:
+            LlmRateLimiter: The rate limiter, None if rate limiting is disabled.
+        """
+        if str(get_config("LLM_RATE_LIMIT_ENABLED", False)).lower() != "true":
+            return None
+        return cls(api_key,
+                   requests_per_minute=int(get_config("LLM_REQUESTS_PER_MINUTE", 0)),
+                   tokens_per_minute=int(get_config("LLM_TOKENS_PER_MINUTE", 0)),
+                   max_concurrency=int(get_config("LLM_MAX_CLUSTER_CONCURRENCY", 50)),
+                   max_wait=float(get_config("LLM_RATE_LIMIT_MAX_WAIT", 300)),
+                   max_retries=int(get_config("LLM_RATE_LIMIT_RETRIES", 3)))
+
+    def get_remaining_fraction(self, requests, tokens, updated_at) -> float:
+        """
+        Returns the part of the quota of the key that is left, as seen by its last admission.
+
+        Args:
+            requests: The stored requests bucket, None if the key has not been used yet.
+            tokens: The stored tokens bucket, None if the key has not been used yet.
+            updated_at: The time of the last admission in milliseconds since the epoch.
+
+        Returns:
+            float: The refilled level, between 0 and 1, of the emptier of the limited buckets.
+        """
+        elapsed = max(time.time() * 1000 - float(updated_at or 0), 0)
+        fractions = []
+        for capacity, level in ((self.requests_per_minute, requests), (self.tokens_per_minute, tokens)):
+            if capacity > 0 and level is not None:
+                fractions.append(min(capacity, float(level) + elapsed * capacity / 60000) / capacity)
+        return max(min(fractions, default=1.0), 0.0)
+
+    @staticmethod
+    def estimate_tokens(messages, max_tokens, model: str) -> int:
+        """
+        Returns the tokens reserved for a chat completion: its prompt and the whole completion budget,
+        like the api counts them. The unused tokens are given back once the response arrives.
+        """
+        try:
+            prompt_tokens = TokenCounter.count_message_tokens(messages, model)
+        except Exception as exception:
+            # about four characters per token when the encoding of the model can not be loaded
+            logger.warning(f"Unable to count the prompt tokens of the llm request: {exception}")
+            prompt_tokens = sum(len(message["content"]) for message in messages) // 4
+        return prompt_tokens + int(max_tokens or 0)
+
+    def try_acquire(self, estimated_tokens: int):
+        """
+        Tries to admit a request once.
+
+        Args:
+            estimated_tokens (int): The tokens reserved for the request.
+
+        Returns:
+            Tuple[Optional[str], float]: The lease of the admitted request and 0, or None and the seconds
+                to wait before trying again. The lease is None and the wait 0 when redis is unavailable.
+        """
+        lease = uuid.uuid4().hex
+        lease_ttl = int(float(get_config("LLM_REQUEST_TIMEOUT", 600)) * 1000)
+        try:
+            self.get_db()
+            wait = int(self._acquire_script(keys=[self.state_key, self.leases_key],
+                                            args=[self.requests_per_minute, self.tokens_per_minute,
+                                                  estimated_tokens, lease, lease_ttl, self.max_concurrency]))
+        except Exception as exception:
+            logger.warning(f"Unable to rate limit the llm request: {exception}")
+            return None, 0
+        if wait == 0:
+            return lease, 0
+        if wait < 0:
+            return None, POLL_INTERVAL * (1 + random.random())
+        # the jitter spreads the workers released by the same refill or the end of the same back off
+        return None, wait / 1000 * (1 + random.random() * 0.1)
+
+    def release(self, lease: Optional[str], estimated_tokens: int, response: dict = None,
+                exception: Exception = None) -> Optional[float]:
+        """
+        Frees the in-flight slot of a request and reports its outcome to the adaptive concurrency.
+
+        Args:
+            lease (str): The lease returned by the admission, None if the request was not limited.
+            estimated_tokens (int): The tokens reserved for the request.
+            response (dict): The response of a successful request.
+            exception (Exception): The exception of a failed request.
+
+        Returns:
+            float: The seconds to back off if the request was rejected with a 429, otherwise None.
+        """
+        retry_after = get_retry_after(exception) if exception is not None else None
+        if lease is None:
+            return retry_after
+        refund = 0
+        if exception is None:
+            outcome = "ok"
+            usage = (response or {}).get("usage") or {}
+            if usage.get("total_tokens") is not None:
+                refund = estimated_tokens - int(usage["total_tokens"])
+        elif retry_after is not None:
+            outcome = "throttled"
+            logger.info(f"Llm request rate limited, backing off for {retry_after}s")
+        else:
+            outcome = "failed"
+        try:
+            self._release_script(keys=[self.state_key, self.leases_key],
+                                 args=[lease, outcome, refund, int((retry_after or 0) * 1000), self.max_concurrency,
+                                       MIN_CONCURRENCY])
+        except Exception as exception:
+            logger.warning(f"Unable to release the llm rate limit lease: {exception}")
+        return retry_after
+
+    def acquire(self, estimated_tokens: int) -> Optional[str]:
+        """
+        Waits until a request is admitted.
+
+        Args:
+            estimated_tokens (int): The tokens reserved for the request.
+
+        Raises:
+            LlmRateLimitError: If the request was not admitted within max_wait seconds.
+
+        Returns:
+            str: The lease of the request, None when redis is unavailable.
+        """
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            lease, wait = self.try_acquire(estimated_tokens)
+            if wait == 0:
+                return lease
+            if time.monotonic() + wait > deadline:
+                raise LlmRateLimitError(f"Llm request not admitted by the rate limiter within {self.max_wait}s",
+                                        retry_after=wait)
+            time.sleep(wait)
+
+    async def aacquire(self, estimated_tokens: int) -> Optional[str]:
+        """
+        Same as `acquire`, waiting without blocking the event loop. The redis calls are made from a
+        thread of the loop's executor, so they do not hold back the other requests of the loop.
+        """
+        deadline = time.monotonic() + self.max_wait
+        while True:
+            lease, wait = await asyncio.to_thread(self.try_acquire, estimated_tokens)
+            if wait == 0:
+                return lease
+            if time.monotonic() + wait > deadline:
+                raise LlmRateLimitError(f"Llm request not admitted by the rate limiter within {self.max_wait}s",
+                                        retry_after=wait)
+            await asyncio.sleep(wait)
+
+    def run(self, estimated_tokens: int, request: Callable[[], dict]) -> dict:
+        """
+        Runs a request once admitted, retrying it after its back off when it is rejected with a 429.
+
+        Args:
+            estimated_tokens (int): The tokens reserved for the request.
+            request (Callable[[], dict]): The request, raising on failure.
+
+        Returns:
+            dict: The response of the request.
+        """
+        for attempt in range(self.max_retries + 1):
+            lease = self.acquire(estimated_tokens)
+            try:
+                response = request()
+            except Exception as exception:
+                retry_after = self.release(lease, estimated_tokens, exception=exception)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                if lease is None:
+                    time.sleep(retry_after)
+                continue
+            self.release(lease, estimated_tokens, response=response)
+            return response
+
+    async def arun(self, estimated_tokens: int, request: Callable):
+        """
+        Same as `run` for a coroutine function, waiting without blocking the event loop. The redis calls
+        are made from a thread of the loop's executor.
+        """
+        for attempt in range(self.max_retries + 1):
+            lease = await self.aacquire(estimated_tokens)
+            try:
+                response = await request()
+            except Exception as exception:
+                retry_after = await asyncio.to_thread(self.release, lease, estimated_tokens, exception=exception)
+                if retry_after is None or attempt == self.max_retries:
+                    raise
+                if lease is None:
+                    await asyncio.sleep(retry_after)
+                continue
+            await asyncio.to_thread(self.release, lease, estimated_tokens, response=response)
+            return response
@@ -0,0 +1,258 @@
+import base64
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import redis
+
+from superagi.config.config import get_config
+
+REDIS_KEY_PREFIX = "llm_cache"
+METRIC_NAMES = ("hit", "semantic_hit", "miss")
+# random hyperplane lsh: close prompt embeddings share the bucket of at least one table with a high
+# probability, only the prompts of these buckets are compared to the prompt being looked up
+SIMILARITY_TABLES = 8
+SIMILARITY_BITS = 10
+# the most recent prompts kept per bucket, bounding the embeddings read per lookup
+SIMILARITY_BUCKET_SIZE = 64
+SIMILARITY_SEED = 7
+
+
+class SimilarityIndex:
+    """Locality sensitive hashing of prompt embeddings, the hyperplanes are the same in every process."""
+    _hyperplanes: Dict[int, np.ndarray] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_buckets(cls, embedding: List[float]) -> List[str]:
+        """
+        Returns the bucket of an embedding in every lsh table.
+
+        Args:
+            embedding (List[float]): The prompt embedding.
+
+        Returns:
+            List[str]: The buckets, one per table.
+        """
+        vector = np.asarray(embedding, dtype=np.float32)
+        hyperplanes = cls._hyperplanes.get(vector.shape[0])
+        if hyperplanes is None:
+            shape = (SIMILARITY_TABLES * SIMILARITY_BITS, vector.shape[0])
+            with cls._lock:
+                hyperplanes = cls._hyperplanes.setdefault(
+                    vector.shape[0], np.random.default_rng(SIMILARITY_SEED).standard_normal(shape).astype(np.float32))
+        bits = ((hyperplanes @ vector) > 0).reshape(SIMILARITY_TABLES, SIMILARITY_BITS)
+        signatures = bits @ (1 << np.arange(SIMILARITY_BITS))
+        return [f"{table}:{signature}" for table, signature in enumerate(signatures)]
+
+
+def encode_embedding(embedding: List[float]) -> bytes:
+    return np.asarray(embedding, dtype=np.float32).tobytes()
+
+
+def decode_embedding(value: bytes) -> np.ndarray:
+    return np.frombuffer(value, dtype=np.float32)
+
+
+class BaseResponseCache(ABC):
+    """
+    Storage of cached llm responses. Entries expire after a ttl and the least recently used ones are
+    evicted once the cache holds more than max_entries responses.
+    """
+
+    def __init__(self, ttl: int, max_entries: int):
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response of a key, None if it is missing or expired."""
+
+    @abstractmethod
+    def set(self, key: str, value: str):
+        """Caches the response of a key."""
+
+    @abstractmethod
+    def get_similar_embeddings(self, namespace: str, embedding: List[float]) -> List[Tuple[str, np.ndarray]]:
+        """
+        Returns the (key, prompt embedding) pairs of the prompts of a namespace sharing an lsh bucket with
+        an embedding, the candidates of a similarity lookup.
+        """
+
+    @abstractmethod
+    def add_embedding(self, namespace: str, key: str, embedding: List[float]):
+        """Stores the prompt embedding of a cached key for similarity lookups."""
+
+    @abstractmethod
+    def incr_metric(self, scope: str, name: str):
+        """Increments the hit/miss counter of a cache scope."""
+
+    @abstractmethod
+    def get_metrics(self) -> Dict[str, Dict[str, int]]:
+        """Returns the hit/miss counters of every cache scope."""
+
+
+class RedisResponseCache(BaseResponseCache):
+    """
+    Response cache shared by all workers. Values expire through redis ttls and a sorted set of last
+    access times is used to evict the least recently used entries.
+    """
+
+    def __init__(self, ttl: int, max_entries: int, redis_url: str = None):
+        super().__init__(ttl, max_entries)
+        redis_url = redis_url or get_config("REDIS_URL")
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0", decode_responses=True)
+        self.lru_key = REDIS_KEY_PREFIX + ":lru"
+        self.metrics_key = REDIS_KEY_PREFIX + ":metrics"
+
+    def _value_key(self, key: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:value:{key}"
+
+    def _embeddings_key(self, namespace: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:embeddings:{namespace}"
+
+    def _bucket_key(self, namespace: str, bucket: str) -> str:
+        return f"{REDIS_KEY_PREFIX}:bucket:{namespace}:{bucket}"
+
+    def get(self, key: str) -> Optional[str]:
+        value = self.db.get(self._value_key(key))
+        if value is not None:
+            self.db.zadd(self.lru_key, {key: time.time()})
+        return value
+
+    def set(self, key: str, value: str):
+        pipeline = self.db.pipeline()
+        pipeline.set(self._value_key(key), value, ex=self.ttl)
+        pipeline.zadd(self.lru_key, {key: time.time()})
+        pipeline.zcard(self.lru_key)
+        overflow = pipeline.execute()[-1] - self.max_entries
+        if overflow > 0:
+            evicted = [evicted_key for evicted_key, _ in self.db.zpopmin(self.lru_key, overflow)]
+            self.db.delete(*[self._value_key(evicted_key) for evicted_key in evicted])
+
+    def get_similar_embeddings(self, namespace: str, embedding: List[float]) -> List[Tuple[str, np.ndarray]]:
+        pipeline = self.db.pipeline(transaction=False)
+        for bucket in SimilarityIndex.get_buckets(embedding):
+            pipeline.zrange(self._bucket_key(namespace, bucket), 0, -1)
+        keys = list(dict.fromkeys(key for bucket_keys in pipeline.execute() for key in bucket_keys))
+        if len(keys) == 0:
+            return []
+        values = self.db.hmget(self._embeddings_key(namespace), keys)
+        return [(key, decode_embedding(base64.b64decode(value))) for key, value in zip(keys, values)
+                if value is not None]
+
+    def add_embedding(self, namespace: str, key: str, embedding: List[float]):
+        embeddings_key = self._embeddings_key(namespace)
+        now = time.time()
+        pipeline = self.db.pipeline()
+        pipeline.hset(embeddings_key, key, base64.b64encode(encode_embedding(embedding)).decode("ascii"))
+        pipeline.expire(embeddings_key, self.ttl)
+        for bucket in SimilarityIndex.get_buckets(embedding):
+            bucket_key = self._bucket_key(namespace, bucket)
+            pipeline.zadd(bucket_key, {key: now})
+            pipeline.zremrangebyrank(bucket_key, 0, -SIMILARITY_BUCKET_SIZE - 1)
+            pipeline.expire(bucket_key, self.ttl)
+        pipeline.hlen(embeddings_key)
+        # embeddings of expired or evicted responses are dropped once the namespace outgrows the cache
+        if pipeline.execute()[-1] > self.max_entries:
+            keys = self.db.hkeys(embeddings_key)
+            pipeline = self.db.pipeline()
+            for cached_key in keys:
+                pipeline.exists(self._value_key(cached_key))
+            stale = [cached_key for cached_key, exists in zip(keys, pipeline.execute()) if not exists]
+            if len(stale) > 0:
+                self.db.hdel(embeddings_key, *stale)
+
+    def incr_metric(self, scope: str, name: str):
+        self.db.hincrby(self.metrics_key, f"{scope}:{name}", 1)
+
+    def get_metrics(self) -> Dict[str, Dict[str, int]]:
+        metrics = {}
+        for field, count in self.db.hgetall(self.metrics_key).items():
+            scope, name = field.rsplit(":", 1)
+            metrics.setdefault(scope, dict.fromkeys(METRIC_NAMES, 0))[name] = int(count)
+        return metrics
+
+
+class DiskResponseCache(BaseResponseCache):
+    """Response cache of a single host, stored in a local sqlite file."""
+
+    def __init__(self, ttl: int, max_entries: int, path: str):
+        super().__init__(ttl, max_entries)
+        if os.path.dirname(path) != "":
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, "
+                                    "expires_at REAL, accessed_at REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_responses_accessed_at ON responses (accessed_at)")
+            # json embeddings of the previous layout, compared to every prompt of their namespace
+            self.connection.execute("DROP TABLE IF EXISTS embeddings")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS prompt_embeddings (namespace TEXT, key TEXT, "
+                                    "embedding BLOB, PRIMARY KEY (namespace, key))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS similarity_buckets (namespace TEXT, bucket TEXT, "
+                                    "key TEXT, added_at REAL, PRIMARY KEY (namespace, bucket, key))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS metrics (scope TEXT, name TEXT, count INTEGER, "
+                                    "PRIMARY KEY (scope, name))")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT value FROM responses WHERE key = ? AND expires_at > ?",
+                                          (key, now)).fetchone()
+            if row is None:
+                return None
+            self.connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            return row[0]
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, value, expires_at, accessed_at) "
+                                    "VALUES (?, ?, ?, ?)", (key, value, now + self.ttl, now))
+            self.connection.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            self.connection.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+                                    "ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+            self.connection.execute("DELETE FROM prompt_embeddings WHERE key NOT IN (SELECT key FROM responses)")
+            self.connection.execute("DELETE FROM similarity_buckets WHERE key NOT IN (SELECT key FROM responses)")
+
+    def get_similar_embeddings(self, namespace: str, embedding: List[float]) -> List[Tuple[str, np.ndarray]]:
+        buckets = SimilarityIndex.get_buckets(embedding)
+        placeholders = ",".join("?" * len(buckets))
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT key, embedding FROM prompt_embeddings WHERE namespace = ? AND key IN "
+                f"(SELECT key FROM similarity_buckets WHERE namespace = ? AND bucket IN ({placeholders}))",
+                (namespace, namespace, *buckets)).fetchall()
+        return [(key, decode_embedding(value)) for key, value in rows]
+
+    def add_embedding(self, namespace: str, key: str, embedding: List[float]):
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO prompt_embeddings (namespace, key, embedding) "
+                                    "VALUES (?, ?, ?)", (namespace, key, encode_embedding(embedding)))
+            for bucket in SimilarityIndex.get_buckets(embedding):
+                self.connection.execute("INSERT OR REPLACE INTO similarity_buckets (namespace, bucket, key, "
+                                        "added_at) VALUES (?, ?, ?, ?)", (namespace, bucket, key, now))
+                self.connection.execute("DELETE FROM similarity_buckets WHERE namespace = ? AND bucket = ? AND "
+                                        "key NOT IN (SELECT key FROM similarity_buckets WHERE namespace = ? AND "
+                                        "bucket = ? ORDER BY added_at DESC LIMIT ?)",
+                                        (namespace, bucket, namespace, bucket, SIMILARITY_BUCKET_SIZE))
+
+    def incr_metric(self, scope: str, name: str):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO metrics (scope, name, count) VALUES (?, ?, 1) "
+                                    "ON CONFLICT (scope, name) DO UPDATE SET count = count + 1", (scope, name))
+
+    def get_metrics(self) -> Dict[str, Dict[str, int]]:
+        with self.lock:
+            rows = self.connection.execute("SELECT scope, name, count FROM metrics").fetchall()
+        metrics = {}
+        for scope, name, count in rows:
+            metrics.setdefault(scope, dict.fromkeys(METRIC_NAMES, 0))[name] = count
+        return metrics
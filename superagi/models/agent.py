@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import ast
 import json
 
 from sqlalchemy import Column, Integer, String
@@ -105,7 +106,11 @@ class Agent(DBBaseModel):
         elif key in ["project_id", "memory_window", "max_iterations", "iteration_interval"]:
             return int(value)
         elif key == "goal" or key == "constraints" or key == "instruction":
-            return eval(value)
+            try:
+                return json.loads(value)
+            except ValueError:
+                # lists written with str() before the configurations were stored as json
+                return ast.literal_eval(value)
         elif key == "tools":
             return [int(x) for x in json.loads(value)]
 
@@ -133,6 +138,10 @@ class Agent(DBBaseModel):
             agent_workflow = db.session.query(AgentWorkflow).filter(AgentWorkflow.name == "Goal Based Agent").first()
             logger.info(agent_workflow)
             db_agent.agent_workflow_id = agent_workflow.id
+        elif agent_with_config.agent_type == "Parallel Tool Calls":
+            agent_workflow = db.session.query(AgentWorkflow).filter(
+                AgentWorkflow.name == "Goal Based Agent With Parallel Tools").first()
+            db_agent.agent_workflow_id = agent_workflow.id
         elif agent_with_config.agent_type == "Maintain Task Queue":
             agent_workflow = db.session.query(AgentWorkflow).filter(
                 AgentWorkflow.name == "Task Queue Agent With Seed").first()
@@ -156,7 +165,8 @@ class Agent(DBBaseModel):
         }
 
         agent_configurations = [
-            AgentConfiguration(agent_id=db_agent.id, key=key, value=str(value))
+            AgentConfiguration(agent_id=db_agent.id, key=key,
+                               value=json.dumps(value) if isinstance(value, list) else str(value))
             for key, value in agent_config_values.items()
         ]
 
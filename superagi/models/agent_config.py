@@ -1,5 +1,5 @@
 from fastapi import HTTPException
-from sqlalchemy import Column, Integer, Text, String
+from sqlalchemy import Column, Integer, Text, String, Index
 
 from superagi.models.base_model import DBBaseModel
 from superagi.models.tool import Tool
@@ -17,6 +17,9 @@ class AgentConfiguration(DBBaseModel):
     """
 
     __tablename__ = 'agent_configurations'
+    __table_args__ = (
+        Index('ix_agent_configurations_agent_id_key', 'agent_id', 'key'),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     agent_id = Column(Integer)
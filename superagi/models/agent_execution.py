@@ -1,7 +1,7 @@
 import json
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Text
 
 from superagi.models.base_model import DBBaseModel
 
@@ -20,6 +20,9 @@ class AgentExecution(DBBaseModel):
         num_of_calls (int): The number of calls made during the execution.
         num_of_tokens (int): The number of tokens used during the execution.
         current_step_id (int): The identifier of the current step in the execution.
+        permission_id (int): The identifier of the permission the execution is waiting for.
+        history_summary (str): The running summary of the feeds evicted from the prompt history.
+        last_summarized_feed_id (int): The identifier of the newest feed included in the history summary.
     """
 
     __tablename__ = 'agent_executions'
@@ -33,6 +36,8 @@ class AgentExecution(DBBaseModel):
     num_of_tokens = Column(Integer, default=0)
     current_step_id = Column(Integer)
     permission_id = Column(Integer)
+    history_summary = Column(Text)
+    last_summarized_feed_id = Column(Integer)
 
     def __repr__(self):
         """
@@ -0,0 +1,31 @@
+from sqlalchemy import Column, Integer, Text
+
+from superagi.models.base_model import DBBaseModel
+
+
+class AgentExecutionCompletedTask(DBBaseModel):
+    """
+    Completed tasks of task queue agents archived from redis once they leave the completed task window.
+
+    Attributes:
+        id (Integer): The primary key, increasing in completion order.
+        agent_execution_id (Integer): The ID of the agent execution the task belongs to.
+        task (Text): The task.
+        response (Text): The response of the task.
+
+    Methods:
+        __repr__: Returns a string representation of the AgentExecutionCompletedTask instance.
+    """
+    __tablename__ = 'agent_execution_completed_tasks'
+
+    id = Column(Integer, primary_key=True)
+    agent_execution_id = Column(Integer, index=True)
+    task = Column(Text)
+    response = Column(Text)
+
+    def __repr__(self):
+        """
+        Returns a string representation of the AgentExecutionCompletedTask instance.
+        """
+        return f"AgentExecutionCompletedTask(id={self.id}, agent_execution_id={self.agent_execution_id}, " \
+               f"task={self.task})"
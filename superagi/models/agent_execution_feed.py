@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Text, String
+from sqlalchemy import Column, Integer, Text, String, Index
 from sqlalchemy.orm import Session
 
 from superagi.models.base_model import DBBaseModel
@@ -15,9 +15,15 @@ class AgentExecutionFeed(DBBaseModel):
         feed (str): The feed content.
         role (str): The role of the feed entry. Possible values: 'system', 'user', or 'assistant'.
         extra_info (str): Additional information related to the feed entry.
+        token_count (int): The number of tokens in the feed content, excluding the per message overhead.
     """
 
     __tablename__ = 'agent_execution_feeds'
+    __table_args__ = (
+        Index('ix_agent_execution_feeds_agent_execution_id_created_at', 'agent_execution_id', 'created_at'),
+        Index('ix_agent_execution_feeds_agent_execution_id_role_created_at', 'agent_execution_id', 'role',
+              'created_at'),
+    )
 
     id = Column(Integer, primary_key=True)
     agent_execution_id = Column(Integer)
@@ -25,6 +31,7 @@ class AgentExecutionFeed(DBBaseModel):
     feed = Column(Text)
     role = Column(String)
     extra_info = Column(String)
+    token_count = Column(Integer)
 
     def __repr__(self):
         """
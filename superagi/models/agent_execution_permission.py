@@ -23,7 +23,7 @@ class AgentExecutionPermission(DBBaseModel):
     __tablename__ = 'agent_execution_permissions'
 
     id = Column(Integer, primary_key=True)
-    agent_execution_id = Column(Integer)
+    agent_execution_id = Column(Integer, index=True)
     agent_id = Column(Integer)
     status = Column(String)
     tool_name = Column(String)
@@ -1,6 +1,6 @@
 import json
 
-from sqlalchemy import Column, Integer, String, Text, Boolean
+from sqlalchemy import Column, Integer, String, Text, Boolean, Index
 
 from superagi.models.base_model import DBBaseModel
 
@@ -23,6 +23,9 @@ class AgentWorkflowStep(DBBaseModel):
     """
 
     __tablename__ = 'agent_workflow_steps'
+    __table_args__ = (
+        Index('ix_agent_workflow_steps_agent_workflow_id_step_type', 'agent_workflow_id', 'step_type'),
+    )
 
     id = Column(Integer, primary_key=True)
     agent_workflow_id = Column(Integer)
@@ -1,4 +1,11 @@
+import threading
+import time
+from typing import Dict, Tuple
+
 from sqlalchemy import Column, Integer, String,Text
+
+from superagi.config.config import get_config
+from superagi.helper.encyption_helper import decrypt_data
 from superagi.models.base_model import DBBaseModel
 
 
@@ -29,3 +36,41 @@ class Configuration(DBBaseModel):
         """
 
         return f"Config(id={self.id}, organisation_id={self.organisation_id}, key={self.key}, value={self.value})"
+
+
+class ModelApiKeyCache:
+    """
+    Short lived process level cache of the decrypted model api keys by organisation. A cached key is
+    only used while the encrypted key it was decrypted from is still the stored one, so a key changed
+    from another process is picked up on its next read.
+    """
+    _entries: Dict[int, Tuple[str, str, float]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_decrypted_key(cls, organisation_id: int, encrypted_key: str) -> str:
+        """
+        Returns the decrypted model api key of an organisation.
+
+        Args:
+            organisation_id (int): The id of the organisation.
+            encrypted_key (str): The stored, encrypted, model api key.
+
+        Returns:
+            str: The model api key.
+        """
+        now = time.monotonic()
+        entry = cls._entries.get(organisation_id)
+        if entry is not None and entry[0] == encrypted_key and entry[2] > now:
+            return entry[1]
+        model_api_key = decrypt_data(encrypted_key)
+        with cls._lock:
+            cls._entries[organisation_id] = (encrypted_key, model_api_key,
+                                             now + int(get_config("MODEL_API_KEY_CACHE_TTL", 300)))
+        return model_api_key
+
+    @classmethod
+    def invalidate(cls, organisation_id: int):
+        """Drops the cached key of an organisation, to be called once its model api key is changed."""
+        with cls._lock:
+            cls._entries.pop(organisation_id, None)
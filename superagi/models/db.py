@@ -1,4 +1,9 @@
+import threading
+import time
+
 from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+
 from superagi.config.config import get_config
 from superagi.lib.logger import logger
 
@@ -8,6 +13,62 @@ db_password = get_config('DB_PASSWORD')
 db_name = get_config('DB_NAME')
 
 engine = None
+# set in the celery worker processes, which run one task at a time and need a smaller pool
+worker_process = False
+
+
+class PoolStatistics:
+    """Time spent by the checkouts of the process waiting for a database connection."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self.lock:
+            self.wait_count += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+
+pool_statistics = PoolStatistics()
+
+
+class MonitoredQueuePool(QueuePool):
+    """Queue pool recording how long every checkout waits for a connection, including new connections."""
+
+    def _do_get(self):
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_statistics.record_wait(time.perf_counter() - started_at)
+
+
+def get_pool_settings() -> dict:
+    """
+    Returns the pool settings of the engine. Worker processes run a single task at a time and get
+    their own, smaller, sizes.
+
+    Returns:
+        dict: The keyword arguments of create_engine configuring the pool.
+    """
+    if worker_process:
+        pool_size = int(get_config("DB_WORKER_POOL_SIZE", 2))
+        max_overflow = int(get_config("DB_WORKER_MAX_OVERFLOW", 3))
+    else:
+        pool_size = int(get_config("DB_POOL_SIZE", 5))
+        max_overflow = int(get_config("DB_MAX_OVERFLOW", 10))
+    return {
+        "poolclass": MonitoredQueuePool,
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": float(get_config("DB_POOL_TIMEOUT", 30)),
+        "pool_recycle": int(get_config("DB_POOL_RECYCLE", 1800)),
+        "pool_pre_ping": str(get_config("DB_POOL_PRE_PING", True)).lower() == "true",
+    }
 
 
 def connect_db():
@@ -29,7 +90,7 @@ def connect_db():
         db_url = f'postgresql://{db_username}:{db_password}@{database_url}/{db_name}'
 
     # Create the SQLAlchemy engine
-    engine = create_engine(db_url)
+    engine = create_engine(db_url, **get_pool_settings())
 
     # Test the connection
     try:
@@ -39,3 +100,36 @@ def connect_db():
     except Exception as e:
         logger.error(f"Unable to connect to the database:{e}")
     return engine
+
+
+def init_worker_process():
+    """
+    Prepares a celery worker child process, to be called from `worker_process_init`. The engine is
+    created with the worker pool settings on first use. An engine inherited from the parent process
+    drops its connections without closing them, they still belong to the parent, and is replaced by
+    the next `connect_db`.
+    """
+    global engine, worker_process
+    worker_process = True
+    if engine is not None:
+        engine.dispose(close=False)
+        engine = None
+
+
+def get_pool_stats() -> dict:
+    """
+    Returns the state of the connection pool of the process.
+
+    Returns:
+        dict: The pool size, the checked in, checked out and overflow connections, and the number,
+            total and maximum wait time in milliseconds of the checkouts.
+    """
+    stats = {"wait_count": pool_statistics.wait_count,
+             "wait_ms_total": round(pool_statistics.wait_seconds_total * 1000, 3),
+             "wait_ms_max": round(pool_statistics.wait_seconds_max * 1000, 3)}
+    if engine is not None and isinstance(engine.pool, QueuePool):
+        stats.update({"size": engine.pool.size(),
+                      "checked_in": engine.pool.checkedin(),
+                      "checked_out": engine.pool.checkedout(),
+                      "overflow": engine.pool.overflow()})
+    return stats
@@ -0,0 +1,63 @@
+from typing import List, Optional
+
+from sqlalchemy import Column, Integer, String, Text
+
+from superagi.models.agent import Agent
+from superagi.models.base_model import DBBaseModel
+from superagi.models.project import Project
+
+
+class ModelApiKey(DBBaseModel):
+    """
+    Additional model api keys of an organisation, the llm calls of its agents are spread over them and
+    its `model_api_key` configuration.
+
+    Attributes:
+        id (Integer): The primary key of the api key.
+        organisation_id (Integer): The ID of the organisation owning the key.
+        name (String): The name of the key.
+        value (Text): The encrypted api key.
+        models (String): Comma separated models the key may be used for, empty for all models.
+        weight (Integer): The share of the calls given to the key relative to the other keys.
+
+    Methods:
+        __repr__: Returns a string representation of the ModelApiKey instance.
+    """
+    __tablename__ = 'model_api_keys'
+
+    id = Column(Integer, primary_key=True)
+    organisation_id = Column(Integer, index=True)
+    name = Column(String)
+    value = Column(Text)
+    models = Column(String)
+    weight = Column(Integer, default=1)
+
+    def get_models(self) -> Optional[List[str]]:
+        """Returns the models the key may be used for, None if it may be used for all models."""
+        models = [model.strip() for model in (self.models or "").split(",") if model.strip() != ""]
+        return models if len(models) > 0 else None
+
+    @classmethod
+    def fetch_agent_keys(cls, session, agent_id: int) -> List["ModelApiKey"]:
+        """
+        Fetches the api keys of the organisation of an agent.
+
+        Args:
+            session: The database session.
+            agent_id (int): The ID of the agent.
+
+        Returns:
+            List[ModelApiKey]: The api keys of the organisation.
+        """
+        return session.query(cls) \
+            .join(Project, Project.organisation_id == cls.organisation_id) \
+            .join(Agent, Agent.project_id == Project.id) \
+            .filter(Agent.id == agent_id) \
+            .all()
+
+    def __repr__(self):
+        """
+        Returns a string representation of the ModelApiKey instance.
+        """
+        return f"ModelApiKey(id={self.id}, organisation_id={self.organisation_id}, name={self.name}, " \
+               f"models={self.models}, weight={self.weight})"
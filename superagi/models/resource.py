@@ -27,7 +27,7 @@ class Resource(DBBaseModel):
     size = Column(Integer)
     type = Column(String)  # application/pdf etc
     channel = Column(String)  # INPUT,OUTPUT
-    agent_id = Column(Integer)
+    agent_id = Column(Integer, index=True)
 
     def __repr__(self):
         """
@@ -25,7 +25,7 @@ class Tool(DBBaseModel):
     folder_name = Column(String)
     class_name = Column(String)
     file_name = Column(String)
-    toolkit_id = Column(Integer)
+    toolkit_id = Column(Integer, index=True)
 
     def __repr__(self):
         """
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String
+from sqlalchemy import Column, Integer, String, Index
 from sqlalchemy.orm import Session, sessionmaker
 
 from superagi.models.base_model import DBBaseModel
@@ -17,6 +17,9 @@ class ToolConfig(DBBaseModel):
             toolkit_id (Integer): The identifier of the associated toolkit.
     """
     __tablename__ = 'tool_configs'
+    __table_args__ = (
+        Index('ix_tool_configs_toolkit_id_key', 'toolkit_id', 'key'),
+    )
 
 
     id = Column(Integer, primary_key=True)
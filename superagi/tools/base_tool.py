@@ -66,6 +66,10 @@ class BaseToolkitConfiguration:
         # Retrieve the value associated with the given key
         return config.get(key)
 
+    def load_tool_configs(self):
+        """Reads the configurations of the toolkit ahead of the calls made from other threads."""
+        pass
+
 
 class BaseTool(BaseModel):
     name: str = None
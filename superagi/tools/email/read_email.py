@@ -53,13 +53,15 @@ class ReadEmailTool(BaseTool):
         status, messages = conn.select("INBOX")
         num_of_messages = int(messages[0])
         messages = []
+        messages_token_count = TokenCounter.count_text_tokens("[]")
         for i in range(num_of_messages, num_of_messages - limit, -1):
             res, msg = conn.fetch(str(i), "(RFC822)")
             email_msg = {}
             for response in msg:
                 self._process_message(email_msg, response)
             messages.append(email_msg)
-            if TokenCounter.count_text_tokens(json.dumps(messages)) > self.max_token_limit:
+            messages_token_count += TokenCounter.count_content_tokens(json.dumps(email_msg))
+            if messages_token_count > self.max_token_limit:
                 break
 
         conn.logout()
@@ -55,11 +55,13 @@ class GoogleSearchTool(BaseTool):
         snippets, webpages, links = google_search.get_result(query)
 
         results = []
+        results_token_count = TokenCounter.count_text_tokens("[]")
         i = 0
         for webpage in webpages:
             results.append({"title": snippets[i], "body": webpage, "links": links[i]})
+            results_token_count += TokenCounter.count_content_tokens(json.dumps(results[-1]))
             i += 1
-            if TokenCounter.count_text_tokens(json.dumps(results)) > 3000:
+            if results_token_count > 3000:
                 break
         summary = self.summarise_result(query, results)
         links = [result["links"] for result in results if len(result["links"]) > 0]
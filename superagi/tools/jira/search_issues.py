@@ -59,6 +59,7 @@ class SearchJiraTool(JiraTool):
             List of parsed issues.
         """
         parsed = []
+        parsed_token_count = TokenCounter.count_text_tokens("[]")
         for issue in issues["issues"]:
             key = issue.key
             summary = issue.fields.summary
@@ -91,6 +92,7 @@ class SearchJiraTool(JiraTool):
                     "related_issues": rel_issues,
                 }
             )
-            if TokenCounter.count_text_tokens(json.dumps(parsed)) > self.max_token_limit:
+            parsed_token_count += TokenCounter.count_content_tokens(json.dumps(parsed[-1]))
+            if parsed_token_count > self.max_token_limit:
                 break
         return parsed
@@ -0,0 +1,112 @@
+import importlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple, Type
+
+import redis
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+from superagi.tools.base_tool import BaseTool
+
+REDIS_KEY_PREFIX = "toolkit_config_version"
+
+
+class ToolClassRegistry:
+    """Process level registry of the tool classes, each module is imported and searched once."""
+    _classes: Dict[Tuple[str, str], Type[BaseTool]] = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get_tool_class(cls, module_name: str, class_name: str) -> Type[BaseTool]:
+        """
+        Resolves a tool class.
+
+        Args:
+            module_name (str): The module of the tool, e.g. "superagi.tools.file.write_file".
+            class_name (str): The name of the tool class.
+
+        Returns:
+            Type[BaseTool]: The tool class.
+        """
+        key = (module_name, class_name)
+        tool_class = cls._classes.get(key)
+        if tool_class is None:
+            tool_class = getattr(importlib.import_module(module_name), class_name)
+            with cls._lock:
+                cls._classes[key] = tool_class
+        return tool_class
+
+
+class ToolPool:
+    """
+    Process level pool of built tool instances. An instance is checked out by one agent execution at a
+    time, the executor binds its per execution fields and it goes back to the pool once the job is over.
+    Instances are pooled by tool id and configuration version of their toolkit, so changing the
+    configuration of a toolkit retires its pooled instances.
+    """
+    _idle: Dict[Tuple[int, str], List[BaseTool]] = {}
+    _lock = threading.Lock()
+    _max_idle = int(get_config("TOOL_POOL_MAX_IDLE", 4))
+    _db = None
+
+    @classmethod
+    def get_db(cls) -> redis.Redis:
+        if cls._db is None:
+            cls._db = redis.Redis.from_url("redis://" + get_config("REDIS_URL") + "/0", decode_responses=True)
+        return cls._db
+
+    @staticmethod
+    def _key(toolkit_id: int) -> str:
+        return f"{REDIS_KEY_PREFIX}:{toolkit_id}"
+
+    @classmethod
+    def get_toolkit_versions(cls, toolkit_ids: Iterable[int]) -> Dict[int, Optional[str]]:
+        """
+        Reads the configuration versions of toolkits in one round trip.
+
+        Args:
+            toolkit_ids (Iterable[int]): The ids of the toolkits.
+
+        Returns:
+            Dict[int, Optional[str]]: The version of every toolkit, None when it can not be read, in which
+                case the tools of the toolkit are not pooled.
+        """
+        toolkit_ids = list(toolkit_ids)
+        if len(toolkit_ids) == 0:
+            return {}
+        try:
+            versions = cls.get_db().mget([cls._key(toolkit_id) for toolkit_id in toolkit_ids])
+        except Exception as exception:
+            logger.warning(f"Unable to read the toolkit configuration versions: {exception}")
+            return {toolkit_id: None for toolkit_id in toolkit_ids}
+        return {toolkit_id: version or "0" for toolkit_id, version in zip(toolkit_ids, versions)}
+
+    @classmethod
+    def acquire(cls, tool_id: int, version: Optional[str]) -> Optional[BaseTool]:
+        """Checks out an idle instance of a tool, None if there is none."""
+        if version is None:
+            return None
+        with cls._lock:
+            instances = cls._idle.get((tool_id, version))
+            return instances.pop() if instances else None
+
+    @classmethod
+    def release(cls, tool_id: int, version: Optional[str], tool: BaseTool):
+        """Returns a checked out instance to the pool."""
+        if version is None:
+            return
+        with cls._lock:
+            # instances built under an older configuration of the toolkit are retired
+            for key in [key for key in cls._idle if key[0] == tool_id and key[1] != version]:
+                del cls._idle[key]
+            instances = cls._idle.setdefault((tool_id, version), [])
+            if len(instances) < cls._max_idle:
+                instances.append(tool)
+
+    @classmethod
+    def invalidate_toolkit(cls, toolkit_id: int):
+        """Bumps the configuration version of a toolkit, to be called once a change of its configuration is committed."""
+        try:
+            cls.get_db().incr(cls._key(toolkit_id))
+        except Exception as exception:
+            logger.warning(f"Unable to bump the configuration version of toolkit {toolkit_id}: {exception}")
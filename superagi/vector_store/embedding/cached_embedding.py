@@ -0,0 +1,209 @@
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from superagi.config.config import get_config
+from superagi.lib.logger import logger
+from superagi.vector_store.embedding.embedding_cache import BaseEmbeddingCache, DiskEmbeddingCache, \
+    MemoryEmbeddingCache, RedisEmbeddingCache
+from superagi.vector_store.embedding.openai import BaseEmbedding
+
+# keys looked up or stored per call of a cache tier
+CACHE_CHUNK_SIZE = 500
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Embedding model wrapper caching embeddings by content: a text is embedded once per model and its
+    embedding is read back from the first cache tier holding it, in the order memory, redis, disk. Hits
+    of a lower tier are copied to the tiers above it.
+
+    Attributes:
+        embedding_model (BaseEmbedding): The wrapped embedding model.
+        tiers (List[BaseEmbeddingCache]): The cache tiers, fastest first.
+    """
+    _tiers = None
+    _tiers_lock = threading.Lock()
+    _stats_lock = threading.Lock()
+    _hits: Dict[str, int] = {}
+    _misses = 0
+
+    def __init__(self, embedding_model: BaseEmbedding, tiers: List[BaseEmbeddingCache]):
+        self.embedding_model = embedding_model
+        self.tiers = tiers
+
+    @staticmethod
+    def get_enabled_tiers() -> List[str]:
+        tiers = get_config("EMBEDDING_CACHE_TIERS", "memory")
+        if isinstance(tiers, str):
+            tiers = tiers.split(",")
+        return [tier.strip() for tier in tiers or [] if tier.strip() != ""]
+
+    @classmethod
+    def get_tiers(cls) -> List[BaseEmbeddingCache]:
+        """
+        Returns the cache tiers configured with EMBEDDING_CACHE_TIERS, created once per process.
+
+        Returns:
+            List[BaseEmbeddingCache]: The tiers, empty if caching is disabled.
+        """
+        with cls._tiers_lock:
+            if cls._tiers is None:
+                ttl = int(get_config("EMBEDDING_CACHE_TTL", 604800))
+                tiers = []
+                for name in cls.get_enabled_tiers():
+                    if name == "memory":
+                        tiers.append(MemoryEmbeddingCache(
+                            ttl, int(get_config("EMBEDDING_CACHE_MEMORY_MAX_BYTES", 64 * 1024 * 1024))))
+                    elif name == "redis":
+                        tiers.append(RedisEmbeddingCache(
+                            ttl, int(get_config("EMBEDDING_CACHE_REDIS_MAX_BYTES", 512 * 1024 * 1024))))
+                    elif name == "disk":
+                        tiers.append(DiskEmbeddingCache(
+                            ttl, int(get_config("EMBEDDING_CACHE_DISK_MAX_BYTES", 4 * 1024 * 1024 * 1024)),
+                            get_config("EMBEDDING_CACHE_DISK_PATH", "workspace/embedding_cache")))
+                    else:
+                        logger.warning(f"Unknown embedding cache tier {name}")
+                # the fastest tier first, whatever the configured order
+                order = [MemoryEmbeddingCache.name, RedisEmbeddingCache.name, DiskEmbeddingCache.name]
+                cls._tiers = sorted(tiers, key=lambda tier: order.index(tier.name))
+            return cls._tiers
+
+    @classmethod
+    def wrap(cls, embedding_model: BaseEmbedding) -> BaseEmbedding:
+        """
+        Wraps an embedding model with the embedding cache when caching is enabled.
+
+        Args:
+            embedding_model (BaseEmbedding): The embedding model to wrap.
+
+        Returns:
+            BaseEmbedding: The cached embedding model, or the model itself when caching is disabled.
+        """
+        tiers = cls.get_tiers()
+        if len(tiers) == 0:
+            return embedding_model
+        return cls(embedding_model, tiers)
+
+    def __getattr__(self, name):
+        # expose the settings of the wrapped model, like model or api_key
+        if "embedding_model" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__["embedding_model"], name)
+
+    def cache_key(self, text: str) -> str:
+        model = getattr(self.embedding_model, "model", type(self.embedding_model).__name__)
+        return f"{model}:{hashlib.sha256(text.encode('utf-8', 'surrogatepass')).hexdigest()}"
+
+    def _lookup(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Reads keys from the tiers, each tier is only asked for the keys the tiers above it missed."""
+        found = {}
+        missing = list(dict.fromkeys(keys))
+        for index, tier in enumerate(self.tiers):
+            if len(missing) == 0:
+                break
+            tier_found = {}
+            try:
+                for start in range(0, len(missing), CACHE_CHUNK_SIZE):
+                    chunk = missing[start:start + CACHE_CHUNK_SIZE]
+                    tier_found.update({key: embedding for key, embedding in zip(chunk, tier.get_many(chunk))
+                                       if embedding is not None})
+            except Exception as exception:
+                logger.warning(f"Unable to read the {tier.name} embedding cache: {exception}")
+                continue
+            if len(tier_found) > 0:
+                self._record_hits(tier.name, len(tier_found))
+                self._store(self.tiers[:index], tier_found)
+                found.update(tier_found)
+                missing = [key for key in missing if key not in tier_found]
+        return found
+
+    @staticmethod
+    def _store(tiers: List[BaseEmbeddingCache], embeddings: Dict[str, np.ndarray]):
+        items = list(embeddings.items())
+        for tier in tiers:
+            try:
+                for start in range(0, len(items), CACHE_CHUNK_SIZE):
+                    tier.set_many(dict(items[start:start + CACHE_CHUNK_SIZE]))
+            except Exception as exception:
+                logger.warning(f"Unable to write the {tier.name} embedding cache: {exception}")
+
+    @classmethod
+    def _record_hits(cls, tier_name: str, count: int):
+        with cls._stats_lock:
+            cls._hits[tier_name] = cls._hits.get(tier_name, 0) + count
+
+    @classmethod
+    def _record_misses(cls, count: int):
+        with cls._stats_lock:
+            cls._misses += count
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Returns the embeddings of texts, only the texts missing from the cache are sent to the model.
+
+        Args:
+            texts (List[str]): The texts.
+
+        Returns:
+            List[List[float]]: The embedding of every text, in the same order.
+        """
+        keys = [self.cache_key(text) for text in texts]
+        found = self._lookup(keys)
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if len(missing) > 0:
+            self._record_misses(len(missing))
+            embeddings = self.embedding_model.get_embeddings(list(missing.values()))
+            computed = {key: np.asarray(embedding, dtype=np.float32) for key, embedding in zip(missing, embeddings)}
+            self._store(self.tiers, computed)
+            found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def get_embedding(self, text):
+        key = self.cache_key(text)
+        embedding = self._lookup([key]).get(key)
+        if embedding is not None:
+            return embedding.tolist()
+        self._record_misses(1)
+        embedding = self.embedding_model.get_embedding(text)
+        if not isinstance(embedding, dict):
+            self._store(self.tiers, {key: np.asarray(embedding, dtype=np.float32)})
+        return embedding
+
+    async def get_embedding_async(self, text):
+        key = self.cache_key(text)
+        embedding = self._lookup([key]).get(key)
+        if embedding is not None:
+            return embedding.tolist()
+        self._record_misses(1)
+        embedding = await self.embedding_model.get_embedding_async(text)
+        if not isinstance(embedding, dict):
+            self._store(self.tiers, {key: np.asarray(embedding, dtype=np.float32)})
+        return embedding
+
+    @classmethod
+    def get_stats(cls) -> Optional[dict]:
+        """
+        Returns the hit ratio of the embedding cache of the process and the size of its tiers.
+
+        Returns:
+            dict: The hits per tier, the misses, the hit ratio and the entries and bytes stored per tier,
+                None if caching is disabled.
+        """
+        tiers = cls.get_tiers()
+        if len(tiers) == 0:
+            return None
+        with cls._stats_lock:
+            hits = dict(cls._hits)
+            misses = cls._misses
+        lookups = sum(hits.values()) + misses
+        stored = {}
+        for tier in tiers:
+            try:
+                stored[tier.name] = tier.get_stats()
+            except Exception as exception:
+                logger.warning(f"Unable to read the size of the {tier.name} embedding cache: {exception}")
+        return {"hits": hits, "misses": misses, "hit_ratio": sum(hits.values()) / lookups if lookups > 0 else 0.0,
+                "tiers": stored}
@@ -0,0 +1,263 @@
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+import redis
+
+from superagi.config.config import get_config
+
+REDIS_KEY_PREFIX = "embedding_cache"
+# rows added at once to the memory mapped files of the disk cache
+DISK_GROWTH_ROWS = 1024
+
+# stores embeddings with their size, then evicts the entries not read for longer than the ttl and the
+# least recently read ones until the cache fits in its bytes budget. Returns the bytes stored.
+REDIS_SET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+local max_bytes = tonumber(ARGV[3])
+local prefix = ARGV[4]
+local function evict(key)
+    redis.call('DECRBY', KEYS[3], tonumber(redis.call('HGET', KEYS[2], key) or 0))
+    redis.call('DEL', prefix .. key)
+    redis.call('HDEL', KEYS[2], key)
+    redis.call('ZREM', KEYS[1], key)
+end
+for i = 5, #ARGV, 2 do
+    local key = ARGV[i]
+    local value = ARGV[i + 1]
+    redis.call('DECRBY', KEYS[3], tonumber(redis.call('HGET', KEYS[2], key) or 0))
+    redis.call('SET', prefix .. key, value, 'EX', ttl)
+    redis.call('HSET', KEYS[2], key, string.len(value))
+    redis.call('INCRBY', KEYS[3], string.len(value))
+    redis.call('ZADD', KEYS[1], now, key)
+end
+for _, key in ipairs(redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', now - ttl)) do
+    evict(key)
+end
+while tonumber(redis.call('GET', KEYS[3]) or 0) > max_bytes do
+    local oldest = redis.call('ZRANGE', KEYS[1], 0, 0)
+    if #oldest == 0 then
+        break
+    end
+    evict(oldest[1])
+end
+return tonumber(redis.call('GET', KEYS[3]) or 0)
+"""
+
+
+class BaseEmbeddingCache(ABC):
+    """
+    A tier of the embedding cache. Embeddings are stored as float32 vectors under a content address,
+    entries older than the ttl are dropped and the least recently read ones are evicted once the tier
+    holds more than max_bytes of vectors.
+    """
+    name = None
+
+    def __init__(self, ttl: int, max_bytes: int):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+
+    @abstractmethod
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Returns the cached embedding of every key, None for the missing or expired ones."""
+
+    @abstractmethod
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        """Caches embeddings by key."""
+
+    @abstractmethod
+    def get_stats(self) -> Dict[str, int]:
+        """Returns the number of entries and the bytes of vectors held by the tier."""
+
+
+class MemoryEmbeddingCache(BaseEmbeddingCache):
+    """Least recently used embeddings of the process."""
+    name = "memory"
+
+    def __init__(self, ttl: int, max_bytes: int):
+        super().__init__(ttl, max_bytes)
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.bytes = 0
+
+    def _evict(self, key: str):
+        embedding, _ = self.entries.pop(key)
+        self.bytes -= embedding.nbytes
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        now = time.time()
+        embeddings = []
+        with self.lock:
+            for key in keys:
+                entry = self.entries.get(key)
+                if entry is not None and entry[1] + self.ttl <= now:
+                    self._evict(key)
+                    entry = None
+                if entry is not None:
+                    self.entries.move_to_end(key)
+                embeddings.append(None if entry is None else entry[0])
+        return embeddings
+
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        now = time.time()
+        with self.lock:
+            for key, embedding in embeddings.items():
+                if key in self.entries:
+                    self._evict(key)
+                self.entries[key] = (embedding, now)
+                self.bytes += embedding.nbytes
+            while self.bytes > self.max_bytes and len(self.entries) > 0:
+                self._evict(next(iter(self.entries)))
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes}
+
+
+class RedisEmbeddingCache(BaseEmbeddingCache):
+    """
+    Embeddings shared by all workers. Vectors are stored as raw float32 bytes with a redis ttl, a sorted
+    set of last read times and a hash of their sizes drive the eviction.
+    """
+    name = "redis"
+
+    def __init__(self, ttl: int, max_bytes: int, redis_url: str = None):
+        super().__init__(ttl, max_bytes)
+        redis_url = redis_url or get_config("REDIS_URL")
+        self.db = redis.Redis.from_url("redis://" + redis_url + "/0")
+        self.lru_key = REDIS_KEY_PREFIX + ":lru"
+        self.sizes_key = REDIS_KEY_PREFIX + ":sizes"
+        self.bytes_key = REDIS_KEY_PREFIX + ":bytes"
+        self.value_prefix = REDIS_KEY_PREFIX + ":value:"
+        self._set_script = self.db.register_script(REDIS_SET_SCRIPT)
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        values = self.db.mget([self.value_prefix + key for key in keys])
+        hits = {key: time.time() for key, value in zip(keys, values) if value is not None}
+        if len(hits) > 0:
+            self.db.zadd(self.lru_key, hits)
+        return [None if value is None else np.frombuffer(value, dtype=np.float32) for value in values]
+
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        args = [time.time(), self.ttl, self.max_bytes, self.value_prefix]
+        for key, embedding in embeddings.items():
+            args += [key, embedding.astype(np.float32).tobytes()]
+        self._set_script(keys=[self.lru_key, self.sizes_key, self.bytes_key], args=args)
+
+    def get_stats(self) -> Dict[str, int]:
+        pipeline = self.db.pipeline(transaction=False)
+        pipeline.zcard(self.lru_key)
+        pipeline.get(self.bytes_key)
+        entries, stored_bytes = pipeline.execute()
+        return {"entries": int(entries), "bytes": int(stored_bytes or 0)}
+
+
+class DiskEmbeddingCache(BaseEmbeddingCache):
+    """
+    Embeddings of a single host for large corpora. The vectors of each dimension are rows of a memory
+    mapped float32 file and a sqlite index maps the keys to their rows, the rows of evicted entries are
+    reused by the next writes.
+    """
+    name = "disk"
+
+    def __init__(self, ttl: int, max_bytes: int, path: str):
+        super().__init__(ttl, max_bytes)
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.lock = threading.Lock()
+        self.maps: Dict[int, np.memmap] = {}
+        self.connection = sqlite3.connect(os.path.join(path, "index.sqlite"), check_same_thread=False,
+                                          timeout=30)
+        with self.lock, self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, dimension INTEGER, "
+                                    "row INTEGER, created_at REAL, accessed_at REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS ix_entries_created_at ON entries (created_at)")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS free_rows (dimension INTEGER, row INTEGER, "
+                                    "PRIMARY KEY (dimension, row))")
+            self.connection.execute("CREATE TABLE IF NOT EXISTS files (dimension INTEGER PRIMARY KEY, rows INTEGER)")
+
+    def _get_map(self, dimension: int, rows: int) -> np.memmap:
+        """Returns the memory mapped file of a dimension holding at least the given number of rows."""
+        vectors = self.maps.get(dimension)
+        if vectors is not None and vectors.shape[0] >= rows:
+            return vectors
+        file_path = os.path.join(self.path, f"embeddings_{dimension}.f32")
+        row_bytes = dimension * np.dtype(np.float32).itemsize
+        capacity = os.path.getsize(file_path) // row_bytes if os.path.exists(file_path) else 0
+        if capacity < rows:
+            capacity = max(rows, capacity + DISK_GROWTH_ROWS)
+            with open(file_path, "a+b") as file:
+                file.truncate(capacity * row_bytes)
+        vectors = np.memmap(file_path, dtype=np.float32, mode="r+", shape=(capacity, dimension))
+        self.maps[dimension] = vectors
+        return vectors
+
+    def get_many(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        now = time.time()
+        with self.lock, self.connection:
+            placeholders = ",".join("?" * len(keys))
+            rows = self.connection.execute(f"SELECT key, dimension, row FROM entries WHERE key IN ({placeholders}) "
+                                           f"AND created_at > ?", (*keys, now - self.ttl)).fetchall()
+            self.connection.executemany("UPDATE entries SET accessed_at = ? WHERE key = ?",
+                                        [(now, key) for key, _, _ in rows])
+            found = {key: np.array(self._get_map(dimension, row + 1)[row]) for key, dimension, row in rows}
+        return [found.get(key) for key in keys]
+
+    def _free(self, condition: str, parameters: tuple):
+        self.connection.execute(f"INSERT OR IGNORE INTO free_rows (dimension, row) "
+                                f"SELECT dimension, row FROM entries WHERE {condition}", parameters)
+        self.connection.execute(f"DELETE FROM entries WHERE {condition}", parameters)
+
+    def _allocate_row(self, dimension: int) -> int:
+        free_row = self.connection.execute("SELECT row FROM free_rows WHERE dimension = ? LIMIT 1",
+                                           (dimension,)).fetchone()
+        if free_row is not None:
+            self.connection.execute("DELETE FROM free_rows WHERE dimension = ? AND row = ?", (dimension, free_row[0]))
+            return free_row[0]
+        rows = self.connection.execute("SELECT rows FROM files WHERE dimension = ?", (dimension,)).fetchone()
+        row = 0 if rows is None else rows[0]
+        self.connection.execute("INSERT OR REPLACE INTO files (dimension, rows) VALUES (?, ?)", (dimension, row + 1))
+        return row
+
+    def set_many(self, embeddings: Dict[str, np.ndarray]):
+        now = time.time()
+        with self.lock, self.connection:
+            # the rows are allocated under a write lock of the index, shared by the processes of the host
+            self.connection.execute("BEGIN IMMEDIATE")
+            self._free(f"key IN ({','.join('?' * len(embeddings))})", tuple(embeddings.keys()))
+            written = set()
+            for key, embedding in embeddings.items():
+                dimension = embedding.shape[0]
+                row = self._allocate_row(dimension)
+                self._get_map(dimension, row + 1)[row] = embedding
+                written.add(dimension)
+                self.connection.execute("INSERT INTO entries (key, dimension, row, created_at, accessed_at) "
+                                        "VALUES (?, ?, ?, ?, ?)", (key, dimension, row, now, now))
+            for dimension in written:
+                self.maps[dimension].flush()
+
+            self._free("created_at <= ?", (now - self.ttl,))
+            stored_bytes = self.connection.execute("SELECT COALESCE(SUM(dimension), 0) * 4 FROM entries").fetchone()[0]
+            while stored_bytes > self.max_bytes:
+                oldest = self.connection.execute("SELECT key, dimension FROM entries "
+                                                 "ORDER BY accessed_at, rowid LIMIT 100").fetchall()
+                if len(oldest) == 0:
+                    break
+                for key, dimension in oldest:
+                    if stored_bytes <= self.max_bytes:
+                        break
+                    self._free("key = ?", (key,))
+                    stored_bytes -= dimension * 4
+
+    def get_stats(self) -> Dict[str, int]:
+        with self.lock:
+            entries, stored_bytes = self.connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(dimension), 0) * 4 FROM entries").fetchone()
+        return {"entries": entries, "bytes": stored_bytes}
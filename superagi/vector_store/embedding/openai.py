@@ -1,42 +1,206 @@
+import asyncio
 import os
+import threading
+import time
 from abc import ABC, abstractmethod
+from concurrent.futures import Future
+from typing import Callable, Dict, List, Tuple
+
 from superagi.config.config import get_config
 import openai
 from sqlalchemy.orm import sessionmaker
 
+from superagi.helper.token_counter import TokenCounter
+from superagi.lib.logger import logger
 from superagi.models.configuration import Configuration
 from superagi.models.db import connect_db
 
+
 class BaseEmbedding(ABC):
 
-  @abstractmethod
-  def get_embedding(self, text):
-    pass
+    @abstractmethod
+    def get_embedding(self, text):
+        pass
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Returns the embeddings of many texts, embedding models without a batch api embed them one by one.
+
+        Args:
+            texts (List[str]): The texts.
+
+        Raises:
+            RuntimeError: If a text could not be embedded.
+
+        Returns:
+            List[List[float]]: The embedding of every text, in the same order.
+        """
+        embeddings = []
+        for text in texts:
+            embedding = self.get_embedding(text)
+            if isinstance(embedding, dict):
+                raise RuntimeError(f"Failed to embed the text: {embedding.get('error')}")
+            embeddings.append(embedding)
+        return embeddings
+
+
+class EmbeddingCoalescer:
+    """
+    Gathers the single text embedding requests made at the same time by different threads into one
+    batch request. A request arriving while no batch is in flight is sent right away. Otherwise the
+    first request to arrive waits for the coalescing window, then sends the texts that arrived
+    meanwhile in one call and hands every thread its embedding.
 
-class OpenAiEmbedding:
+    Attributes:
+        embed (Callable[[List[str]], List[List[float]]]): The batch embedding call.
+        window (float): The seconds the first request waits for others to join its batch.
+        in_flight (int): The number of batch requests being sent.
+    """
+    _coalescers: Dict[Tuple, "EmbeddingCoalescer"] = {}
+    _coalescers_lock = threading.Lock()
+
+    def __init__(self, embed: Callable[[List[str]], List[List[float]]], window: float):
+        self.embed = embed
+        self.window = window
+        self.lock = threading.Lock()
+        self.pending: List[Tuple[str, Future]] = []
+        self.in_flight = 0
+
+    @classmethod
+    def get(cls, key: Tuple, embed: Callable[[List[str]], List[List[float]]], window: float) -> "EmbeddingCoalescer":
+        """Returns the coalescer of the requests sharing an api key, model and api base."""
+        coalescer = cls._coalescers.get(key)
+        if coalescer is None:
+            with cls._coalescers_lock:
+                coalescer = cls._coalescers.setdefault(key, cls(embed, window))
+        return coalescer
+
+    def submit(self, text: str) -> List[float]:
+        """
+        Embeds a text as part of the current batch.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            List[float]: The embedding of the text, the exception of the batch request is raised again.
+        """
+        future = Future()
+        with self.lock:
+            self.pending.append((text, future))
+            leader = len(self.pending) == 1
+            concurrent = self.in_flight > 0
+        if leader:
+            if concurrent:
+                time.sleep(self.window)
+            with self.lock:
+                batch, self.pending = self.pending, []
+                self.in_flight += 1
+            try:
+                embeddings = self.embed([batch_text for batch_text, _ in batch])
+                for (_, batch_future), embedding in zip(batch, embeddings):
+                    batch_future.set_result(embedding)
+            except Exception as exception:
+                for _, batch_future in batch:
+                    batch_future.set_exception(exception)
+            finally:
+                with self.lock:
+                    self.in_flight -= 1
+        return future.result()
+
+
+class OpenAiEmbedding(BaseEmbedding):
     def __init__(self, api_key, model="text-embedding-ada-002"):
         self.model = model
         self.api_key = api_key
+        self.max_batch_size = int(get_config("EMBEDDING_BATCH_MAX_SIZE", 2048))
+        self.max_batch_tokens = int(get_config("EMBEDDING_BATCH_MAX_TOKENS", 100000))
+        self.coalesce_window = float(get_config("EMBEDDING_COALESCE_WINDOW_MS", 5)) / 1000
 
-    async def get_embedding_async(self, text):
+    def get_api_base(self):
+        return get_config("OPENAI_API_BASE", "https://api.openai.com/v1")
+
+    def split_batches(self, texts: List[str]) -> List[List[str]]:
+        """
+        Splits texts into the fewest batch requests holding at most max_batch_size texts and
+        max_batch_tokens tokens each. A text above the token budget is sent alone.
+
+        Args:
+            texts (List[str]): The texts.
+
+        Returns:
+            List[List[str]]: The batches, in the order of the texts.
+        """
         try:
-            # openai.api_key = get_config("OPENAI_API_KEY")
-            openai.api_key = self.api_key
-            response = await openai.Embedding.create(
-                input=[text],
-                engine=self.model
+            token_counts = TokenCounter.count_many(texts, self.model)
+        except Exception as exception:
+            # about four characters per token when the encoding of the model can not be loaded
+            logger.warning(f"Unable to count the tokens of the texts to embed: {exception}")
+            token_counts = [len(text) // 4 + 1 for text in texts]
+
+        batches = []
+        batch = []
+        batch_tokens = 0
+        for text, token_count in zip(texts, token_counts):
+            if len(batch) > 0 and (len(batch) >= self.max_batch_size or
+                                   batch_tokens + token_count > self.max_batch_tokens):
+                batches.append(batch)
+                batch = []
+                batch_tokens = 0
+            batch.append(text)
+            batch_tokens += token_count
+        if len(batch) > 0:
+            batches.append(batch)
+        return batches
+
+    @staticmethod
+    def _read_embeddings(response) -> List[List[float]]:
+        return [item["embedding"] for item in sorted(response["data"], key=lambda item: item["index"])]
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """
+        Embeds texts with as few requests as the batch limits allow.
+
+        Args:
+            texts (List[str]): The texts.
+
+        Returns:
+            List[List[float]]: The embedding of every text, in the same order.
+        """
+        embeddings = []
+        for batch in self.split_batches(texts):
+            response = openai.Embedding.create(
+                input=batch,
+                engine=self.model,
+                api_key=self.api_key,
+                api_base=self.get_api_base()
             )
-            return response['data'][0]['embedding']
+            embeddings.extend(self._read_embeddings(response))
+        return embeddings
+
+    async def get_embeddings_async(self, texts: List[str]) -> List[List[float]]:
+        """Same as `get_embeddings`, the batch requests are sent concurrently without blocking the event loop."""
+        responses = await asyncio.gather(*[openai.Embedding.acreate(
+            input=batch,
+            engine=self.model,
+            api_key=self.api_key,
+            api_base=self.get_api_base()
+        ) for batch in self.split_batches(texts)])
+        return [embedding for response in responses for embedding in self._read_embeddings(response)]
+
+    async def get_embedding_async(self, text):
+        try:
+            return (await self.get_embeddings_async([text]))[0]
         except Exception as exception:
             return {"error": exception}
 
     def get_embedding(self, text):
         try:
-            # openai.api_key = get_config("OPENAI_API_KEY")
-            response = openai.Embedding.create(
-                input=[text],
-                engine=self.model
-            )
-            return response['data'][0]['embedding']
+            if self.coalesce_window <= 0:
+                return self.get_embeddings([text])[0]
+            # the coalescer is shared by the clients of the same key, any of them can send the batch
+            coalescer = EmbeddingCoalescer.get((self.api_key, self.model, self.get_api_base()),
+                                               self.get_embeddings, self.coalesce_window)
+            return coalescer.submit(text)
         except Exception as exception:
             return {"error": exception}
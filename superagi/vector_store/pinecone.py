@@ -64,14 +64,17 @@ class Pinecone(VectorStore):
             namespace = self.namespace
 
         vectors = []
+        texts = list(texts)
         ids = ids or [str(uuid.uuid4()) for _ in texts]
         if len(ids) < len(texts):
             raise ValueError("Number of ids must match number of texts.")
 
-        for text, id in zip(texts, ids):
+        # all the texts are embedded in as few batch requests as possible
+        embeddings = self.embedding_model.get_embeddings(texts)
+        for text, id, embedding in zip(texts, ids, embeddings):
             metadata = metadatas.pop(0) if metadatas else {}
             metadata[self.text_field] = text
-            vectors.append((id, self.embedding_model.get_embedding(text), metadata))
+            vectors.append((id, embedding, metadata))
 
         self.index.upsert(vectors, namespace=namespace, batch_size=batch_size)
         return ids
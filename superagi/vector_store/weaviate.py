@@ -57,12 +57,14 @@ class Weaviate(VectorStore):
         self, texts: Iterable[str], metadatas: List[dict] | None = None, **kwargs: Any
     ) -> List[str]:
         result = []
+        texts = list(texts)
+        # all the texts are embedded in as few batch requests as possible
+        vectors = self.embedding_model.get_embeddings(texts)
         with self.client.batch as batch:
-            for i, text in enumerate(texts):
+            for i, (text, vector) in enumerate(zip(texts, vectors)):
                 metadata = metadatas[i] if metadatas else {}
                 data_object = metadata.copy()
                 data_object[self.text_field] = text
-                vector = self.embedding_model.get_embedding(text)
 
                 batch.add_data_object(data_object, class_name=self.index, vector=vector)
 
@@ -1,16 +1,75 @@
 from __future__ import absolute_import
+
+import json
+import os
+import socket
+
 from superagi.lib.logger import logger
 
 from celery import Celery
+from celery.signals import task_postrun, worker_process_init
 
 from superagi.config.config import get_config
 redis_url = get_config('REDIS_URL') or 'localhost:6379'
+# the pool statistics of every worker process, a field per process
+POOL_STATS_KEY = "db_pool_stats"
+POOL_STATS_TTL = 24 * 60 * 60
+# the embedding cache hit ratio and sizes seen by every worker process, a field per process
+EMBEDDING_CACHE_STATS_KEY = "embedding_cache_stats"
 
 app = Celery("superagi", include=["superagi.worker"], imports=["superagi.worker"])
 app.conf.broker_url = "redis://" + redis_url + "/0"
 app.conf.result_backend = "redis://" + redis_url + "/0"
 app.conf.worker_concurrency = 10
 
+
+@worker_process_init.connect
+def init_worker_process(**kwargs):
+    """Sizes the database pool of the worker child process and drops the connections of its parent."""
+    from superagi.agent import super_agi
+    from superagi.jobs import agent_executor
+    from superagi.models.db import connect_db, init_worker_process as init_db_worker_process
+    init_db_worker_process()
+    # the session factories of the tasks were bound to the engine inherited from the parent process
+    engine = connect_db()
+    super_agi.engine = agent_executor.engine = engine
+    super_agi.Session.configure(bind=engine)
+    agent_executor.Session.configure(bind=engine)
+
+
+@task_postrun.connect
+def close_task_sessions(**kwargs):
+    """Returns the connections of the task sessions to the pool and publishes the pool statistics."""
+    from superagi.agent.super_agi import session as agent_session
+    from superagi.jobs.agent_executor import Session as executor_session
+    from superagi.models.db import get_pool_stats
+    agent_session.remove()
+    executor_session.remove()
+    try:
+        pipeline = app.backend.client.pipeline()
+        pipeline.hset(POOL_STATS_KEY, f"{socket.gethostname()}:{os.getpid()}", json.dumps(get_pool_stats()))
+        pipeline.expire(POOL_STATS_KEY, POOL_STATS_TTL)
+        pipeline.execute()
+    except Exception as exception:
+        logger.warning(f"Unable to publish the database pool statistics: {exception}")
+
+
+@task_postrun.connect
+def publish_embedding_cache_stats(**kwargs):
+    """Publishes the hit ratio and the sizes of the embedding cache of the process."""
+    from superagi.vector_store.embedding.cached_embedding import CachedEmbedding
+    try:
+        stats = CachedEmbedding.get_stats()
+        if stats is None:
+            return
+        pipeline = app.backend.client.pipeline()
+        pipeline.hset(EMBEDDING_CACHE_STATS_KEY, f"{socket.gethostname()}:{os.getpid()}", json.dumps(stats))
+        pipeline.expire(EMBEDDING_CACHE_STATS_KEY, POOL_STATS_TTL)
+        pipeline.execute()
+    except Exception as exception:
+        logger.warning(f"Unable to publish the embedding cache statistics: {exception}")
+
+
 @app.task(name="execute_agent", autoretry_for=(Exception,), retry_backoff=2, max_retries=5)
 def execute_agent(agent_execution_id: int, time):
     """Execute an agent step in background."""
@@ -0,0 +1,418 @@
+"""
+End to end benchmark of the agent loop, run without network access or external services.
+
+The loop is driven through `SuperAgi.execute` and through `AgentExecutor.execute_next_action` with a
+scripted llm answering every prompt with a canned reply of the expected format, stub tools with a
+configurable latency, an in-memory redis for the task queue and a SQLite database for the models.
+For every workflow, driver and history length it reports the iterations per second, the cpu time,
+the SQL statements and the memory kept per iteration, and the peak traced memory of the run.
+
+Run it from the repository root with:
+
+    python -m tests.benchmarks.agent_loop_benchmark --iterations 50 --history 0 20 100
+
+The BPE files of tiktoken have to be available, either downloaded once or in TIKTOKEN_CACHE_DIR.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import ExitStack
+from datetime import datetime
+from typing import Type
+from unittest.mock import MagicMock, patch
+
+from pydantic import BaseModel, Field
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from superagi.agent.agent_cache import AgentConfigCache, AgentWorkflowGraph
+from superagi.agent.agent_prompt_builder import AgentPromptBuilder
+from superagi.agent.super_agi import SuperAgi
+from superagi.helper.encyption_helper import encrypt_data
+from superagi.helper.token_counter import TokenCounter
+from superagi.jobs.agent_executor import AgentExecutor
+from superagi.lib.logger import logger
+from superagi.llms.base_llm import BaseLlm
+from superagi.models.agent import Agent
+from superagi.models.agent_config import AgentConfiguration
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+from superagi.models.agent_workflow import AgentWorkflow
+from superagi.models.agent_workflow_step import AgentWorkflowStep
+from superagi.models.base_model import DBBaseModel
+from superagi.models.configuration import Configuration
+from superagi.models.organisation import Organisation
+from superagi.models.project import Project
+from superagi.models.tool import Tool
+from superagi.tools.base_tool import BaseTool
+from superagi.tools.tool_pool import ToolPool
+
+MODEL = "gpt-4"
+GOAL_BASED_AGENT = "Goal Based Agent"
+TASK_QUEUE_AGENT = "Task Queue Agent With Seed"
+WORKFLOWS = (GOAL_BASED_AGENT, TASK_QUEUE_AGENT)
+DRIVERS = ("super_agi", "agent_executor")
+STUB_TOOL_NAME = "StubSearch"
+PENDING_TASKS_PATTERN = re.compile(r"incomplete tasks `(\[.*?\])`", re.DOTALL)
+
+
+class InMemoryRedis:
+    """The subset of the redis client used by the task queue, kept in process memory."""
+
+    def __init__(self):
+        self.lists = {}
+        self.values = {}
+
+    def lpush(self, key, *values):
+        items = self.lists.setdefault(key, [])
+        for value in values:
+            items.insert(0, value)
+        return len(items)
+
+    def lpop(self, key):
+        items = self.lists.get(key)
+        return items.pop(0) if items else None
+
+    def lindex(self, key, index):
+        items = self.lists.get(key, [])
+        return items[index] if -len(items) <= index < len(items) else None
+
+    def lrange(self, key, start, end):
+        items = self.lists.get(key, [])
+        return items[start:] if end == -1 else items[start:end + 1]
+
+    def llen(self, key):
+        return len(self.lists.get(key, []))
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+        return int(self.values[key])
+
+    def delete(self, *keys):
+        return sum(self.lists.pop(key, None) is not None for key in keys)
+
+    def pipeline(self, transaction=True):
+        return InMemoryPipeline(self)
+
+    def register_script(self, script):
+        # the only script of the task queue: complete the first pending task
+        def complete_task(keys, args):
+            task = self.lpop(keys[0])
+            self.lpush(keys[1], json.dumps({"task": task, "response": args[0]}))
+            overflow = self.llen(keys[1]) - int(args[1])
+            if overflow >= int(args[2]):
+                for _ in range(overflow):
+                    self.lpush(keys[2], self.lists[keys[1]].pop())
+            return [self.llen(keys[0]), self.llen(keys[2])]
+        return complete_task
+
+    def ltrim(self, key, start, end):
+        items = self.lists.get(key, [])
+        self.lists[key] = items[start:] if end == -1 else items[start:end + 1]
+        return True
+
+
+class InMemoryPipeline:
+    """Pipeline of the in-memory redis, the queued commands run on `execute`."""
+
+    def __init__(self, client: InMemoryRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue_command(*args):
+            self.commands.append((getattr(self.client, name), args))
+            return self
+        return queue_command
+
+    def execute(self):
+        results = [command(*args) for command, args in self.commands]
+        self.commands = []
+        return results
+
+
+class ScriptedLlm(BaseLlm):
+    """
+    Llm answering each prompt of the agent workflows with a canned reply of the expected format after
+    a fixed latency. Tool prompts always pick the stub tool so the agent never finishes by itself.
+    """
+
+    def __init__(self, model=MODEL, api_key=None, temperature=0.6, latency=0.0, **kwargs):
+        self.model = model
+        self.api_key = api_key
+        self.temperature = temperature
+        self.latency = latency
+        self.calls = 0
+
+    def get_model(self):
+        return self.model
+
+    def get_image_model(self):
+        return None
+
+    def generate_image(self, prompt: str, size: int = 512, num: int = 2):
+        raise NotImplementedError
+
+    def chat_completion(self, messages, max_tokens=None):
+        self.calls += 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        prompt = messages[0]["content"]
+        if "task-generating AI" in prompt:
+            content = json.dumps(["Research the topic", "Draft the report", "Review the report"])
+        elif "create a single task" in prompt:
+            content = json.dumps([f"Follow up task {self.calls}"])
+        elif "task prioritization AI" in prompt:
+            match = PENDING_TASKS_PATTERN.search(prompt)
+            content = match.group(1) if match else "[]"
+        elif "running summary of the history" in prompt:
+            content = "The agent searched the stub tool and collected intermediate results."
+        else:
+            content = json.dumps({
+                "thoughts": {"text": "I should look up more details", "reasoning": "The goal needs research",
+                             "plan": "- search\n- summarise", "criticism": "be concise", "speak": "searching"},
+                "tool": {"name": STUB_TOOL_NAME,
+                         "args": {"query": f"benchmark query {self.calls}"}}})
+        return {"response": None, "content": content}
+
+
+class StubSearchSchema(BaseModel):
+    query: str = Field(..., description="The search query.")
+
+
+class StubSearchTool(BaseTool):
+    """Search tool returning a fixed result after a configurable latency."""
+    name = STUB_TOOL_NAME
+    description = "Searches the web and returns the most relevant snippets for a query."
+    args_schema: Type[StubSearchSchema] = StubSearchSchema
+    permission_required: bool = False
+    latency: float = 0.0
+
+    def _execute(self, query: str):
+        if self.latency > 0:
+            time.sleep(self.latency)
+        return f"Results for {query}: " + "Researchers reported a stable sulfide electrolyte. " * 8
+
+
+def create_database(path: str):
+    engine = create_engine(f"sqlite:///{path}")
+    DBBaseModel.metadata.create_all(engine)
+    return engine
+
+
+def seed_workflows(session):
+    """Creates the Goal Based Agent and Task Queue Agent With Seed workflows like the app startup does."""
+    goal_workflow = AgentWorkflow(name=GOAL_BASED_AGENT, description="Goal based agent")
+    task_workflow = AgentWorkflow(name=TASK_QUEUE_AGENT, description="Task queue based agent")
+    session.add_all([goal_workflow, task_workflow])
+    session.commit()
+
+    def add_step(workflow, unique_id, output, output_type, step_type="NORMAL", **kwargs):
+        step = AgentWorkflowStep(unique_id=unique_id, prompt=output["prompt"], variables=str(output["variables"]),
+                                 agent_workflow_id=workflow.id, output_type=output_type, step_type=step_type,
+                                 next_step_id=-1, **kwargs)
+        session.add(step)
+        session.commit()
+        return step
+
+    goal_step = add_step(goal_workflow, "gb1", AgentPromptBuilder.get_super_agi_single_prompt(), "tools",
+                         step_type="TRIGGER", history_enabled=True,
+                         completion_prompt="Determine which next tool to use, and respond using the format "
+                                           "specified above:")
+    goal_step.next_step_id = goal_step.id
+    start_step = add_step(task_workflow, "tb1", AgentPromptBuilder.start_task_based(), "tasks", step_type="TRIGGER")
+    create_step = add_step(task_workflow, "tb2", AgentPromptBuilder.create_tasks(), "tasks")
+    analyse_step = add_step(task_workflow, "tb3", AgentPromptBuilder.analyse_task(), "tools")
+    prioritize_step = add_step(task_workflow, "tb4", AgentPromptBuilder.prioritize_tasks(), "replace_tasks")
+    start_step.next_step_id = analyse_step.id
+    analyse_step.next_step_id = create_step.id
+    create_step.next_step_id = prioritize_step.id
+    prioritize_step.next_step_id = analyse_step.id
+    session.commit()
+    return {GOAL_BASED_AGENT: goal_workflow, TASK_QUEUE_AGENT: task_workflow}
+
+
+def seed_agent_execution(session, workflow, history: int, iterations: int):
+    """Creates an agent with its configuration, api key and running execution, with `history` past feeds."""
+    organisation = Organisation(name="Benchmark", description="Benchmark organisation")
+    session.add(organisation)
+    session.commit()
+    project = Project(name="Benchmark", organisation_id=organisation.id, description="Benchmark project")
+    session.add(project)
+    tool = Tool(name=STUB_TOOL_NAME, description="Stub search", folder_name="benchmarks",
+                class_name=StubSearchTool.__name__, file_name="agent_loop_benchmark.py", toolkit_id=1)
+    session.add(tool)
+    session.add(Configuration(organisation_id=organisation.id, key="model_api_key", value=encrypt_data("sk-benchmark")))
+    session.commit()
+    agent = Agent(name="Benchmark agent", project_id=project.id, description="Researches a topic",
+                  agent_workflow_id=workflow.id)
+    session.add(agent)
+    session.commit()
+    configuration = {"goal": str(["Research the latest developments in battery chemistry",
+                                  "Write a summary report"]),
+                     "instruction": str([]), "constraints": str(["Be concise"]), "agent_type": workflow.name,
+                     "tools": json.dumps([tool.id]), "exit": "No exit criterion", "iteration_interval": "0",
+                     "model": MODEL, "permission_type": "God Mode", "LTM_DB": "Pinecone",
+                     "memory_window": str(history + 4 * iterations + 10), "max_iterations": str(10 * iterations + 10)}
+    session.add_all([AgentConfiguration(agent_id=agent.id, key=key, value=value)
+                     for key, value in configuration.items()])
+    trigger_step = session.query(AgentWorkflowStep).filter(AgentWorkflowStep.agent_workflow_id == workflow.id,
+                                                           AgentWorkflowStep.step_type == "TRIGGER").first()
+    agent_execution = AgentExecution(status="RUNNING", name="Benchmark run", agent_id=agent.id,
+                                     last_execution_time=datetime.now(), num_of_calls=0, num_of_tokens=0,
+                                     current_step_id=trigger_step.id)
+    session.add(agent_execution)
+    session.commit()
+
+    feeds = [("system", "Initial prompt"), ("system", "The current time and date is Mon Jun 19 10:00:00 2023")]
+    for index in range(history):
+        if index % 2 == 0:
+            feeds.append(("assistant", ScriptedLlm().chat_completion([{"role": "system", "content": ""}])["content"]))
+        else:
+            feeds.append(("system", StubSearchTool()._execute(f"history query {index}")))
+    session.add_all([AgentExecutionFeed(agent_execution_id=agent_execution.id, agent_id=agent.id, role=role, feed=feed,
+                                        token_count=TokenCounter.count_content_tokens(feed, MODEL))
+                     for role, feed in feeds])
+    session.commit()
+    return agent, agent_execution
+
+
+def offline_environment(stack: ExitStack, session_factory, llm_latency: float, tool_latency: float):
+    """Routes the database, redis, llm, tools and job scheduling of the agent loop to the local fakes."""
+    redis_client = InMemoryRedis()
+    stack.enter_context(patch("superagi.agent.task_queue.redis_url", "localhost:6379"))
+    stack.enter_context(patch("superagi.agent.task_queue.redis.Redis", return_value=redis_client))
+    stack.enter_context(patch.object(AgentConfigCache, "_db", redis_client))
+    stack.enter_context(patch.object(AgentConfigCache, "_entries", OrderedDict()))
+    stack.enter_context(patch.object(AgentWorkflowGraph, "_graphs", {}))
+    stack.enter_context(patch.object(ToolPool, "_db", redis_client))
+    stack.enter_context(patch.object(ToolPool, "_idle", {}))
+    stack.enter_context(patch("superagi.agent.super_agi.Session", session_factory))
+    stack.enter_context(patch("superagi.jobs.agent_executor.Session", scoped_session(session_factory)))
+    stack.enter_context(patch("superagi.jobs.agent_executor.engine", MagicMock()))
+    stack.enter_context(patch("superagi.jobs.agent_executor.VectorFactory.get_vector_storage", return_value=None))
+    stack.enter_context(patch("superagi.worker.execute_agent.delay"))
+    stack.enter_context(patch("superagi.lib.tracing.TimingStore"))
+    stack.enter_context(patch.object(AgentExecutor, "get_llm_class",
+                                     return_value=lambda **kwargs: ScriptedLlm(latency=llm_latency, **kwargs)))
+    stack.enter_context(patch.object(AgentExecutor, "create_object",
+                                     side_effect=lambda tool, session: StubSearchTool(latency=tool_latency)))
+
+
+def run_scenario(workflow_name: str, driver: str, history: int, iterations: int, llm_latency: float,
+                 tool_latency: float, trace_allocations: bool = False):
+    """
+    Runs `iterations` agent iterations on a fresh database and measures them.
+
+    Returns:
+        dict: The wall and cpu seconds, SQL statements and traced allocations of the run.
+    """
+    with tempfile.TemporaryDirectory() as directory, ExitStack() as stack:
+        engine = create_database(os.path.join(directory, "benchmark.sqlite"))
+        session_factory = sessionmaker(bind=engine)
+        offline_environment(stack, session_factory, llm_latency, tool_latency)
+        session = session_factory()
+        workflows = seed_workflows(session)
+        agent, agent_execution = seed_agent_execution(session, workflows[workflow_name], history, iterations)
+        agent_execution_id = agent_execution.id
+
+        if driver == "super_agi":
+            parsed_config = Agent.fetch_configuration(session, agent.id)
+            parsed_config["agent_execution_id"] = agent_execution_id
+            spawned_agent = SuperAgi(ai_name=parsed_config["name"], ai_role=parsed_config["description"],
+                                     llm=ScriptedLlm(latency=llm_latency),
+                                     tools=[StubSearchTool(latency=tool_latency)], memory=None,
+                                     agent_config=parsed_config)
+            steps = {step.id: step for step in session.query(AgentWorkflowStep).all()}
+            state = {"step_id": agent_execution.current_step_id}
+
+            def run_iteration():
+                step = steps[state["step_id"]]
+                spawned_agent.execute(step)
+                state["step_id"] = step.next_step_id
+        else:
+            executor = AgentExecutor()
+
+            def run_iteration():
+                executor.execute_next_action(agent_execution_id)
+        session.close()
+
+        statements = [0]
+
+        def count_statement(*args):
+            statements[0] += 1
+
+        event.listen(engine, "before_cursor_execute", count_statement)
+        gc.collect()
+        if trace_allocations:
+            tracemalloc.start()
+        wall_started_at, cpu_started_at = time.perf_counter(), time.process_time()
+        for _ in range(iterations):
+            run_iteration()
+        wall, cpu = time.perf_counter() - wall_started_at, time.process_time() - cpu_started_at
+        allocated, peak = tracemalloc.get_traced_memory() if trace_allocations else (0, 0)
+        if trace_allocations:
+            tracemalloc.stop()
+        event.remove(engine, "before_cursor_execute", count_statement)
+
+        session = session_factory()
+        calls = session.query(AgentExecution.num_of_calls).filter(AgentExecution.id == agent_execution_id).scalar()
+        session.close()
+        engine.dispose()
+        if calls < iterations:
+            raise RuntimeError(f"Only {calls} of the {iterations} iterations of {workflow_name} called the llm")
+        return {"wall": wall, "cpu": cpu, "statements": statements[0], "allocated": allocated, "peak": peak}
+
+
+def report(workflow_name, driver, history, iterations, timings, allocations):
+    print(f"{workflow_name:<28} {driver:<15} {history:>7} "
+          f"{iterations / timings['wall']:>9.1f} "
+          f"{timings['cpu'] / iterations * 1000:>10.2f} "
+          f"{timings['statements'] / iterations:>9.1f} "
+          f"{allocations['allocated'] / iterations / 1024:>12.1f} "
+          f"{allocations['peak'] / 1024:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--history", type=int, nargs="+", default=[0, 20, 100],
+                        help="number of past feeds of the execution before the run")
+    parser.add_argument("--workflow", choices=WORKFLOWS, nargs="+", default=list(WORKFLOWS))
+    parser.add_argument("--driver", choices=DRIVERS, nargs="+", default=list(DRIVERS))
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="seconds of every llm call")
+    parser.add_argument("--tool-latency", type=float, default=0.0, help="seconds of every tool run")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logger.logger.setLevel(getattr(logging, args.log_level.upper()))
+
+    # warm up the encoders so the load of the BPE files is not measured
+    TokenCounter.count_content_tokens("warm up", MODEL)
+
+    print(f"{'workflow':<28} {'driver':<15} {'history':>7} {'iter/s':>9} {'cpu ms/it':>10} {'stmts/it':>9} "
+          f"{'kept KiB/it':>12} {'peak KiB':>10}")
+    for workflow_name in args.workflow:
+        for driver in args.driver:
+            for history in args.history:
+                scenario = (workflow_name, driver, history, args.iterations, args.llm_latency, args.tool_latency)
+                timings = run_scenario(*scenario)
+                # allocations are traced in a separate run, tracemalloc slows the loop down
+                allocations = run_scenario(*scenario, trace_allocations=True)
+                report(workflow_name, driver, history, args.iterations, timings, allocations)
+
+
+if __name__ == "__main__":
+    main()
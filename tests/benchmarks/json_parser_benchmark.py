@@ -0,0 +1,116 @@
+"""
+Benchmark of the parsing of assistant replies: the previous JsonCleaner + json5 path against the
+TolerantJsonParser, on a corpus of real replies.
+
+The corpus is read from the assistant feeds of the database configured in config.yaml, from a file
+with one reply per line (json encoded strings) or, without both, from built-in samples of the usual
+llm formatting defects. Run it from the repository root with:
+
+    python -m tests.benchmarks.json_parser_benchmark --database --limit 2000
+    python -m tests.benchmarks.json_parser_benchmark --file replies.jsonl
+"""
+import argparse
+import json
+import time
+
+import json5
+
+from superagi.helper.json_cleaner import JsonCleaner
+from superagi.helper.tolerant_json_parser import TolerantJsonParser
+
+SAMPLE_REPLY = {"thoughts": {"text": "I should search for recent papers on solid state batteries",
+                             "reasoning": "The goal asks for the latest developments",
+                             "plan": "- search\n- read\n- summarise", "criticism": "be concise",
+                             "speak": "searching"},
+                "tool": {"name": "GoogleSearch", "args": {"query": "solid state battery breakthrough 2023"}}}
+
+
+def sample_corpus():
+    reply = json.dumps(SAMPLE_REPLY, indent=2)
+    return [
+        reply,
+        json.dumps(SAMPLE_REPLY),
+        "```json\n" + reply + "\n```",
+        "Here is my next step:\n" + reply,
+        reply.replace('"\n', '",\n').replace("}\n", "},\n"),
+        reply.replace('"thoughts":', "thoughts:").replace('"tool":', "tool:"),
+        reply[:-3],
+        reply + "}",
+        reply.replace("- search\\n- read", "- search\n- read"),
+    ]
+
+
+def load_database_corpus(limit: int):
+    from sqlalchemy.orm import sessionmaker
+
+    from superagi.models.agent_execution_feed import AgentExecutionFeed
+    from superagi.models.db import connect_db
+
+    session = sessionmaker(bind=connect_db())()
+    try:
+        feeds = session.query(AgentExecutionFeed.feed).filter(AgentExecutionFeed.role == "assistant") \
+            .order_by(AgentExecutionFeed.id.desc()).limit(limit).all()
+        return [feed for (feed,) in feeds if feed]
+    finally:
+        session.close()
+
+
+def load_file_corpus(path: str):
+    with open(path, "r") as file:
+        return [json.loads(line) for line in file if line.strip()]
+
+
+def legacy_parse(text):
+    return json5.loads(JsonCleaner.check_and_clean_json(text))
+
+
+def run(parse, corpus, iterations):
+    results = []
+    for text in corpus:
+        try:
+            results.append(parse(text))
+        except ValueError:
+            results.append(None)
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for text in corpus:
+            try:
+                parse(text)
+            except ValueError:
+                pass
+    elapsed = time.perf_counter() - start
+    return results, elapsed / (iterations * len(corpus)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database", action="store_true", help="read the assistant replies from the database")
+    parser.add_argument("--file", help="file with one json encoded reply per line")
+    parser.add_argument("--limit", type=int, default=1000, help="number of replies read from the database")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.database:
+        corpus = load_database_corpus(args.limit)
+    elif args.file:
+        corpus = load_file_corpus(args.file)
+    else:
+        corpus = sample_corpus()
+    if len(corpus) == 0:
+        print("The corpus is empty")
+        return
+
+    legacy_results, legacy_ms = run(legacy_parse, corpus, args.iterations)
+    new_results, new_ms = run(TolerantJsonParser.loads, corpus, args.iterations)
+    legacy_parsed = sum(result is not None for result in legacy_results)
+    new_parsed = sum(result is not None for result in new_results)
+    same = sum(legacy is not None and legacy == new for legacy, new in zip(legacy_results, new_results))
+    print(f"replies: {len(corpus)}")
+    print(f"{'JsonCleaner + json5':<22} {legacy_ms:8.3f} ms/reply   parsed {legacy_parsed}/{len(corpus)}")
+    print(f"{'TolerantJsonParser':<22} {new_ms:8.3f} ms/reply   parsed {new_parsed}/{len(corpus)}   "
+          f"x{legacy_ms / new_ms:5.1f}")
+    print(f"same result on {same} of the {legacy_parsed} replies parsed by JsonCleaner + json5")
+
+
+if __name__ == "__main__":
+    main()
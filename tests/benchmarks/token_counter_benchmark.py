@@ -0,0 +1,121 @@
+"""
+Micro-benchmark comparing the previous TokenCounter code path with the cached, batched one.
+
+Run it from the repository root with:
+
+    python -m tests.benchmarks.token_counter_benchmark --iterations 200
+"""
+import argparse
+import time
+from collections import OrderedDict
+
+import tiktoken
+
+from superagi.agent.agent_prompt_builder import AgentPromptBuilder
+from superagi.helper.token_counter import TokenCounter
+
+MODEL = "gpt-3.5-turbo"
+
+
+def legacy_count_message_tokens(messages, model=MODEL):
+    """The TokenCounter.count_message_tokens implementation before encoders and counts were cached."""
+    try:
+        model_token_per_message_dict = {"gpt-3.5-turbo-0301": 4, "gpt-4-0314": 3, "gpt-3.5-turbo": 4, "gpt-4": 3,
+                                        "gpt-3.5-turbo-16k": 4, "gpt-4-32k": 3, "gpt-4-32k-0314": 3}
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("cl100k_base")
+    tokens_per_message = model_token_per_message_dict[model]
+    num_tokens = 0
+    for message in messages:
+        num_tokens += tokens_per_message
+        num_tokens += len(encoding.encode(message['content']))
+    return num_tokens + 3
+
+
+def reset_token_count_cache():
+    TokenCounter._token_count_cache = OrderedDict()
+
+
+def build_prompt_messages(num_history_messages):
+    prompt = AgentPromptBuilder.get_super_agi_single_prompt()["prompt"]
+    prompt = prompt.replace("{goals}", AgentPromptBuilder.add_list_items_to_string(
+        ["Research the latest developments in battery chemistry", "Write a summary report to report.txt"]))
+    messages = [{"role": "system", "content": prompt},
+                {"role": "system", "content": "The current time and date is Mon Jun 19 10:00:00 2023"}]
+    for i in range(num_history_messages):
+        if i % 2 == 0:
+            content = ('{"thoughts": {"text": "I should search for recent papers on solid state batteries", '
+                       '"reasoning": "The goal asks for the latest developments", "plan": "- search\\n- read\\n- '
+                       f'summarise", "criticism": "be concise", "speak": "searching"}}, "tool": {{"name": '
+                       f'"GoogleSearch", "args": {{"query": "solid state battery breakthrough {i}"}}}}}}')
+            messages.append({"role": "assistant", "content": content})
+        else:
+            content = (f"Tool GoogleSearch returned: Result {i}. Researchers reported a sulfide electrolyte with "
+                       "improved stability against lithium metal anodes, reaching 1000 cycles at room temperature. "
+                       * 4)
+            messages.append({"role": "system", "content": content})
+    messages.append({"role": "user", "content": "Determine which next tool to use, and respond using the format "
+                                                "specified above:"})
+    return messages
+
+
+def time_it(function, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1000
+
+
+def report(name, legacy_ms, new_ms):
+    speedup = legacy_ms / new_ms if new_ms > 0 else float("inf")
+    print(f"{name:<45} legacy {legacy_ms:8.3f} ms   new {new_ms:8.3f} ms   x{speedup:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--history", type=int, default=40, help="number of history messages in the prompt")
+    args = parser.parse_args()
+
+    messages = build_prompt_messages(args.history)
+    # warm up the encoders so the download/load of BPE files is not measured
+    legacy_count_message_tokens(messages)
+    TokenCounter.count_message_tokens(messages, MODEL)
+
+    reset_token_count_cache()
+    report("count_message_tokens (agent step, repeated)",
+           time_it(lambda: legacy_count_message_tokens(messages), args.iterations),
+           time_it(lambda: TokenCounter.count_message_tokens(messages, MODEL), args.iterations))
+
+    def cold_count_many():
+        reset_token_count_cache()
+        TokenCounter.count_many([message["content"] for message in messages], MODEL)
+
+    report("count tokens of uncached texts (batched)",
+           time_it(lambda: legacy_count_message_tokens(messages), args.iterations),
+           time_it(cold_count_many, args.iterations))
+
+    completed_tasks = [{"task": f"Search for battery paper {i}", "response": messages[-2]["content"]}
+                       for i in range(10)]
+
+    def legacy_task_history():
+        final_output = ""
+        for task in reversed(completed_tasks):
+            final_output = f"Task: {task['task']}\nResult: {task['response']}\n" + final_output
+            legacy_count_message_tokens([{"role": "user", "content": final_output}])
+
+    def new_task_history():
+        token_count = TokenCounter.tokens_per_message(MODEL) + 3
+        for task in reversed(completed_tasks):
+            token_count += TokenCounter.count_content_tokens(
+                f"Task: {task['task']}\nResult: {task['response']}\n", MODEL)
+
+    reset_token_count_cache()
+    report("task history window (growing string)",
+           time_it(legacy_task_history, args.iterations),
+           time_it(new_task_history, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+from collections import OrderedDict
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.agent.agent_cache import AgentConfigCache, AgentWorkflowGraph
+from superagi.models.agent_workflow_step import AgentWorkflowStep
+
+
+@pytest.fixture
+def redis_db():
+    db = MagicMock()
+    with patch.object(AgentConfigCache, "_db", db), patch.object(AgentConfigCache, "_entries", OrderedDict()):
+        yield db
+
+
+@patch("superagi.agent.agent_cache.Agent.fetch_configuration")
+def test_configuration_is_cached_per_version(mock_fetch, redis_db):
+    mock_fetch.return_value = {"goal": ["goal 1"], "max_iterations": 10}
+    redis_db.get.return_value = "3"
+
+    first = AgentConfigCache.get_configuration(MagicMock(), 1)
+    first["agent_execution_id"] = 5
+    second = AgentConfigCache.get_configuration(MagicMock(), 1)
+
+    assert second == {"goal": ["goal 1"], "max_iterations": 10}
+    mock_fetch.assert_called_once()
+
+    redis_db.get.return_value = "4"
+    AgentConfigCache.get_configuration(MagicMock(), 1)
+    assert mock_fetch.call_count == 2
+
+
+@patch("superagi.agent.agent_cache.Agent.fetch_configuration")
+def test_invalidate_bumps_the_version(mock_fetch, redis_db):
+    mock_fetch.return_value = {"goal": []}
+    redis_db.get.return_value = None
+    AgentConfigCache.get_configuration(MagicMock(), 1)
+
+    AgentConfigCache.invalidate(1)
+
+    redis_db.incr.assert_called_once_with("agent_config_version:1")
+    AgentConfigCache.get_configuration(MagicMock(), 1)
+    assert mock_fetch.call_count == 2
+
+
+@patch("superagi.agent.agent_cache.Agent.fetch_configuration")
+def test_configuration_is_read_from_the_database_without_redis(mock_fetch, redis_db):
+    mock_fetch.return_value = {"goal": []}
+    redis_db.get.side_effect = ConnectionError("redis is down")
+
+    assert AgentConfigCache.get_configuration(MagicMock(), 1) == {"goal": []}
+    AgentConfigCache.get_configuration(MagicMock(), 1)
+    assert mock_fetch.call_count == 2
+
+
+def test_workflow_graph_follows_next_steps_without_queries():
+    session = MagicMock()
+    session.query.return_value.filter.return_value.all.return_value = [
+        AgentWorkflowStep(id=1, agent_workflow_id=9, step_type="TRIGGER", next_step_id=2),
+        AgentWorkflowStep(id=2, agent_workflow_id=9, step_type="NORMAL", next_step_id=2)]
+
+    with patch.object(AgentWorkflowGraph, "_graphs", {}):
+        graph = AgentWorkflowGraph.get(session, 9)
+        assert AgentWorkflowGraph.get(session, 9) is graph
+
+    session.query.assert_called_once()
+    assert graph.get_step(1).step_type == "TRIGGER"
+    assert graph.get_next_step(1).id == 2
+    assert graph.get_next_step(2).id == 2
+    assert graph.get_step(3) is None
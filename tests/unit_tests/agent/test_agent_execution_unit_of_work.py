@@ -0,0 +1,63 @@
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from superagi.agent.agent_execution_unit_of_work import AgentExecutionUnitOfWork
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+
+
+@pytest.fixture
+def session():
+    engine = create_engine("sqlite://")
+    AgentExecution.__table__.create(engine)
+    AgentExecutionFeed.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(AgentExecution(id=1, agent_id=2, status="RUNNING", num_of_calls=3, num_of_tokens=100,
+                               current_step_id=1))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_flush_writes_iteration_in_one_transaction(session):
+    statements = []
+    event.listen(session.bind, "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement.split()[0]))
+    unit_of_work = AgentExecutionUnitOfWork(1, 2)
+    unit_of_work.add_feed("reply", "assistant", 5)
+    unit_of_work.add_feed("Tool returned: done", "system", 4)
+    unit_of_work.add_usage(1, 50)
+    unit_of_work.add_usage(1, 25)
+    unit_of_work.set_execution_fields(current_step_id=2, status="COMPLETED")
+
+    unit_of_work.flush(session)
+
+    assert statements == ["INSERT", "UPDATE"]
+    assert unit_of_work.is_empty()
+    agent_execution = session.query(AgentExecution).filter(AgentExecution.id == 1).first()
+    assert (agent_execution.num_of_calls, agent_execution.num_of_tokens) == (5, 175)
+    assert (agent_execution.status, agent_execution.current_step_id) == ("COMPLETED", 2)
+    feeds = session.query(AgentExecutionFeed).order_by(AgentExecutionFeed.created_at).all()
+    assert [(feed.feed, feed.role, feed.token_count) for feed in feeds] == [("reply", "assistant", 5),
+                                                                             ("Tool returned: done", "system", 4)]
+
+
+def test_flush_increments_are_atomic(session):
+    first, second = AgentExecutionUnitOfWork(1, 2), AgentExecutionUnitOfWork(1, 2)
+    first.add_usage(1, 10)
+    second.add_usage(1, 20)
+
+    first.flush(session)
+    second.flush(session)
+
+    agent_execution = session.query(AgentExecution).filter(AgentExecution.id == 1).first()
+    assert (agent_execution.num_of_calls, agent_execution.num_of_tokens) == (5, 130)
+
+
+def test_flush_empty_unit_of_work_does_nothing():
+    session = MagicMock()
+    AgentExecutionUnitOfWork(1, 2).flush(session)
+    session.commit.assert_not_called()
@@ -173,4 +173,34 @@ def test_prioritize_tasks():
     # Now we validate the prompt
     prompt = super_agi_prompt["prompt"]
     assert "{goals}" in prompt
-    assert "{pending_tasks}" in prompt
\ No newline at end of file
+    assert "{pending_tasks}" in prompt
+
+
+def test_add_tools_to_prompt_is_cached():
+    tools = [MockTool(), MockTool(name="Other Tool", description="Another mock tool.")]
+    AgentPromptBuilder._tools_string_cache.clear()
+    with patch.object(AgentPromptBuilder, '_build_tools_string',
+                      wraps=AgentPromptBuilder._build_tools_string) as build_tools_string:
+        first = AgentPromptBuilder.add_tools_to_prompt(tools)
+        second = AgentPromptBuilder.add_tools_to_prompt(tools)
+        without_finish = AgentPromptBuilder.add_tools_to_prompt(tools, add_finish=False)
+
+    assert first == second
+    assert "2. Other Tool: Another mock tool." in first
+    assert "3. finish" in first
+    assert "finish" not in without_finish
+    assert build_tools_string.call_count == 2
+
+
+def test_replace_main_variables_without_instructions():
+    super_agi_prompt = "{goals}{instructions}{task_instructions}{constraints}"
+    result = AgentPromptBuilder.replace_main_variables(super_agi_prompt, ["goal1"], [], ["constraint1"], [])
+    assert result == "1. goal1\n{task_instructions}1. constraint1\n"
+
+
+def test_get_super_agi_multi_tool_prompt():
+    result = AgentPromptBuilder.get_super_agi_multi_tool_prompt()
+
+    assert '"tools": [' in result["prompt"]
+    assert "{response_format}" not in result["prompt"]
+    assert result["variables"] == ["goals", "instructions", "constraints", "tools"]
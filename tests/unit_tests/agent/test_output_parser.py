@@ -1,5 +1,5 @@
 import pytest
-from superagi.agent.output_parser import AgentOutputParser, AgentGPTAction, AgentTasks
+from superagi.agent.output_parser import AgentOutputParser, AgentGPTAction, AgentTasks, StreamingToolCallParser
 
 
 def test_parse():
@@ -40,3 +40,57 @@ def test_parse_tasks():
     output = parser.parse_tasks(invalid_json)
     assert isinstance(output, AgentTasks)
     assert "Could not parse invalid json" in output.error
+
+
+def test_streaming_tool_call_parser_detects_tool_before_trailing_fields():
+    parser = StreamingToolCallParser()
+    reply = '{"tool": {"name": "Write File", "args": {"file_name": "a.txt", "content": "x {y} \\"z\\""}}, ' \
+            '"thoughts": {"text": "some thought"}}'
+    detected_at = None
+    for index, char in enumerate(reply):
+        if parser.feed(char) is not None:
+            detected_at = index
+
+    assert parser.action == AgentGPTAction(name="Write File", args={"file_name": "a.txt", "content": 'x {y} "z"'})
+    assert detected_at == reply.index('}}')
+    assert parser.text == reply
+
+
+def test_streaming_tool_call_parser_name_after_args_and_no_args():
+    parser = StreamingToolCallParser()
+    parser.feed('```json\n{"thoughts": {"name": "not a tool"}, "tool": {"args": {"query": "agi"}, ')
+    assert parser.action is None
+    assert parser.feed('"name": "GoogleSearch"}}') == AgentGPTAction(name="GoogleSearch", args={"query": "agi"})
+
+    parser = StreamingToolCallParser()
+    parser.feed('{"tool": {"name": "finish"}')
+    assert parser.action == AgentGPTAction(name="finish", args={})
+
+
+def test_streaming_tool_call_parser_invalid_args():
+    parser = StreamingToolCallParser()
+    assert parser.feed('{"tool": {"name": "GoogleSearch", "args": {"query": agi}}}') is None
+    assert parser.action is None
+
+
+def test_parse_actions():
+    parser = AgentOutputParser()
+
+    multi_text = '{"thoughts": {"text": "search twice"}, "tools": [{"name": "GoogleSearch", "args": {"query": "a"}}, ' \
+                 '{"name": "GoogleSearch", "args": {"query": "b"}}, {"args": {}}]}'
+    actions = parser.parse_actions(multi_text)
+    assert actions[:2] == [AgentGPTAction(name="GoogleSearch", args={"query": "a"}),
+                           AgentGPTAction(name="GoogleSearch", args={"query": "b"})]
+    assert actions[2].name == "ERROR"
+
+    single_text = '{"thoughts": {"text": "some thought"}, "tool": {"name": "some tool", "args": {"arg1": "value1"}}}'
+    assert parser.parse_actions(single_text) == [AgentGPTAction(name="some tool", args={"arg1": "value1"})]
+
+
+def test_parse_repairs_llm_formatting():
+    parser = AgentOutputParser()
+
+    reply = 'Here is the next step:\n```json\n{"thoughts": {"text": "some thought",}, ' \
+            'tool: {"name": "some tool", "args": {"arg1": "line 1\nline 2"}}}\n```'
+    assert parser.parse(reply) == AgentGPTAction(name="some tool", args={"arg1": "line 1\nline 2"})
+    assert parser.parse_actions(reply) == [AgentGPTAction(name="some tool", args={"arg1": "line 1\nline 2"})]
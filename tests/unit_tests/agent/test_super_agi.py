@@ -0,0 +1,398 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
+
+from superagi.agent.agent_execution_unit_of_work import AgentExecutionUnitOfWork
+from superagi.agent.output_parser import AgentGPTAction
+from superagi.agent.super_agi import SuperAgi
+from superagi.jobs.agent_executor import DBToolkitConfiguration
+from superagi.llms.base_llm import BaseLlm
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+from superagi.models.tool_config import ToolConfig
+from superagi.vector_store.base import VectorStore
+
+
+@pytest.fixture
+def super_agi():
+    llm = Mock(spec=BaseLlm)
+    llm.get_model.return_value = "gpt-4"
+    memory = Mock(spec=VectorStore)
+    agent_config = {"permission_type": "GOD MODE", "agent_execution_id": 1, "agent_id": 2, "memory_window": 3}
+    return SuperAgi("test_ai", "test_role", llm, memory, [], agent_config)
+
+
+def test_split_history_uses_cached_token_counts(super_agi):
+    history = [{"role": "assistant", "content": f"message {i}", "token_count": 10} for i in range(5)]
+
+    with patch("superagi.agent.super_agi.TokenCounter.count_content_tokens") as mock_count:
+        past_messages, current_messages = super_agi.split_history(history, 40)
+
+    # each message costs 10 content tokens + 3 tokens of chat format overhead for gpt-4
+    assert past_messages == history[:2]
+    assert current_messages == history[2:]
+    mock_count.assert_not_called()
+
+
+def test_split_history_counts_missing_token_counts(super_agi):
+    history = [{"role": "assistant", "content": "old", "token_count": None},
+               {"role": "system", "content": "new", "token_count": 7}]
+
+    with patch("superagi.agent.super_agi.TokenCounter.count_content_tokens", return_value=7) as mock_count:
+        past_messages, current_messages = super_agi.split_history(history, 100)
+
+    assert past_messages == []
+    assert current_messages == history
+    mock_count.assert_called_once_with("old", "gpt-4")
+
+
+def test_split_history_when_nothing_fits(super_agi):
+    history = [{"role": "assistant", "content": "message", "token_count": 50}]
+    past_messages, current_messages = super_agi.split_history(history, 10)
+    assert past_messages == history
+    assert current_messages == []
+
+
+def test_backfill_feed_token_counts(super_agi):
+    session = MagicMock()
+    agent_feeds = [{"id": 1, "role": "user", "content": "counted", "token_count": 3},
+                   {"id": 2, "role": "system", "content": "not counted", "token_count": None}]
+
+    with patch("superagi.agent.super_agi.TokenCounter.count_content_tokens", return_value=5):
+        super_agi.backfill_feed_token_counts(session, agent_feeds)
+
+    assert agent_feeds[1]["token_count"] == 5
+    session.bulk_update_mappings.assert_called_once_with(AgentExecutionFeed, [{"id": 2, "token_count": 5}])
+    session.commit.assert_called_once()
+
+
+def test_stream_assistant_reply_starts_tool_before_reply_ends(super_agi):
+    tool_started = threading.Event()
+    tool = MagicMock()
+    tool.name = "GoogleSearch"
+    tool.permission_required = False
+    tool.execute.side_effect = lambda args: tool_started.set() or "results"
+    super_agi.tools = [tool]
+
+    def stream(messages, max_tokens):
+        yield '{"tool": {"name": "GoogleSearch", "args": {"query": "agi"}}'
+        # the trailing fields are only emitted once the tool is running
+        assert tool_started.wait(timeout=5)
+        yield ', "thoughts": {"text": "searching"}}'
+
+    super_agi.llm.chat_completion_stream.side_effect = stream
+    with ThreadPoolExecutor(max_workers=1) as tool_executor:
+        assistant_reply, early_tool_run = super_agi.stream_assistant_reply([], 100, tool_executor)
+        tool_response = super_agi.handle_tool_response(assistant_reply, early_tool_run)
+
+    assert assistant_reply.endswith('"searching"}}')
+    assert tool_response == {"result": "Tool GoogleSearch returned: results", "retry": False}
+    tool.execute.assert_called_once_with({"query": "agi"})
+
+
+@patch("superagi.agent.super_agi.TokenCounter.count_content_tokens", return_value=5)
+@patch("superagi.agent.super_agi.TokenCounter.token_limit", return_value=4096)
+@patch("superagi.agent.super_agi.TaskQueue")
+def test_failed_stream_waits_for_the_tool_started_early(mock_task_queue, mock_token_limit, mock_count, super_agi):
+    tool_finished = threading.Event()
+    search = build_tool("GoogleSearch", execute=lambda args: tool_finished.wait(timeout=5) and "results")
+    super_agi.tools = [search]
+
+    def stream(messages, max_tokens):
+        yield '{"tool": {"name": "GoogleSearch", "args": {"query": "agi"}}'
+        raise RuntimeError("connection reset")
+
+    super_agi.llm.chat_completion_stream.side_effect = stream
+    # the tool only finishes once the step is waiting for it
+    threading.Timer(0.1, tool_finished.set).start()
+    unit_of_work = AgentExecutionUnitOfWork(1, 2)
+    workflow_step = MagicMock(history_enabled=False, output_type="tools", prompt="prompt")
+
+    with patch.object(super_agi, "is_streaming_enabled", return_value=True), \
+            patch.object(super_agi, "fetch_agent_feeds", return_value=[{"role": "user", "content": "goal"}]), \
+            patch.object(super_agi, "build_agent_prompt", return_value="prompt"), \
+            pytest.raises(RuntimeError, match="Failed to get response from llm"):
+        super_agi.execute_step(MagicMock(), workflow_step, unit_of_work)
+
+    assert tool_finished.is_set()
+    assert [feed["feed"] for feed in unit_of_work.feeds] == ["Tool GoogleSearch returned: results"]
+    search.execute.assert_called_once_with({"query": "agi"})
+
+
+def test_start_tool_early_skips_tools_needing_permission(super_agi):
+    tool = MagicMock()
+    tool.name = "Write File"
+    tool.permission_required = True
+    super_agi.tools = [tool]
+    super_agi.agent_config["permission_type"] = "RESTRICTED"
+
+    assert super_agi.start_tool_early(AgentGPTAction(name="Write File", args={}), MagicMock()) is None
+    assert super_agi.start_tool_early(AgentGPTAction(name="finish", args={}), MagicMock()) is None
+
+
+def build_tool(name, permission_required=False, execute=None):
+    tool = MagicMock()
+    tool.name = name
+    tool.permission_required = permission_required
+    del tool.resource_manager
+    del tool.tool_response_manager
+    if execute is not None:
+        tool.execute.side_effect = execute
+    return tool
+
+
+def test_handle_tool_responses_runs_calls_concurrently(super_agi):
+    # both searches have to be running at the same time to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+    search = build_tool("GoogleSearch", execute=lambda args: barrier.wait() is not None and "found " + args["query"])
+    super_agi.tools = [search]
+    actions = [AgentGPTAction(name="GoogleSearch", args={"query": "a"}),
+               AgentGPTAction(name="GoogleSearch", args={"query": "b"}),
+               AgentGPTAction(name="finish", args={})]
+
+    tool_response, permission_response = super_agi.handle_tool_responses(actions)
+
+    assert permission_response is None
+    assert tool_response == {"result": "Tool GoogleSearch returned: found a\nTool GoogleSearch returned: found b\n"
+                                       "The finish tool must be used on its own, it was ignored.",
+                             "retry": False}
+
+
+def test_handle_tool_responses_reads_tool_configs_before_running_calls(super_agi):
+    engine = create_engine("sqlite://")
+    ToolConfig.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([ToolConfig(toolkit_id=1, key="GOOGLE_API_KEY", value="google-key"),
+                     ToolConfig(toolkit_id=2, key="JIRA_API_TOKEN", value="jira-token")])
+    session.commit()
+    query_threads = set()
+    event.listen(engine, "before_cursor_execute",
+                 lambda *args: query_threads.add(threading.current_thread().name))
+    # both calls have to be running at the same time to get past the barrier
+    barrier = threading.Barrier(2, timeout=5)
+
+    def build_config_tool(name, toolkit_id, key):
+        tool = build_tool(name)
+        tool.toolkit_config = DBToolkitConfiguration(session=session, toolkit_id=toolkit_id)
+        tool.execute.side_effect = lambda args: barrier.wait() is not None and tool.toolkit_config.get_tool_config(key)
+        return tool
+
+    super_agi.tools = [build_config_tool("GoogleSearch", 1, "GOOGLE_API_KEY"),
+                       build_config_tool("JiraSearch", 2, "JIRA_API_TOKEN")]
+    actions = [AgentGPTAction(name="GoogleSearch", args={}), AgentGPTAction(name="JiraSearch", args={})]
+
+    tool_response, _ = super_agi.handle_tool_responses(actions)
+
+    assert tool_response["result"] == "Tool GoogleSearch returned: google-key\nTool JiraSearch returned: jira-token"
+    assert query_threads == {threading.current_thread().name}
+    session.close()
+
+
+def test_handle_tool_responses_checks_permission_per_call(super_agi):
+    search = build_tool("GoogleSearch", execute=lambda args: "found")
+    write_file = build_tool("Write File", permission_required=True)
+    super_agi.tools = [search, write_file]
+    super_agi.agent_config["permission_type"] = "RESTRICTED"
+    actions = [AgentGPTAction(name="Write File", args={"file_name": "a.txt"}),
+               AgentGPTAction(name="GoogleSearch", args={"query": "a"}),
+               AgentGPTAction(name="Write File", args={"file_name": "b.txt"})]
+
+    with patch.object(super_agi, "request_permission",
+                      return_value={"result": "WAITING_FOR_PERMISSION", "permission_id": 7}) as request_permission:
+        tool_response, permission_response = super_agi.handle_tool_responses(actions)
+
+    assert permission_response == {"result": "WAITING_FOR_PERMISSION", "permission_id": 7}
+    request_permission.assert_called_once()
+    assert request_permission.call_args[0][0] == actions[0]
+    write_file.execute.assert_not_called()
+    assert tool_response["result"] == "Tool GoogleSearch returned: found\n" \
+                                      "Tool Write File was not run as it needs a permission, use it again in a " \
+                                      "later step."
+
+
+def test_handle_tool_responses_runs_the_rest_of_a_reply_started_early(super_agi):
+    search = build_tool("GoogleSearch", execute=lambda args: "found " + args["query"])
+    super_agi.tools = [search]
+    actions = [AgentGPTAction(name="GoogleSearch", args={"query": "a"}),
+               AgentGPTAction(name="GoogleSearch", args={"query": "b"})]
+    observation_future = Future()
+    observation_future.set_result("found early")
+
+    tool_response, _ = super_agi.handle_tool_responses(actions, (actions[0], observation_future))
+
+    assert tool_response["result"] == "Tool GoogleSearch returned: found early\nTool GoogleSearch returned: found b"
+    search.execute.assert_called_once_with({"query": "b"})
+
+
+def test_parsed_action_is_not_parsed_again(super_agi):
+    search = build_tool("GoogleSearch", execute=lambda args: "found")
+    super_agi.tools = [search]
+    super_agi.output_parser = Mock()
+    action = AgentGPTAction(name="GoogleSearch", args={"query": "a"})
+
+    assert super_agi.check_permission_in_restricted_mode("reply", action) == (False, None)
+    assert super_agi.handle_tool_response("reply", action=action) == {"result": "Tool GoogleSearch returned: found",
+                                                                      "retry": False}
+    super_agi.output_parser.parse.assert_not_called()
+
+
+def mock_history_summary(super_agi, history_summary, last_summarized_feed_id):
+    super_agi.agent_config.update(history_summary=history_summary, last_summarized_feed_id=last_summarized_feed_id)
+
+
+@patch("superagi.agent.super_agi.TokenCounter.count_message_tokens", return_value=100)
+@patch("superagi.agent.super_agi.TokenCounter.count_content_tokens", return_value=10)
+def test_update_history_summary_summarizes_new_evictions_only(mock_count_content, mock_count_messages, super_agi):
+    session = MagicMock()
+    mock_history_summary(super_agi, "The agent searched for batteries.", 2)
+    past_messages = [{"id": feed_id, "role": "system", "content": f"feed {feed_id}", "token_count": 5}
+                     for feed_id in range(1, 5)]
+    super_agi.llm.chat_completion.return_value = {"content": " The agent searched and read two papers. "}
+    unit_of_work = AgentExecutionUnitOfWork(1, 2)
+
+    history_summary = super_agi.update_history_summary(session, past_messages, unit_of_work)
+
+    assert history_summary == "The agent searched and read two papers."
+    prompt = super_agi.llm.chat_completion.call_args[0][0][0]["content"]
+    assert "The agent searched for batteries." in prompt
+    assert "system: feed 3\nsystem: feed 4" in prompt
+    assert "feed 2" not in prompt
+    assert unit_of_work.execution_fields == {"history_summary": "The agent searched and read two papers.",
+                                             "last_summarized_feed_id": 4}
+    assert (unit_of_work.calls, unit_of_work.tokens) == (0, 110)
+
+
+def test_update_history_summary_without_new_evictions(super_agi):
+    session = MagicMock()
+    mock_history_summary(super_agi, "summary", 4)
+    unit_of_work = AgentExecutionUnitOfWork(1, 2)
+
+    history_summary = super_agi.update_history_summary(
+        session, [{"id": 4, "role": "system", "content": "feed", "token_count": 1}], unit_of_work)
+
+    assert history_summary == "summary"
+    super_agi.llm.chat_completion.assert_not_called()
+    assert unit_of_work.is_empty()
+
+
+def test_update_history_summary_skips_the_evicted_feeds_query_when_nothing_overflowed(super_agi):
+    session = MagicMock()
+    mock_history_summary(super_agi, "summary", 4)
+    super_agi.feed_window = [{"id": 5, "role": "system", "content": "feed", "token_count": 1}]
+
+    assert super_agi.update_history_summary(session, [], AgentExecutionUnitOfWork(1, 2)) == "summary"
+
+    session.query.assert_not_called()
+
+
+@patch("superagi.agent.super_agi.TokenCounter.count_message_tokens", return_value=100)
+@patch("superagi.agent.super_agi.TokenCounter.count_content_tokens", return_value=10)
+@patch("superagi.agent.super_agi.TokenCounter.token_limit", return_value=1000)
+def test_update_history_summary_in_chunks(mock_token_limit, mock_count_content, mock_count_messages, super_agi):
+    session = MagicMock()
+    mock_history_summary(super_agi, None, None)
+    # 1000 - 300 reserved for the summary - 100 of prompt - 500 of buffer leaves 100 tokens per chunk
+    past_messages = [{"id": feed_id, "role": "assistant", "content": f"feed {feed_id}", "token_count": 60}
+                     for feed_id in range(1, 4)]
+    super_agi.llm.chat_completion.side_effect = [{"content": "first"}, {"error": "rate limited"}]
+    unit_of_work = AgentExecutionUnitOfWork(1, 2)
+
+    history_summary = super_agi.update_history_summary(session, past_messages, unit_of_work)
+
+    assert history_summary == "first"
+    assert super_agi.llm.chat_completion.call_count == 2
+    assert unit_of_work.execution_fields == {"history_summary": "first", "last_summarized_feed_id": 1}
+
+
+def test_archive_completed_tasks_stores_then_removes_them(super_agi):
+    session = MagicMock()
+    task_queue = MagicMock()
+    task_queue.get_archived_tasks.return_value = [{"task": "task 1", "response": "a"},
+                                                  {"task": "task 2", "response": "b"}]
+
+    super_agi.archive_completed_tasks(session, task_queue)
+
+    rows = session.execute.call_args[0][1]
+    assert rows == [{"agent_execution_id": 1, "task": "task 1", "response": "a"},
+                    {"agent_execution_id": 1, "task": "task 2", "response": "b"}]
+    session.commit.assert_called_once()
+    task_queue.remove_archived_tasks.assert_called_once_with(2)
+
+
+def test_archive_completed_tasks_keeps_them_queued_on_failure(super_agi):
+    session = MagicMock()
+    session.execute.side_effect = SQLAlchemyError("database is down")
+    task_queue = MagicMock()
+    task_queue.get_archived_tasks.return_value = [{"task": "task 1", "response": "a"}]
+
+    super_agi.archive_completed_tasks(session, task_queue)
+
+    session.rollback.assert_called_once()
+    task_queue.remove_archived_tasks.assert_not_called()
+
+
+@pytest.fixture
+def feed_session():
+    engine = create_engine("sqlite://")
+    for model in (AgentExecution, AgentExecutionFeed):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(AgentExecution(id=1, agent_id=2))
+    session.commit()
+    yield session
+    session.close()
+
+
+def add_feeds(session, contents):
+    for content in contents:
+        session.add(AgentExecutionFeed(agent_execution_id=1, agent_id=2, role="assistant", feed=content,
+                                       token_count=1))
+    session.commit()
+
+
+def test_fetch_agent_feeds_returns_the_most_recent_window(super_agi, feed_session):
+    add_feeds(feed_session, ["prompt", "time", "feed 1", "feed 2", "feed 3", "feed 4"])
+
+    agent_feeds = super_agi.fetch_agent_feeds(feed_session, 1)
+
+    assert [feed["content"] for feed in agent_feeds] == ["feed 2", "feed 3", "feed 4"]
+
+
+def test_fetch_agent_feeds_only_reads_new_feeds(super_agi, feed_session):
+    add_feeds(feed_session, ["prompt", "time", "feed 1"])
+    assert [feed["content"] for feed in super_agi.fetch_agent_feeds(feed_session, 1)] == ["feed 1"]
+    assert not super_agi.feeds_evicted
+
+    add_feeds(feed_session, ["feed 2", "feed 3", "feed 4"])
+    queries = []
+    original_query = feed_session.query
+
+    def record_query(*entities):
+        queries.append(entities)
+        return original_query(*entities)
+
+    with patch.object(feed_session, "query", side_effect=record_query):
+        agent_feeds = super_agi.fetch_agent_feeds(feed_session, 1)
+
+    assert [feed["content"] for feed in agent_feeds] == ["feed 2", "feed 3", "feed 4"]
+    assert super_agi.feeds_evicted
+    # the opening feeds are read once per agent, the memory window comes from its configuration
+    assert len(queries) == 1
+
+
+def test_fetch_agent_feeds_without_history(super_agi, feed_session):
+    add_feeds(feed_session, ["prompt"])
+    assert super_agi.fetch_agent_feeds(feed_session, 1) == []
+
+
+def test_fetch_evicted_feeds(super_agi, feed_session):
+    add_feeds(feed_session, ["prompt", "time", "feed 1", "feed 2", "feed 3", "feed 4", "feed 5"])
+    super_agi.fetch_agent_feeds(feed_session, 1)
+
+    assert [feed["content"] for feed in super_agi.fetch_evicted_feeds(feed_session, None)] == ["feed 1", "feed 2"]
+    assert [feed["content"] for feed in super_agi.fetch_evicted_feeds(feed_session, 3)] == ["feed 2"]
@@ -1,7 +1,7 @@
 import unittest
 from unittest.mock import patch
 
-from superagi.agent.task_queue import TaskQueue
+from superagi.agent.task_queue import TaskQueue, TaskQueueSnapshot
 
 
 class TaskQueueTests(unittest.TestCase):
@@ -48,5 +48,69 @@ class TaskQueueTests(unittest.TestCase):
         mock_get_last_task_details.assert_called()
 
 
+class TaskQueueRedisTests(unittest.TestCase):
+    def setUp(self):
+        patcher = patch('superagi.agent.task_queue.redis_url', 'localhost:6379')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        redis_patcher = patch('superagi.agent.task_queue.redis.Redis')
+        self.db = redis_patcher.start().return_value
+        self.addCleanup(redis_patcher.stop)
+        self.queue = TaskQueue("7")
+
+    def test_connection_pool_is_shared(self):
+        self.assertIs(TaskQueue("8").get_connection_pool(), self.queue.get_connection_pool())
+
+    def test_get_snapshot_reads_in_one_round_trip(self):
+        pipeline = self.db.pipeline.return_value
+        pipeline.execute.return_value = [["task 2", "task 3"],
+                                          ['{"task": "task 1", "response": "done"}',
+                                           "{'task': 'task 0', 'response': 'legacy'}"]]
+
+        snapshot = self.queue.get_snapshot()
+
+        self.assertEqual(snapshot, TaskQueueSnapshot(
+            pending_tasks=["task 2", "task 3"],
+            completed_tasks=[{"task": "task 1", "response": "done"}, {"task": "task 0", "response": "legacy"}]))
+        self.assertEqual(snapshot.first_task, "task 2")
+        self.assertEqual(snapshot.last_task_details, {"task": "task 1", "response": "done"})
+        pipeline.lrange.assert_any_call("7_q", 0, -1)
+        pipeline.lrange.assert_any_call("7_q_completed", 0, -1)
+        pipeline.execute.assert_called_once()
+        self.assertIsNone(TaskQueueSnapshot(pending_tasks=[], completed_tasks=[]).first_task)
+
+    def test_add_and_replace_tasks_keep_the_order(self):
+        self.queue.add_tasks(["first", "second"])
+        self.db.lpush.assert_called_once_with("7_q", "second", "first")
+
+        pipeline = self.db.pipeline.return_value
+        self.queue.replace_tasks(["a", "b"])
+        pipeline.delete.assert_called_once_with("7_q")
+        pipeline.lpush.assert_called_once_with("7_q", "b", "a")
+        pipeline.execute.assert_called_once()
+
+    def test_complete_task_runs_the_atomic_script(self):
+        script = self.db.register_script.return_value
+        script.return_value = [2, 0]
+
+        self.assertEqual(self.queue.complete_task("result"), 2)
+        script.assert_called_once_with(keys=["7_q", "7_q_completed", "7_q_archive"], args=["result", 50, 20])
+        self.assertEqual(self.queue.archive_size, 0)
+
+    def test_archived_tasks_are_read_oldest_first_and_removed(self):
+        self.db.register_script.return_value.return_value = [1, 2]
+        self.queue.complete_task("result")
+        self.assertEqual(self.queue.archive_size, 2)
+
+        self.db.lrange.return_value = ['{"task": "task 2", "response": "b"}', '{"task": "task 1", "response": "a"}']
+        self.assertEqual(self.queue.get_archived_tasks(), [{"task": "task 1", "response": "a"},
+                                                           {"task": "task 2", "response": "b"}])
+        self.db.lrange.assert_called_once_with("7_q_archive", 0, -1)
+
+        self.queue.remove_archived_tasks(2)
+        self.db.ltrim.assert_called_once_with("7_q_archive", 0, -3)
+        self.assertEqual(self.queue.archive_size, 0)
+
+
 if __name__ == '__main__':
     unittest.main()
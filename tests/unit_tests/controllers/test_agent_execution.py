@@ -0,0 +1,33 @@
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from main import app
+
+client = TestClient(app)
+
+
+def test_get_agent_execution_timings():
+    with patch('superagi.helper.auth.get_user_organisation'), \
+            patch('superagi.helper.auth.db'), \
+            patch('superagi.controllers.agent_execution.db') as mock_db, \
+            patch('superagi.controllers.agent_execution.TimingStore') as mock_store:
+        mock_db.session.query.return_value.filter.return_value.first.return_value = (1,)
+        mock_store.return_value.get.return_value = [{"llm": 10.0, "total": 12.0}, {"llm": 20.0, "total": 22.0}]
+
+        response = client.get("/agentexecutions/1/timings")
+
+        assert response.status_code == 200
+        assert response.json()["iterations"] == 2
+        assert response.json()["phases"]["llm"] == {"count": 2, "mean": 15.0, "p50": 15.0, "p95": 19.5}
+
+
+def test_get_agent_execution_timings_of_unknown_execution():
+    with patch('superagi.helper.auth.get_user_organisation'), \
+            patch('superagi.helper.auth.db'), \
+            patch('superagi.controllers.agent_execution.db') as mock_db:
+        mock_db.session.query.return_value.filter.return_value.first.return_value = None
+
+        response = client.get("/agentexecutions/1/timings")
+
+        assert response.status_code == 404
@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from superagi.agent.task_queue import TaskQueueSnapshot
+from superagi.controllers.agent_execution_feed import get_execution_tasks
+from superagi.models.agent_execution_completed_task import AgentExecutionCompletedTask
+
+
+def test_get_execution_tasks_pages_through_the_archive_list():
+    engine = create_engine("sqlite://")
+    AgentExecutionCompletedTask.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([AgentExecutionCompletedTask(agent_execution_id=1, task=f"task {index}", response="done")
+                     for index in range(1, 3)])
+    session.commit()
+
+    with patch("superagi.controllers.agent_execution_feed.db") as mock_db, \
+            patch("superagi.controllers.agent_execution_feed.TaskQueue") as mock_task_queue:
+        mock_db.session = session
+        # tasks 3 and 4 wait in the archive list, 5 and 6 are in the completed window
+        mock_task_queue.return_value.get_snapshot.return_value = TaskQueueSnapshot(
+            pending_tasks=["task 7"], completed_tasks=[{"task": "task 6"}, {"task": "task 5"}])
+        mock_task_queue.return_value.get_archived_tasks.return_value = [{"task": "task 3"}, {"task": "task 4"}]
+
+        first_page = get_execution_tasks(1, page=0, page_size=3, Authorize=None)
+        second_page = get_execution_tasks(1, page=1, page_size=3, Authorize=None)
+
+    assert first_page["tasks"] == [{"name": "task 7"}]
+    assert first_page["completed_task_count"] == 6
+    assert first_page["completed_tasks"] == [{"name": "task 4"}, {"name": "task 5"}, {"name": "task 6"}]
+    assert second_page["completed_tasks"] == [{"name": "task 1"}, {"name": "task 2"}, {"name": "task 3"}]
+    session.close()
@@ -0,0 +1,28 @@
+from unittest.mock import patch
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from superagi.controllers.model_api_key import delete_model_api_key
+from superagi.models.model_api_key import ModelApiKey
+from superagi.models.organisation import Organisation
+
+
+def test_delete_model_api_key_is_scoped_to_the_user_organisation():
+    engine = create_engine("sqlite://")
+    ModelApiKey.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([ModelApiKey(id=1, organisation_id=1, name="own", value="sk-1"),
+                     ModelApiKey(id=2, organisation_id=2, name="other", value="sk-2")])
+    session.commit()
+
+    with patch("superagi.controllers.model_api_key.db") as mock_db:
+        mock_db.session = session
+        with pytest.raises(HTTPException) as error:
+            delete_model_api_key(2, organisation=Organisation(id=1))
+        assert error.value.status_code == 404
+        assert delete_model_api_key(1, organisation=Organisation(id=1)) == {"id": 1}
+
+    assert [key.id for key in session.query(ModelApiKey).all()] == [2]
@@ -0,0 +1,22 @@
+from superagi.helper.prompt_template import PromptTemplate
+
+
+def test_compile_splits_segments():
+    template = PromptTemplate("Goals:\n{goals}\nTools:\n{tools}")
+    assert template.segments == ["Goals:\n", "goals", "\nTools:\n", "tools"]
+    assert template.variables == {"goals", "tools"}
+
+
+def test_compile_is_cached():
+    prompt = "Cached prompt {goals}"
+    assert PromptTemplate.compile(prompt) is PromptTemplate.compile(prompt)
+
+
+def test_render_fills_placeholders():
+    template = PromptTemplate.compile("{goals} and {goals}, {constraints}")
+    assert template.render({"goals": "g", "constraints": "c"}) == "g and g, c"
+
+
+def test_render_keeps_missing_and_json_braces():
+    template = PromptTemplate.compile('{task_instructions} {"arg name": "value"} {goals}')
+    assert template.render({"goals": "g"}) == '{task_instructions} {"arg name": "value"} g'
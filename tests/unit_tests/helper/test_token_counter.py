@@ -1,9 +1,10 @@
 import pytest
 
+from collections import OrderedDict
 from typing import List
 from superagi.helper.token_counter import TokenCounter
 from superagi.types.common import BaseMessage
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 
 
 def test_token_limit():
@@ -25,4 +26,69 @@ def test_count_text_tokens():
     assert TokenCounter.count_text_tokens(text) == 10
 
     text = "What is your name?"
-    assert TokenCounter.count_text_tokens(text) == 9
\ No newline at end of file
+    assert TokenCounter.count_text_tokens(text) == 9
+
+
+class FakeEncoding:
+    name = "fake_encoding"
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, text):
+        self.encoded.append(text)
+        return text.split()
+
+    def encode_batch(self, texts, num_threads=8):
+        self.encoded.extend(texts)
+        return [text.split() for text in texts]
+
+
+@pytest.fixture
+def fake_encoding(monkeypatch):
+    encoding = FakeEncoding()
+    monkeypatch.setattr(TokenCounter, "_encodings", {"gpt-4": encoding})
+    monkeypatch.setattr(TokenCounter, "_token_count_cache", OrderedDict())
+    return encoding
+
+
+def test_get_encoding_is_resolved_once_per_model(monkeypatch):
+    monkeypatch.setattr(TokenCounter, "_encodings", {})
+    encoding = FakeEncoding()
+    with patch("superagi.helper.token_counter.tiktoken.encoding_for_model", return_value=encoding) as mock_for_model:
+        assert TokenCounter.get_encoding("gpt-4") is encoding
+        assert TokenCounter.get_encoding("gpt-4") is encoding
+    mock_for_model.assert_called_once_with("gpt-4")
+
+
+def test_count_content_tokens_caches_repeated_content(fake_encoding):
+    assert TokenCounter.count_content_tokens("one two three", "gpt-4") == 3
+    assert TokenCounter.count_content_tokens("one two three", "gpt-4") == 3
+    assert fake_encoding.encoded == ["one two three"]
+
+
+def test_count_many_only_encodes_uncached_texts(fake_encoding):
+    TokenCounter.count_content_tokens("cached text", "gpt-4")
+
+    counts = TokenCounter.count_many(["a b c", "cached text", "d"], "gpt-4")
+
+    assert counts == [3, 2, 1]
+    assert fake_encoding.encoded == ["cached text", "a b c", "d"]
+
+
+def test_count_message_tokens(fake_encoding):
+    messages = [{"role": "system", "content": "a b"}, {"role": "user", "content": "c"}]
+    # 3 content tokens, 3 tokens per message for gpt-4 and 3 tokens priming the reply
+    assert TokenCounter.count_message_tokens(messages, "gpt-4") == 3 + 2 * 3 + 3
+
+
+def test_token_count_cache_evicts_least_recently_used(fake_encoding, monkeypatch):
+    monkeypatch.setattr(TokenCounter, "_token_count_cache_size", 2)
+    TokenCounter.count_content_tokens("first", "gpt-4")
+    TokenCounter.count_content_tokens("second", "gpt-4")
+    TokenCounter.count_content_tokens("first", "gpt-4")
+    TokenCounter.count_content_tokens("third", "gpt-4")
+    TokenCounter.count_content_tokens("first", "gpt-4")
+    TokenCounter.count_content_tokens("second", "gpt-4")
+
+    assert fake_encoding.encoded == ["first", "second", "third", "second"]
@@ -0,0 +1,45 @@
+import pytest
+
+from superagi.helper.tolerant_json_parser import TolerantJsonParser
+
+TOOL_CALL = {"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", "args": {"query": "agi"}}}
+
+
+@pytest.mark.parametrize("text", [
+    '{"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", "args": {"query": "agi"}}}',
+    '```json\n{"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", "args": {"query": "agi"}}}\n```',
+    'Sure, here is my answer:\n{"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", '
+    '"args": {"query": "agi"}}} Let me know!',
+    '{"thoughts": {"text": "search",}, "tool": {"name": "GoogleSearch", "args": {"query": "agi",},},}',
+    '{thoughts: {text: "search"}, tool: {name: "GoogleSearch", args: {query: "agi"}}}',
+    "{'thoughts': {'text': 'search'}, 'tool': {'name': 'GoogleSearch', 'args': {'query': 'agi'}}}",
+    '{"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", "args": {"query": "agi"',
+    '{"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", "args": {"query": "agi"}}}}}',
+    '{\n  // the next tool\n  "thoughts": {"text": "search"}, /* search */ "tool": {"name": "GoogleSearch", '
+    '"args": {"query": "agi"}}\n}',
+    '```\n{"thoughts": {"text": "search"}, "tool": {"name": "GoogleSearch", "args": {"query": "agi"}}\n```',
+])
+def test_loads_repairs_tool_calls(text):
+    assert TolerantJsonParser.loads(text) == TOOL_CALL
+
+
+def test_loads_repairs_strings():
+    text = '{"content": "line 1\nline 2\tC:\\path", "quote": \'say "hi" it\\\'s\', "flag": True, "none": None}'
+    assert TolerantJsonParser.loads(text) == {"content": "line 1\nline 2\tC:\\path", "quote": 'say "hi" it\'s',
+                                              "flag": True, "none": None}
+
+
+def test_loads_keeps_valid_escapes_and_nested_arrays():
+    text = 'Result: {"tools": [{"name": "a", "args": {"items": [1, 2.5e3, -3]}}, {"name": "b\\u00e9\\n"}],}'
+    assert TolerantJsonParser.loads(text) == {"tools": [{"name": "a", "args": {"items": [1, 2500.0, -3]}},
+                                                        {"name": "bé\n"}]}
+
+
+def test_loads_array_without_object():
+    assert TolerantJsonParser.loads('Tasks: ["a", "b",]') == ["a", "b"]
+
+
+@pytest.mark.parametrize("text", ['{"this is not valid json', 'no json at all', '{"a": }'])
+def test_loads_invalid_json(text):
+    with pytest.raises(ValueError):
+        TolerantJsonParser.loads(text)
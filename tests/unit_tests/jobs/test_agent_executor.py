@@ -1,9 +1,26 @@
+from datetime import datetime, timedelta
+
 import pytest
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
 
+from superagi.helper.encyption_helper import encrypt_data
 from superagi.jobs.agent_executor import AgentExecutor
+from superagi.llms.async_openai import AsyncOpenAi
+from superagi.llms.cached_llm import CachedLlm
+from superagi.llms.openai import OpenAi
+from superagi.models.agent import Agent
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.configuration import Configuration, ModelApiKeyCache
+from superagi.models.organisation import Organisation
+from superagi.models.project import Project
 from superagi.models.tool import Tool
+from superagi.tools.code.write_code import CodingTool
 from superagi.tools.file.write_file import WriteFileTool
+from superagi.tools.thinking.tools import ThinkingTool
 
 
 def test_validate_filename():
@@ -31,3 +48,151 @@ def test_create_object():
     assert isinstance(obj, WriteFileTool)
     assert obj.toolkit_config.session == session
     assert obj.toolkit_config.toolkit_id == tool.toolkit_id
+
+
+@patch("superagi.jobs.agent_executor.get_config")
+def test_get_warm_session_time_slice(mock_get_config):
+    mock_get_config.return_value = "30"
+    assert AgentExecutor.get_warm_session_time_slice() == 30.0
+
+    mock_get_config.return_value = None
+    assert AgentExecutor.get_warm_session_time_slice() == 0
+
+    mock_get_config.return_value = "invalid"
+    assert AgentExecutor.get_warm_session_time_slice() == 0
+
+
+@patch("superagi.jobs.agent_executor.get_config")
+def test_get_llm_class(mock_get_config):
+    mock_get_config.return_value = "true"
+    assert AgentExecutor.get_llm_class() is AsyncOpenAi
+
+    mock_get_config.return_value = False
+    assert AgentExecutor.get_llm_class() is OpenAi
+
+
+def test_can_continue_warm_session():
+    session = MagicMock()
+    agent_execution = AgentExecution(status="RUNNING", num_of_calls=3, current_step_id=1)
+
+    assert AgentExecutor().can_continue_warm_session(session, agent_execution, max_iterations=10)
+    session.refresh.assert_called_with(agent_execution)
+
+    agent_execution.status = "PAUSED"
+    assert not AgentExecutor().can_continue_warm_session(session, agent_execution, max_iterations=10)
+
+    agent_execution.status = "RUNNING"
+    assert not AgentExecutor().can_continue_warm_session(session, agent_execution, max_iterations=3)
+    assert agent_execution.status == "ITERATION_LIMIT_EXCEEDED"
+    session.commit.assert_called()
+
+
+def test_set_default_params_tools_shares_the_llm():
+    tools = [ThinkingTool(), WriteFileTool(), WriteFileTool()]
+    parsed_config = {"goal": ["goal"], "instruction": [], "model": "gpt-4", "agent_execution_id": 3}
+
+    with patch.object(AgentExecutor, "get_llm_class") as mock_llm_class:
+        tools = AgentExecutor().set_default_params_tools(tools, parsed_config, 2, "key", MagicMock())
+
+    mock_llm_class.return_value.assert_called_once_with(model="gpt-4", api_key="key", temperature=0.3,
+                                                        api_key_pool=None)
+    assert tools[0].llm is mock_llm_class.return_value.return_value
+    assert tools[1].agent_id == 2
+    assert tools[1].resource_manager is tools[2].resource_manager
+
+
+def test_set_default_params_tools_builds_similarity_cached_tool_llms_at_temperature_0():
+    tools = [ThinkingTool(), CodingTool()]
+    parsed_config = {"goal": ["goal"], "instruction": [], "model": "gpt-4", "agent_execution_id": 3}
+    config = {"LLM_RESPONSE_CACHE": "disk", "LLM_RESPONSE_CACHE_SCOPES": "ThinkingTool",
+              "LLM_RESPONSE_CACHE_SEMANTIC": "true"}
+
+    with patch.object(AgentExecutor, "get_llm_class") as mock_llm_class, \
+            patch("superagi.llms.cached_llm.get_config") as mock_get_config, \
+            patch.object(CachedLlm, "get_cache", return_value=MagicMock()):
+        mock_get_config.side_effect = lambda key, default=None: config.get(key, default)
+        tools = AgentExecutor().set_default_params_tools(tools, parsed_config, 2, "key", MagicMock())
+
+    assert [call.kwargs["temperature"] for call in mock_llm_class.return_value.call_args_list] == [0, 0.3]
+    assert tools[0].llm.similarity_threshold == 0.97
+    assert tools[1].llm is mock_llm_class.return_value.return_value
+
+
+@pytest.fixture
+def key_session():
+    engine = create_engine("sqlite://")
+    for model in (Agent, Project, Organisation, Configuration):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Organisation(id=4, name="organisation"), Project(id=3, name="project", organisation_id=4),
+                     Agent(id=2, name="agent", project_id=3),
+                     Configuration(organisation_id=4, key="model_api_key", value=encrypt_data("sk-test"))])
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_get_model_api_key_from_execution_in_one_query(key_session):
+    statements = []
+    event.listen(key_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    with patch.object(ModelApiKeyCache, "_entries", {}):
+        model_api_key = AgentExecutor.get_model_api_key_from_execution(AgentExecution(agent_id=2), key_session)
+
+    assert model_api_key == "sk-test"
+    assert len(statements) == 1
+
+
+def test_get_model_api_key_from_execution_errors(key_session):
+    with pytest.raises(HTTPException) as error:
+        AgentExecutor.get_model_api_key_from_execution(AgentExecution(agent_id=9), key_session)
+    assert error.value.detail == "Agent not found"
+
+    key_session.query(Configuration).delete()
+    with pytest.raises(HTTPException) as error:
+        AgentExecutor.get_model_api_key_from_execution(AgentExecution(agent_id=2), key_session)
+    assert error.value.detail == "Configuration not found"
+
+
+@patch("superagi.jobs.agent_executor.Session")
+def test_execute_next_action_removes_the_session_on_early_return(mock_session):
+    session = mock_session.return_value
+    session.query.return_value.filter.return_value.first.return_value = AgentExecution(
+        id=1, status="RUNNING", created_at=datetime.utcnow() - timedelta(days=2))
+
+    AgentExecutor().execute_next_action(1)
+
+    mock_session.remove.assert_called_once()
+
+
+@patch("superagi.jobs.agent_executor.superagi.worker.execute_agent")
+@patch("superagi.jobs.agent_executor.Session")
+def test_execute_next_action_reads_the_status_before_enqueuing(mock_session, mock_execute_agent):
+    session = mock_session.return_value
+    agent_execution = AgentExecution(id=1, agent_id=2, status="RUNNING", num_of_calls=0, current_step_id=5,
+                                     created_at=datetime.utcnow())
+    session.query.return_value.filter.return_value.first.side_effect = [agent_execution, Agent(id=2)]
+    session.query.return_value.filter.return_value.all.return_value = []
+
+    def pause(execution):
+        execution.status = "PAUSED"
+
+    session.refresh.side_effect = pause
+    with patch("superagi.jobs.agent_executor.AgentConfigCache.get_configuration",
+               return_value={"max_iterations": 10, "LTM_DB": "Pinecone", "tools": [], "name": "agent",
+                             "description": "", "model": "gpt-4", "goal": [], "instruction": []}), \
+            patch.object(AgentExecutor, "get_model_api_key_from_execution", return_value="sk-test"), \
+            patch("superagi.jobs.agent_executor.ApiKeyPool.for_agent", return_value=None), \
+            patch("superagi.jobs.agent_executor.VectorFactory.get_vector_storage"), \
+            patch("superagi.jobs.agent_executor.SuperAgi") as mock_super_agi, \
+            patch("superagi.jobs.agent_executor.AgentWorkflowGraph.get"), \
+            patch("superagi.jobs.agent_executor.AgentExecutionUnitOfWork"), \
+            patch("superagi.jobs.agent_executor.IterationTrace"), \
+            patch.object(AgentExecutor, "get_warm_session_time_slice", return_value=0):
+        mock_super_agi.return_value.execute.return_value = {"result": "PENDING", "retry": False}
+        AgentExecutor().execute_next_action(1)
+
+    session.refresh.assert_called_with(agent_execution)
+    mock_execute_agent.delay.assert_not_called()
+    mock_session.remove.assert_called_once()
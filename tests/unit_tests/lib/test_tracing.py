@@ -0,0 +1,86 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.lib.tracing import IterationTrace, trace_span, summarize_timings, TimingStore
+
+
+def test_trace_span_is_noop_without_an_active_trace():
+    with trace_span("llm"):
+        value = 1
+    assert value == 1
+
+
+def test_trace_span_sums_the_spans_of_a_phase():
+    trace = IterationTrace(1)
+
+    @trace_span("tool")
+    def run_tool():
+        return "done"
+
+    with patch("superagi.lib.tracing.time.perf_counter", side_effect=[0.0, 0.5, 1.5, 1.75]):
+        with trace.activate():
+            with trace_span("llm"):
+                pass
+            assert run_tool() == "done"
+    assert trace.phases == {"llm": 0.5, "tool": 0.25}
+
+    with trace_span("llm"):
+        pass
+    assert trace.phases["llm"] == 0.5
+
+
+def test_trace_span_records_failing_blocks():
+    trace = IterationTrace(1)
+    with trace.activate():
+        with pytest.raises(ValueError):
+            with trace_span("parsing"):
+                raise ValueError("invalid json")
+    assert "parsing" in trace.phases
+
+
+def test_save_appends_the_breakdown_in_milliseconds():
+    trace = IterationTrace(7)
+    trace.add("bootstrap", 0.25)
+    store = MagicMock()
+    with patch("superagi.lib.tracing.get_config", return_value=True):
+        trace.save(store)
+    agent_execution_id, fields = store.add.call_args[0]
+    assert agent_execution_id == 7
+    assert fields["bootstrap"] == 250.0
+    assert fields["total"] >= 0
+
+
+def test_save_ignores_storage_errors():
+    store = MagicMock()
+    store.add.side_effect = ConnectionError("redis is down")
+    with patch("superagi.lib.tracing.get_config", return_value=True):
+        IterationTrace(1).save(store)
+
+
+def test_save_skipped_when_tracing_is_disabled():
+    store = MagicMock()
+    with patch("superagi.lib.tracing.get_config", return_value=False):
+        IterationTrace(1).save(store)
+    store.add.assert_not_called()
+
+
+def test_timing_store_reads_the_stream_of_the_execution():
+    with patch("superagi.lib.tracing.redis.Redis.from_url") as from_url:
+        from_url.return_value.xrange.return_value = [("1-0", {"llm": "12.5", "total": "20"})]
+        store = TimingStore("localhost:6379")
+        assert store.get(3) == [{"llm": 12.5, "total": 20.0}]
+        from_url.return_value.xrange.assert_called_once_with("agent_execution_timings:3")
+
+
+def test_summarize_timings():
+    iterations = [{"llm": float(milliseconds), "tool": 1.0} for milliseconds in range(1, 101)]
+    iterations.append({"bootstrap": 30.0, "llm": 50.5, "tool": 1.0})
+
+    summary = summarize_timings(iterations)
+
+    assert summary["llm"]["count"] == 101
+    assert summary["llm"]["p50"] == 50.5
+    assert summary["llm"]["p95"] == 95.0
+    assert summary["tool"] == {"count": 101, "mean": 1.0, "p50": 1.0, "p95": 1.0}
+    assert summary["bootstrap"]["count"] == 1
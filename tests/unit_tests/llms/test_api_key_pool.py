@@ -0,0 +1,140 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import openai
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from superagi.helper.encyption_helper import encrypt_data
+from superagi.llms.api_key_pool import ApiKeyPool, PooledApiKey, is_key_error
+from superagi.llms.openai import OpenAi
+from superagi.llms.rate_limiter import LlmRateLimitError
+from superagi.models.agent import Agent
+from superagi.models.model_api_key import ModelApiKey
+from superagi.models.project import Project
+
+
+def available(remaining_quota=1.0, quarantined=False):
+    return {"quarantined": quarantined, "remaining_quota": remaining_quota, "usage": {}}
+
+
+@pytest.fixture
+def pool():
+    pool = ApiKeyPool([PooledApiKey(None, "model_api_key", "sk-default", None, 1),
+                       PooledApiKey(1, "gpt-4 key", "sk-gpt-4", ["gpt-4"], 3)])
+    with patch.object(ApiKeyPool, "_db", MagicMock()):
+        yield pool
+
+
+def test_is_key_error():
+    assert is_key_error(openai.error.AuthenticationError("Incorrect API key", http_status=401))
+    assert is_key_error(LlmRateLimitError("quota", code="insufficient_quota"))
+    assert not is_key_error(LlmRateLimitError("rate limited", 1))
+    assert not is_key_error(ValueError("bad request"))
+
+
+def test_select_respects_the_allowed_models(pool):
+    assert pool.select("gpt-3.5-turbo").name == "model_api_key"
+    assert pool.select("gpt-4", excluded=["sk-default", "sk-gpt-4"]) is None
+
+
+@patch("superagi.llms.api_key_pool.random.choices", side_effect=lambda keys, weights: [keys[-1]])
+def test_select_weights_the_keys_by_remaining_quota(mock_choices, pool):
+    with patch.object(pool, "get_key_states", return_value=[available(0.5), available(0.2)]):
+        pool.select("gpt-4")
+    keys, weights = mock_choices.call_args.args[0], mock_choices.call_args.kwargs["weights"]
+    assert [key.name for key in keys] == ["model_api_key", "gpt-4 key"]
+    assert weights == pytest.approx([0.5, 0.6])
+
+    with patch.object(pool, "get_key_states", return_value=[available(), available(quarantined=True)]):
+        assert pool.select("gpt-4").name == "model_api_key"
+
+
+def test_run_moves_to_another_key_on_auth_errors(pool):
+    request = MagicMock(side_effect=[openai.error.AuthenticationError("Incorrect API key", http_status=401),
+                                     {"usage": {"total_tokens": 10}}])
+    with patch.object(pool, "get_key_states", return_value=[available(), available()]), \
+            patch("superagi.llms.api_key_pool.random.choices", side_effect=lambda keys, weights: [keys[-1]]):
+        assert pool.run("gpt-4", request) == {"usage": {"total_tokens": 10}}
+
+    assert [call.args[0] for call in request.call_args_list] == ["sk-gpt-4", "sk-default"]
+    quarantine_key = pool.get_db().set.call_args.args[0]
+    assert quarantine_key.startswith("llm_key_quarantine:") and "sk-gpt-4" not in quarantine_key
+
+
+def test_arun_keeps_redis_calls_off_the_event_loop(pool):
+    redis_threads = []
+
+    def get_key_states(keys):
+        redis_threads.append(threading.get_ident())
+        return [available(), available()]
+
+    pool.get_db().set.side_effect = lambda *args, **kwargs: redis_threads.append(threading.get_ident())
+    loop_threads = []
+
+    async def request(api_key):
+        loop_threads.append(threading.get_ident())
+        if api_key == "sk-gpt-4":
+            raise openai.error.AuthenticationError("Incorrect API key", http_status=401)
+        return {"usage": {"total_tokens": 10}}
+
+    with patch.object(pool, "get_key_states", side_effect=get_key_states), \
+            patch("superagi.llms.api_key_pool.random.choices", side_effect=lambda keys, weights: [keys[-1]]):
+        assert asyncio.run(pool.arun("gpt-4", request)) == {"usage": {"total_tokens": 10}}
+
+    assert len(redis_threads) == 2
+    assert loop_threads[0] not in redis_threads
+
+
+def test_run_raises_other_errors(pool):
+    request = MagicMock(side_effect=ValueError("bad request"))
+    with pytest.raises(ValueError):
+        pool.run("gpt-3.5-turbo", request)
+    request.assert_called_once_with("sk-default")
+    pool.get_db().set.assert_not_called()
+
+
+def test_get_utilization(pool):
+    pool.get_db().pipeline.return_value.execute.return_value = [0, {"requests": "3", "tokens": "120"},
+                                                                1, {"requests": "2", "errors": "2"}]
+    utilization = pool.get_utilization()
+
+    assert utilization[0] == {"id": None, "name": "model_api_key", "value": "...ault", "models": None, "weight": 1,
+                              "quarantined": False, "remaining_quota": 1.0,
+                              "usage": {"requests": 3, "tokens": 120}}
+    assert utilization[1]["quarantined"] is True
+    assert utilization[1]["usage"] == {"requests": 2, "errors": 2}
+
+
+def test_for_agent_reads_the_keys_of_the_organisation():
+    engine = create_engine("sqlite://")
+    for model in (Agent, Project, ModelApiKey):
+        model.__table__.create(engine)
+    session = sessionmaker(bind=engine)()
+    session.add_all([Project(id=3, name="project", organisation_id=4), Agent(id=2, name="agent", project_id=3),
+                     ModelApiKey(organisation_id=4, name="second", value=encrypt_data("sk-second"),
+                                 models="gpt-4, gpt-3.5-turbo", weight=2),
+                     ModelApiKey(organisation_id=5, name="other", value=encrypt_data("sk-other"))])
+    session.commit()
+
+    pool = ApiKeyPool.for_agent(session, 2, "sk-default")
+
+    assert [(key.name, key.value, key.models, key.weight) for key in pool.keys] == [
+        ("model_api_key", "sk-default", None, 1), ("second", "sk-second", ["gpt-4", "gpt-3.5-turbo"], 2)]
+    assert ApiKeyPool.for_agent(session, 9, "sk-default") is None
+
+
+@patch("superagi.llms.openai.openai.ChatCompletion.create")
+def test_chat_completion_uses_the_key_pool(mock_create, pool):
+    response = MagicMock()
+    response.choices[0].message = {"content": "done"}
+    mock_create.return_value = response
+
+    llm = OpenAi(api_key="sk-default", model="gpt-3.5-turbo", api_key_pool=pool)
+    with patch.object(pool, "select", return_value=pool.keys[1]):
+        result = llm.chat_completion([{"role": "user", "content": "hello"}], max_tokens=100)
+
+    assert result["content"] == "done"
+    assert mock_create.call_args.kwargs["api_key"] == "sk-gpt-4"
@@ -0,0 +1,89 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from superagi.llms.async_openai import AsyncLlmClientPool, AsyncOpenAi
+
+
+class FakeOpenAiHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            server.auth_headers.append(self.headers["Authorization"])
+        time.sleep(server.delay)
+        with server.lock:
+            server.in_flight -= 1
+        response = {"choices": [{"index": 0, "message": {"role": "assistant",
+                                                         "content": "echo: " + body["messages"][-1]["content"]}}]}
+        payload = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAiHandler)
+    server.lock = threading.Lock()
+    server.in_flight = 0
+    server.max_in_flight = 0
+    server.auth_headers = []
+    server.delay = 0.1
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def build_llm(server, api_key, **kwargs):
+    llm = AsyncOpenAi(api_key=api_key, model="gpt-4", **kwargs)
+    llm.api_base = f"http://127.0.0.1:{server.server_port}/v1"
+    return llm
+
+
+def test_chat_completion_sync_facade(fake_openai_server):
+    llm = build_llm(fake_openai_server, "sync_key")
+
+    response = llm.chat_completion([{"role": "user", "content": "hello"}], max_tokens=50)
+
+    assert response["content"] == "echo: hello"
+    assert fake_openai_server.auth_headers == ["Bearer sync_key"]
+
+
+def test_concurrent_requests_are_limited_per_key(fake_openai_server):
+    limits = {"LLM_MAX_CONCURRENT_REQUESTS_PER_KEY": 2}
+    llm = build_llm(fake_openai_server, "limited_key")
+
+    async def run_iterations():
+        return await asyncio.gather(*[llm.achat_completion([{"role": "user", "content": str(i)}], max_tokens=50)
+                                      for i in range(6)])
+
+    with patch("superagi.llms.async_openai.get_config", side_effect=lambda key, default=None: limits.get(key, default)):
+        responses = AsyncLlmClientPool.run(run_iterations())
+
+    assert [response["content"] for response in responses] == [f"echo: {i}" for i in range(6)]
+    assert fake_openai_server.max_in_flight == 2
+
+
+def test_chat_completion_timeout(fake_openai_server):
+    fake_openai_server.delay = 0.5
+    llm = build_llm(fake_openai_server, "timeout_key", request_timeout=0.05)
+
+    response = llm.chat_completion([{"role": "user", "content": "hello"}], max_tokens=50)
+
+    assert "error" in response
+    assert "content" not in response
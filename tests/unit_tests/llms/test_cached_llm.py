@@ -0,0 +1,125 @@
+from unittest.mock import MagicMock, Mock, patch
+
+import numpy as np
+import pytest
+
+from superagi.llms.base_llm import BaseLlm
+from superagi.llms.cached_llm import CachedLlm
+from superagi.llms.response_cache import DiskResponseCache
+
+
+@pytest.fixture
+def disk_cache(tmp_path):
+    return DiskResponseCache(ttl=60, max_entries=2, path=str(tmp_path / "llm_cache.sqlite"))
+
+
+@pytest.fixture
+def llm():
+    llm = Mock(spec=BaseLlm)
+    llm.get_model.return_value = "gpt-3.5-turbo"
+    llm.temperature = 0
+    llm.api_key = "test_key"
+    llm.chat_completion.side_effect = lambda messages, max_tokens: {"content": "reply to " + messages[-1]["content"]}
+    return llm
+
+
+def test_exact_match_hit_ignores_current_time(llm, disk_cache):
+    cached_llm = CachedLlm(llm, disk_cache, "ThinkingTool")
+    first = [{"role": "system", "content": "The current time and date is Mon"}, {"role": "user", "content": "hi"}]
+    second = [{"role": "system", "content": "The current time and date is Tue"}, {"role": "user", "content": "hi"}]
+
+    assert cached_llm.chat_completion(first, 100) == {"content": "reply to hi"}
+    assert cached_llm.chat_completion(second, 100) == {"content": "reply to hi", "cached": True}
+    assert llm.chat_completion.call_count == 1
+    assert disk_cache.get_metrics() == {"ThinkingTool": {"hit": 1, "semantic_hit": 0, "miss": 1}}
+
+
+def test_key_depends_on_temperature(llm, disk_cache):
+    cached_llm = CachedLlm(llm, disk_cache, "ThinkingTool")
+    messages = [{"role": "user", "content": "hi"}]
+    key = cached_llm.cache_key(messages)
+    llm.temperature = 0.3
+    assert cached_llm.cache_key(messages) != key
+
+
+def test_disk_cache_evicts_least_recently_used(disk_cache):
+    disk_cache.set("a", "1")
+    disk_cache.set("b", "2")
+    assert disk_cache.get("a") == "1"
+    disk_cache.set("c", "3")
+
+    assert disk_cache.get("b") is None
+    assert disk_cache.get("a") == "1"
+    assert disk_cache.get("c") == "3"
+
+
+def test_disk_cache_expires_entries(disk_cache):
+    with patch("superagi.llms.response_cache.time.time", return_value=1000):
+        disk_cache.set("a", "1")
+    with patch("superagi.llms.response_cache.time.time", return_value=1061):
+        assert disk_cache.get("a") is None
+
+
+@patch("superagi.llms.cached_llm.TokenCounter.count_text_tokens", return_value=10)
+def test_similarity_mode_reuses_close_prompts(mock_count_text_tokens, llm, disk_cache):
+    cached_llm = CachedLlm(llm, disk_cache, "ThinkingTool", similarity_threshold=0.95)
+    cached_llm.embedding_model = MagicMock()
+    cached_llm.embedding_model.get_embedding.side_effect = [[1.0, 0.0], [0.99, 0.05], [0.0, 1.0]]
+
+    cached_llm.chat_completion([{"role": "user", "content": "summarise the page"}], 100)
+    similar = cached_llm.chat_completion([{"role": "user", "content": "summarize the page"}], 100)
+    different = cached_llm.chat_completion([{"role": "user", "content": "write a poem"}], 100)
+
+    assert similar == {"content": "reply to summarise the page", "cached": True}
+    assert different == {"content": "reply to write a poem"}
+    assert disk_cache.get_metrics()["ThinkingTool"] == {"hit": 0, "semantic_hit": 1, "miss": 2}
+
+
+@patch("superagi.llms.cached_llm.get_config")
+def test_wrap_only_enabled_scopes(mock_get_config, llm, disk_cache):
+    config = {"LLM_RESPONSE_CACHE_SCOPES": "ThinkingTool, agent"}
+    mock_get_config.side_effect = lambda key, default=None: config.get(key, default)
+
+    with patch.object(CachedLlm, "get_cache", return_value=disk_cache):
+        assert CachedLlm.wrap(llm, "CodingTool") is llm
+        wrapped = CachedLlm.wrap(llm, "agent")
+
+    assert isinstance(wrapped, CachedLlm)
+    assert wrapped.similarity_threshold is None
+    assert wrapped.temperature == 0
+
+
+def test_key_depends_on_max_tokens(llm, disk_cache):
+    cached_llm = CachedLlm(llm, disk_cache, "ThinkingTool")
+    messages = [{"role": "user", "content": "hi"}]
+
+    cached_llm.chat_completion(messages, 100)
+    assert cached_llm.chat_completion(messages, 500) == {"content": "reply to hi"}
+    assert llm.chat_completion.call_count == 2
+
+
+def test_stream_is_delegated_on_a_miss(llm, disk_cache):
+    llm.chat_completion_stream.side_effect = lambda messages, max_tokens: iter(["reply ", "to ", "hi"])
+    cached_llm = CachedLlm(llm, disk_cache, "agent")
+    messages = [{"role": "user", "content": "hi"}]
+
+    assert list(cached_llm.chat_completion_stream(messages, 100)) == ["reply ", "to ", "hi"]
+    assert list(cached_llm.chat_completion_stream(messages, 100)) == ["reply to hi"]
+    llm.chat_completion_stream.assert_called_once_with(messages, 100)
+    llm.chat_completion.assert_not_called()
+
+
+def test_similarity_lookup_only_reads_bucket_candidates(disk_cache):
+    disk_cache.max_entries = 1000
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((200, 64))
+    for index, embedding in enumerate(embeddings):
+        disk_cache.set(f"key{index}", "value")
+        disk_cache.add_embedding("ThinkingTool:gpt-3.5-turbo:100", f"key{index}", embedding.tolist())
+
+    candidates = disk_cache.get_similar_embeddings("ThinkingTool:gpt-3.5-turbo:100",
+                                                   (embeddings[3] + 0.01 * rng.standard_normal(64)).tolist())
+
+    assert "key3" in [key for key, _ in candidates]
+    assert len(candidates) < 50
+    assert np.allclose(dict(candidates)["key3"], embeddings[3])
@@ -0,0 +1,50 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+
+from superagi.llms.openai import OpenAi
+
+STREAMED_DELTAS = ['{"thoughts": {"text": "search"}, ', '"tool": {"name": "Google', 'Search", "args": {"query": ',
+                   '"agi"}}}']
+
+
+class FakeStreamingHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.requests.append(body)
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        chunks = [{"choices": [{"index": 0, "delta": {"role": "assistant"}}]}]
+        chunks += [{"choices": [{"index": 0, "delta": {"content": delta}}]} for delta in STREAMED_DELTAS]
+        chunks.append({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def fake_openai_server():
+    server = HTTPServer(("127.0.0.1", 0), FakeStreamingHandler)
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_completion_stream(fake_openai_server):
+    llm = OpenAi(api_key="test_key", model="gpt-4")
+    llm.api_base = f"http://127.0.0.1:{fake_openai_server.server_port}/v1"
+    deltas = list(llm.chat_completion_stream([{"role": "user", "content": "hello"}], max_tokens=100))
+
+    assert deltas == STREAMED_DELTAS
+    assert fake_openai_server.requests[0]["stream"] is True
+    assert fake_openai_server.requests[0]["max_tokens"] == 100
@@ -0,0 +1,145 @@
+import asyncio
+import threading
+from unittest.mock import MagicMock, patch
+
+import openai
+import pytest
+
+from superagi.llms.rate_limiter import LlmRateLimitError, LlmRateLimiter, get_retry_after
+
+
+@pytest.fixture
+def scripts():
+    acquire_script = MagicMock(return_value=0)
+    release_script = MagicMock(return_value="1")
+    with patch.object(LlmRateLimiter, "_db", MagicMock()), \
+            patch.object(LlmRateLimiter, "_acquire_script", acquire_script), \
+            patch.object(LlmRateLimiter, "_release_script", release_script):
+        yield acquire_script, release_script
+
+
+def rate_limit_error(retry_after="2"):
+    return openai.error.RateLimitError("Rate limit reached", http_status=429, headers={"retry-after": retry_after})
+
+
+def test_get_retry_after():
+    assert get_retry_after(rate_limit_error("7")) == 7
+    assert get_retry_after(openai.error.RateLimitError("Rate limit reached", http_status=429)) == 1.0
+    assert get_retry_after(LlmRateLimitError("rate limited", 3)) == 3
+    assert get_retry_after(openai.error.APIError("server error", http_status=500)) is None
+    assert get_retry_after(ValueError("bad request")) is None
+
+
+def test_for_api_key_is_disabled_by_default():
+    with patch("superagi.llms.rate_limiter.get_config", side_effect=lambda key, default=None: default):
+        assert LlmRateLimiter.for_api_key("sk-test") is None
+
+
+def test_run_retries_after_a_429(scripts):
+    acquire_script, release_script = scripts
+    request = MagicMock(side_effect=[rate_limit_error(), {"usage": {"total_tokens": 40}}])
+    limiter = LlmRateLimiter("sk-test", requests_per_minute=60, tokens_per_minute=1000)
+
+    assert limiter.run(100, request) == {"usage": {"total_tokens": 40}}
+
+    assert acquire_script.call_count == 2
+    assert acquire_script.call_args.kwargs["args"][:3] == [60, 1000, 100]
+    throttled, ok = [call.kwargs["args"] for call in release_script.call_args_list]
+    assert throttled[1:4] == ["throttled", 0, 2000]
+    assert ok[1:3] == ["ok", 60]
+    # the requests of all api keys share no state, the key itself is never stored
+    assert "sk-test" not in acquire_script.call_args.kwargs["keys"][0]
+
+
+def test_run_gives_up_after_the_retries(scripts):
+    request = MagicMock(side_effect=rate_limit_error("0"))
+    limiter = LlmRateLimiter("sk-test", max_retries=2)
+
+    with pytest.raises(openai.error.RateLimitError):
+        limiter.run(100, request)
+    assert request.call_count == 3
+
+
+def test_run_does_not_retry_other_errors(scripts):
+    _, release_script = scripts
+    request = MagicMock(side_effect=ValueError("bad request"))
+
+    with pytest.raises(ValueError):
+        LlmRateLimiter("sk-test").run(100, request)
+    request.assert_called_once()
+    assert release_script.call_args.kwargs["args"][1] == "failed"
+
+
+@patch("superagi.llms.rate_limiter.time.sleep")
+def test_acquire_waits_for_the_buckets(mock_sleep, scripts):
+    acquire_script, _ = scripts
+    acquire_script.side_effect = [500, -1, 0]
+
+    assert LlmRateLimiter("sk-test").acquire(100) is not None
+
+    first_wait, poll_wait = [call.args[0] for call in mock_sleep.call_args_list]
+    assert 0.5 <= first_wait <= 0.55
+    assert 0.1 <= poll_wait <= 0.2
+
+
+@patch("superagi.llms.rate_limiter.time.sleep")
+def test_acquire_gives_up_after_max_wait(mock_sleep, scripts):
+    acquire_script, _ = scripts
+    acquire_script.return_value = 60000
+
+    with pytest.raises(LlmRateLimitError):
+        LlmRateLimiter("sk-test", max_wait=30).acquire(100)
+    mock_sleep.assert_not_called()
+
+
+def test_requests_are_not_limited_without_redis(scripts):
+    acquire_script, release_script = scripts
+    acquire_script.side_effect = ConnectionError("redis is down")
+    request = MagicMock(return_value={"content": "done"})
+
+    assert LlmRateLimiter("sk-test").run(100, request) == {"content": "done"}
+    release_script.assert_not_called()
+
+
+def test_arun_retries_after_a_429(scripts):
+    _, release_script = scripts
+    responses = [LlmRateLimitError("rate limited", 0), {"content": "done"}]
+
+    async def request():
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    assert asyncio.run(LlmRateLimiter("sk-test").arun(100, request)) == {"content": "done"}
+    assert [call.kwargs["args"][1] for call in release_script.call_args_list] == ["throttled", "ok"]
+
+
+def test_arun_keeps_redis_calls_off_the_event_loop(scripts):
+    acquire_script, release_script = scripts
+    script_threads = []
+    acquire_script.side_effect = lambda **kwargs: script_threads.append(threading.get_ident()) or 0
+    release_script.side_effect = lambda **kwargs: script_threads.append(threading.get_ident()) or "1"
+
+    async def request():
+        return {"content": "done", "loop_thread": threading.get_ident()}
+
+    response = asyncio.run(LlmRateLimiter("sk-test").arun(100, request))
+
+    assert len(script_threads) == 2
+    assert response["loop_thread"] not in script_threads
+
+
+@patch("superagi.llms.openai.openai.ChatCompletion.create")
+@patch("superagi.llms.openai.LlmRateLimiter.for_api_key")
+def test_chat_completion_is_rate_limited(mock_for_api_key, mock_create, scripts):
+    from superagi.llms.openai import OpenAi
+    mock_for_api_key.return_value = LlmRateLimiter("sk-test")
+    response = MagicMock()
+    response.choices[0].message = {"content": "done"}
+    mock_create.side_effect = [rate_limit_error("0"), response]
+
+    result = OpenAi(api_key="sk-test").chat_completion([{"role": "user", "content": "hello"}], max_tokens=100)
+
+    assert result["content"] == "done"
+    assert mock_create.call_count == 2
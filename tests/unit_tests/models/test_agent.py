@@ -0,0 +1,9 @@
+from superagi.models.agent import Agent
+
+
+def test_eval_agent_config_parses_json_and_legacy_lists():
+    assert Agent.eval_agent_config("goal", '["goal 1", "goal 2"]') == ["goal 1", "goal 2"]
+    assert Agent.eval_agent_config("constraints", "['it\\'s legacy']") == ["it's legacy"]
+    assert Agent.eval_agent_config("instruction", "[]") == []
+    assert Agent.eval_agent_config("max_iterations", "25") == 25
+    assert Agent.eval_agent_config("tools", "[1, 2]") == [1, 2]
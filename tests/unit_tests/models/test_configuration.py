@@ -0,0 +1,30 @@
+from unittest.mock import patch
+
+from superagi.helper.encyption_helper import encrypt_data
+from superagi.models.configuration import ModelApiKeyCache
+
+
+@patch("superagi.models.configuration.decrypt_data", side_effect=lambda value: "decrypted " + value)
+def test_model_api_key_cache(mock_decrypt):
+    with patch.object(ModelApiKeyCache, "_entries", {}):
+        assert ModelApiKeyCache.get_decrypted_key(1, "a") == "decrypted a"
+        assert ModelApiKeyCache.get_decrypted_key(1, "a") == "decrypted a"
+        assert mock_decrypt.call_count == 1
+
+        # a key changed by another process
+        assert ModelApiKeyCache.get_decrypted_key(1, "b") == "decrypted b"
+        assert mock_decrypt.call_count == 2
+
+        ModelApiKeyCache.invalidate(1)
+        ModelApiKeyCache.get_decrypted_key(1, "b")
+        assert mock_decrypt.call_count == 3
+
+
+@patch("superagi.models.configuration.get_config", return_value=0)
+def test_model_api_key_cache_expires(mock_get_config):
+    encrypted_key = encrypt_data("sk-test")
+    with patch.object(ModelApiKeyCache, "_entries", {}), \
+            patch("superagi.models.configuration.decrypt_data", return_value="sk-test") as mock_decrypt:
+        ModelApiKeyCache.get_decrypted_key(1, encrypted_key)
+        ModelApiKeyCache.get_decrypted_key(1, encrypted_key)
+    assert mock_decrypt.call_count == 2
@@ -0,0 +1,65 @@
+import sqlite3
+from unittest.mock import MagicMock, patch
+
+from superagi.models import db
+from superagi.models.db import MonitoredQueuePool, connect_db, get_pool_stats, init_worker_process
+
+
+@patch("superagi.models.db.create_engine")
+def test_connect_db_configures_the_pool(mock_create_engine):
+    with patch("superagi.models.db.engine", None), patch("superagi.models.db.worker_process", False):
+        connect_db()
+
+    kwargs = mock_create_engine.call_args[1]
+    assert kwargs["poolclass"] is MonitoredQueuePool
+    assert kwargs["pool_size"] == 5
+    assert kwargs["max_overflow"] == 10
+    assert kwargs["pool_recycle"] == 1800
+    assert kwargs["pool_pre_ping"] is True
+
+
+@patch("superagi.models.db.create_engine")
+def test_init_worker_process_uses_the_worker_pool(mock_create_engine):
+    engine = MagicMock()
+    with patch("superagi.models.db.engine", engine), patch("superagi.models.db.worker_process", False):
+        init_worker_process()
+        assert db.engine is None
+        assert connect_db() is mock_create_engine.return_value
+
+    engine.dispose.assert_called_once_with(close=False)
+    assert mock_create_engine.call_args[1]["pool_size"] == 2
+    assert mock_create_engine.call_args[1]["max_overflow"] == 3
+
+
+def test_pool_stats_record_checkouts():
+    pool = MonitoredQueuePool(lambda: sqlite3.connect(":memory:"), pool_size=2, max_overflow=0)
+    engine = MagicMock(pool=pool)
+
+    with patch("superagi.models.db.engine", engine), \
+            patch("superagi.models.db.pool_statistics", db.PoolStatistics()):
+        connection = pool.connect()
+        stats = get_pool_stats()
+        connection.close()
+
+    assert stats["size"] == 2
+    assert stats["checked_out"] == 1
+    assert stats["wait_count"] == 1
+    assert stats["wait_ms_max"] >= 0
+
+
+def test_worker_process_binds_the_task_sessions_to_its_engine():
+    from superagi import worker
+    from superagi.agent import super_agi
+    from superagi.jobs import agent_executor
+
+    worker_engine = MagicMock()
+    with patch("superagi.models.db.engine", MagicMock()), patch("superagi.models.db.worker_process", False), \
+            patch("superagi.models.db.create_engine", return_value=worker_engine), \
+            patch.object(super_agi, "engine"), patch.object(agent_executor, "engine"), \
+            patch.object(super_agi.Session, "configure") as agent_configure, \
+            patch.object(agent_executor.Session, "configure") as executor_configure:
+        worker.init_worker_process()
+        assert super_agi.engine is worker_engine and agent_executor.engine is worker_engine
+
+    agent_configure.assert_called_once_with(bind=worker_engine)
+    executor_configure.assert_called_once_with(bind=worker_engine)
@@ -0,0 +1,136 @@
+import re
+from unittest.mock import MagicMock, Mock, patch
+
+import pytest
+from sqlalchemy import create_engine, event, func, select
+from sqlalchemy.orm import sessionmaker
+
+from superagi.agent.super_agi import SuperAgi
+from superagi.controllers.agent_execution_feed import get_agent_execution_feed, get_execution_tasks
+from superagi.controllers.resources import get_all_resources
+from superagi.controllers.tool_config import get_all_tool_configs
+from superagi.jobs.agent_executor import DBToolkitConfiguration
+from superagi.llms.base_llm import BaseLlm
+from superagi.models.agent import Agent
+from superagi.models.agent_config import AgentConfiguration
+from superagi.models.agent_execution import AgentExecution
+from superagi.models.agent_execution_completed_task import AgentExecutionCompletedTask
+from superagi.models.agent_execution_feed import AgentExecutionFeed
+from superagi.models.agent_execution_permission import AgentExecutionPermission
+from superagi.models.agent_workflow import AgentWorkflow
+from superagi.models.agent_workflow_step import AgentWorkflowStep
+from superagi.models.base_model import DBBaseModel
+from superagi.models.resource import Resource
+from superagi.models.tool import Tool
+from superagi.models.tool_config import ToolConfig
+from superagi.models.toolkit import Toolkit
+
+# tables above this number of rows must be read through an index by the hot queries
+ROW_THRESHOLD = 500
+PARENTS = 50
+ROWS_PER_PARENT = 20
+SCAN_PATTERN = re.compile(r"^SCAN (\w+)")
+
+
+@pytest.fixture
+def seeded_session():
+    """An sqlite database with many agents, executions and toolkits, the queries are checked with its planner."""
+    engine = create_engine("sqlite://")
+    DBBaseModel.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    session.add(Agent(id=1, name="agent", project_id=1, description="agent"))
+    session.add(AgentExecution(id=1, agent_id=1, status="RUNNING"))
+    session.add(Toolkit(id=1, name="toolkit", description="toolkit", organisation_id=1))
+    session.add(AgentWorkflow(id=1, name="workflow", description="workflow"))
+    for parent_id in range(1, PARENTS + 1):
+        session.add_all([AgentConfiguration(agent_id=parent_id, key=f"key {i}", value="1")
+                         for i in range(ROWS_PER_PARENT)] +
+                        [AgentConfiguration(agent_id=parent_id, key="memory_window", value="10")])
+        session.add_all([AgentExecutionFeed(agent_execution_id=parent_id, agent_id=1, role=role,
+                                            feed=f"Tool feed {i}", token_count=2)
+                         for i in range(ROWS_PER_PARENT) for role in ("system", "assistant")])
+        session.add_all([AgentExecutionPermission(agent_execution_id=parent_id, agent_id=1, status="APPROVED",
+                                                  tool_name="tool") for _ in range(ROWS_PER_PARENT)])
+        session.add_all([AgentExecutionCompletedTask(agent_execution_id=parent_id, task="task", response="done")
+                         for _ in range(ROWS_PER_PARENT)])
+        session.add_all([Tool(name=f"tool {i}", toolkit_id=parent_id) for i in range(ROWS_PER_PARENT)])
+        session.add_all([ToolConfig(toolkit_id=parent_id, key=f"key {i}", value="value")
+                         for i in range(ROWS_PER_PARENT)])
+        session.add_all([AgentWorkflowStep(agent_workflow_id=parent_id, unique_id=f"step {i}",
+                                           step_type="TRIGGER" if i == 0 else "NORMAL")
+                         for i in range(ROWS_PER_PARENT)])
+        session.add_all([Resource(name=f"resource {i}", agent_id=parent_id) for i in range(ROWS_PER_PARENT)])
+    session.commit()
+    yield session
+    session.close()
+
+
+def assert_queries_use_indexes(session, run_queries):
+    """Runs the queries and fails if the plan of one of them scans a table above the row threshold."""
+    engine = session.get_bind()
+    statements = []
+
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", record_statement)
+    try:
+        run_queries()
+    finally:
+        event.remove(engine, "before_cursor_execute", record_statement)
+    assert len(statements) > 0
+
+    table_sizes = {table.name: session.execute(select(func.count()).select_from(table)).scalar()
+                   for table in DBBaseModel.metadata.sorted_tables}
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters):
+                match = SCAN_PATTERN.match(row[-1])
+                if match is None:
+                    continue
+                table = re.sub(r"_\d+$", "", match.group(1))
+                assert table_sizes.get(table, ROW_THRESHOLD + 1) <= ROW_THRESHOLD, \
+                    f"{row[-1]} in the plan of: {statement}"
+
+
+def test_agent_queries_use_indexes(seeded_session):
+    llm = Mock(spec=BaseLlm)
+    llm.get_model.return_value = "gpt-4"
+    agent_config = {"agent_execution_id": 1, "agent_id": 1, "memory_window": 10}
+    agent = SuperAgi("test_ai", "test_role", llm, Mock(), [], agent_config)
+
+    def run_queries():
+        agent.fetch_agent_feeds(seeded_session, 1)
+        agent.fetch_evicted_feeds(seeded_session, 5)
+        AgentExecutionFeed.get_last_tool_response(seeded_session, 1, "feed")
+
+    assert_queries_use_indexes(seeded_session, run_queries)
+
+
+def test_executor_queries_use_indexes(seeded_session):
+    def run_queries():
+        Agent.fetch_configuration(seeded_session, 1)
+        AgentWorkflow.fetch_trigger_step_id(seeded_session, 1)
+        DBToolkitConfiguration(session=seeded_session, toolkit_id=1).get_tool_config("key 1")
+        seeded_session.query(Tool).filter(Tool.toolkit_id == 1).all()
+
+    assert_queries_use_indexes(seeded_session, run_queries)
+
+
+def test_controller_queries_use_indexes(seeded_session):
+    def run_queries():
+        with patch("superagi.controllers.agent_execution_feed.db") as mock_db, \
+                patch("superagi.controllers.agent_execution_feed.TaskQueue") as mock_task_queue, \
+                patch("superagi.controllers.resources.db", mock_db), \
+                patch("superagi.controllers.tool_config.db", mock_db):
+            mock_db.session = seeded_session
+            mock_task_queue.return_value.get_snapshot.return_value = MagicMock(pending_tasks=[],
+                                                                               completed_tasks=[])
+            mock_task_queue.return_value.get_archived_tasks.return_value = []
+            get_agent_execution_feed(1, Authorize=None)
+            get_execution_tasks(1, page=1, page_size=5, Authorize=None)
+            get_all_resources(1, Authorize=None)
+            get_all_tool_configs("toolkit", organisation=MagicMock(id=1))
+
+    assert_queries_use_indexes(seeded_session, run_queries)
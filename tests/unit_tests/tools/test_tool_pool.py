@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from superagi.tools.file.write_file import WriteFileTool
+from superagi.tools.tool_pool import ToolClassRegistry, ToolPool
+
+
+@pytest.fixture
+def redis_db():
+    db = MagicMock()
+    with patch.object(ToolPool, "_db", db), patch.object(ToolPool, "_idle", {}):
+        yield db
+
+
+@patch("superagi.tools.tool_pool.importlib.import_module")
+def test_tool_classes_are_resolved_once(mock_import_module):
+    mock_import_module.return_value.WriteFileTool = WriteFileTool
+
+    with patch.object(ToolClassRegistry, "_classes", {}):
+        assert ToolClassRegistry.get_tool_class("superagi.tools.file.write_file", "WriteFileTool") is WriteFileTool
+        assert ToolClassRegistry.get_tool_class("superagi.tools.file.write_file", "WriteFileTool") is WriteFileTool
+
+    mock_import_module.assert_called_once_with("superagi.tools.file.write_file")
+
+
+def test_released_tools_are_reused_for_the_same_version(redis_db):
+    redis_db.mget.return_value = ["2", None]
+    versions = ToolPool.get_toolkit_versions([1, 2])
+    assert versions == {1: "2", 2: "0"}
+
+    tool = WriteFileTool()
+    assert ToolPool.acquire(7, versions[1]) is None
+    ToolPool.release(7, versions[1], tool)
+
+    assert ToolPool.acquire(7, "3") is None
+    assert ToolPool.acquire(7, "2") is tool
+    assert ToolPool.acquire(7, "2") is None
+
+
+def test_release_retires_older_versions(redis_db):
+    ToolPool.release(7, "1", WriteFileTool())
+    ToolPool.release(7, "2", WriteFileTool())
+
+    assert ToolPool.acquire(7, "1") is None
+
+
+def test_tools_are_not_pooled_without_redis(redis_db):
+    redis_db.mget.side_effect = ConnectionError("redis is down")
+    versions = ToolPool.get_toolkit_versions([1])
+    assert versions == {1: None}
+
+    ToolPool.release(7, versions[1], WriteFileTool())
+    assert ToolPool.acquire(7, versions[1]) is None
+
+
+def test_invalidate_toolkit_bumps_the_version(redis_db):
+    ToolPool.invalidate_toolkit(3)
+    redis_db.incr.assert_called_once_with("toolkit_config_version:3")
@@ -0,0 +1,131 @@
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+import pytest
+
+from superagi.vector_store.embedding.cached_embedding import CachedEmbedding
+from superagi.vector_store.embedding.embedding_cache import DiskEmbeddingCache, MemoryEmbeddingCache, \
+    RedisEmbeddingCache
+from superagi.vector_store.embedding.openai import BaseEmbedding
+
+
+class CountingEmbedding(BaseEmbedding):
+    model = "counting"
+
+    def __init__(self):
+        self.texts = []
+
+    def get_embedding(self, text):
+        self.texts.append(text)
+        if text == "fail":
+            return {"error": RuntimeError("api down")}
+        return [float(len(text)), 1.0]
+
+    def get_embeddings(self, texts):
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+
+@pytest.fixture(autouse=True)
+def stats():
+    with patch.object(CachedEmbedding, "_hits", {}), patch.object(CachedEmbedding, "_misses", 0):
+        yield
+
+
+def test_texts_are_embedded_once():
+    model = CountingEmbedding()
+    embedding = CachedEmbedding(model, [MemoryEmbeddingCache(ttl=60, max_bytes=1024)])
+
+    assert embedding.get_embeddings(["a", "bb", "a"]) == [[1.0, 1.0], [2.0, 1.0], [1.0, 1.0]]
+    assert embedding.get_embedding("bb") == [2.0, 1.0]
+    assert embedding.get_embeddings(["bb", "ccc"]) == [[2.0, 1.0], [3.0, 1.0]]
+
+    assert model.texts == ["a", "bb", "ccc"]
+    with patch.object(CachedEmbedding, "get_tiers", return_value=embedding.tiers):
+        stats = CachedEmbedding.get_stats()
+    assert stats["hits"] == {"memory": 2} and stats["misses"] == 3
+    assert stats["hit_ratio"] == pytest.approx(0.4)
+    assert stats["tiers"]["memory"] == {"entries": 3, "bytes": 24}
+
+
+def test_errors_are_not_cached():
+    model = CountingEmbedding()
+    embedding = CachedEmbedding(model, [MemoryEmbeddingCache(ttl=60, max_bytes=1024)])
+
+    assert "error" in embedding.get_embedding("fail")
+    embedding.get_embedding("fail")
+    assert model.texts == ["fail", "fail"]
+
+
+def test_hits_of_a_lower_tier_are_copied_above(tmp_path):
+    disk = DiskEmbeddingCache(ttl=60, max_bytes=1024, path=str(tmp_path))
+    CachedEmbedding(CountingEmbedding(), [disk]).get_embeddings(["abc"])
+
+    model = CountingEmbedding()
+    memory = MemoryEmbeddingCache(ttl=60, max_bytes=1024)
+    assert CachedEmbedding(model, [memory, disk]).get_embedding("abc") == [3.0, 1.0]
+
+    assert model.texts == []
+    assert memory.get_stats()["entries"] == 1
+
+
+def test_memory_cache_evicts_by_size_and_age():
+    cache = MemoryEmbeddingCache(ttl=60, max_bytes=16)
+    cache.set_many({"a": np.zeros(2, dtype=np.float32), "b": np.zeros(2, dtype=np.float32)})
+    cache.get_many(["a"])
+    cache.set_many({"c": np.zeros(2, dtype=np.float32)})
+
+    assert [embedding is not None for embedding in cache.get_many(["a", "b", "c"])] == [True, False, True]
+
+    with patch("superagi.vector_store.embedding.embedding_cache.time.time", return_value=10 ** 10):
+        assert cache.get_many(["a", "c"]) == [None, None]
+    assert cache.get_stats() == {"entries": 0, "bytes": 0}
+
+
+def test_disk_cache_evicts_and_reuses_rows(tmp_path):
+    cache = DiskEmbeddingCache(ttl=60, max_bytes=24, path=str(tmp_path))
+    cache.set_many({"a": np.array([1, 2], dtype=np.float32), "b": np.array([3, 4], dtype=np.float32),
+                    "c": np.array([5, 6], dtype=np.float32)})
+    cache.get_many(["a"])
+    cache.set_many({"d": np.array([7, 8], dtype=np.float32)})
+
+    # the least recently read entry is evicted and its row reused by the next write
+    reopened = DiskEmbeddingCache(ttl=60, max_bytes=24, path=str(tmp_path))
+    a, b, c, d = reopened.get_many(["a", "b", "c", "d"])
+    assert b is None
+    assert a.tolist() == [1, 2] and c.tolist() == [5, 6] and d.tolist() == [7, 8]
+    assert reopened.get_stats() == {"entries": 3, "bytes": 24}
+    reopened.set_many({"e": np.array([9, 10], dtype=np.float32)})
+    assert reopened.get_many(["e"])[0].tolist() == [9, 10]
+    assert reopened.connection.execute("SELECT rows FROM files").fetchone()[0] == 4
+
+    with patch("superagi.vector_store.embedding.embedding_cache.time.time", return_value=10 ** 10):
+        assert reopened.get_many(["a"]) == [None]
+        reopened.set_many({"f": np.array([11, 12], dtype=np.float32)})
+    assert reopened.get_stats() == {"entries": 1, "bytes": 8}
+
+
+def test_redis_cache_reads_float32_vectors():
+    with patch("superagi.vector_store.embedding.embedding_cache.redis.Redis.from_url") as mock_from_url:
+        db = mock_from_url.return_value
+        cache = RedisEmbeddingCache(ttl=60, max_bytes=1024, redis_url="localhost:6379")
+    db.mget.return_value = [np.array([1, 2], dtype=np.float32).tobytes(), None]
+
+    embeddings = cache.get_many(["a", "b"])
+
+    assert embeddings[0].tolist() == [1, 2] and embeddings[1] is None
+    assert list(db.zadd.call_args.args[1]) == ["a"]
+
+    cache.set_many({"a": np.array([1, 2], dtype=np.float32)})
+    args = db.register_script.return_value.call_args.kwargs["args"]
+    assert args[1:] == [60, 1024, "embedding_cache:value:", "a", np.array([1, 2], dtype=np.float32).tobytes()]
+
+
+def test_wrap_is_disabled_without_tiers():
+    model = CountingEmbedding()
+    with patch.object(CachedEmbedding, "get_tiers", return_value=[]):
+        assert CachedEmbedding.wrap(model) is model
+    with patch.object(CachedEmbedding, "get_tiers", return_value=[MagicMock()]):
+        wrapped = CachedEmbedding.wrap(model)
+    assert wrapped.embedding_model is model
+    assert wrapped.model == "counting"
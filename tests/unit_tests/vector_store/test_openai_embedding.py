@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import pinecone
+import pytest
+
+from superagi.vector_store.embedding.openai import EmbeddingCoalescer, OpenAiEmbedding
+from superagi.vector_store.pinecone import Pinecone
+
+
+def embedding_response(texts):
+    # the api may return the embeddings in any order, they carry the index of their text
+    return {"data": [{"index": index, "embedding": [float(len(text))]}
+                     for index, text in reversed(list(enumerate(texts)))]}
+
+
+@pytest.fixture
+def mock_create():
+    with patch("superagi.vector_store.embedding.openai.openai.Embedding.create",
+               side_effect=lambda input, **kwargs: embedding_response(input)) as mock_create, \
+            patch("superagi.vector_store.embedding.openai.TokenCounter.count_many",
+                  side_effect=lambda texts, model: [len(text) for text in texts]), \
+            patch.object(EmbeddingCoalescer, "_coalescers", {}):
+        yield mock_create
+
+
+def test_get_embeddings_splits_by_token_budget(mock_create):
+    embedding = OpenAiEmbedding(api_key="sk-test")
+    embedding.max_batch_tokens = 10
+    embedding.max_batch_size = 3
+
+    embeddings = embedding.get_embeddings(["aaaa", "bbbb", "cc", "d", "e", "ffffffffffffffff", "g"])
+
+    assert embeddings == [[4.0], [4.0], [2.0], [1.0], [1.0], [16.0], [1.0]]
+    assert [call.kwargs["input"] for call in mock_create.call_args_list] == [
+        ["aaaa", "bbbb", "cc"], ["d", "e"], ["ffffffffffffffff"], ["g"]]
+
+
+def test_concurrent_get_embedding_calls_are_coalesced(mock_create):
+    embedding = OpenAiEmbedding(api_key="sk-test")
+    embedding.coalesce_window = 0.2
+    others_waiting = threading.Event()
+
+    def create(input, **kwargs):
+        # the first batch is in flight until the other calls queue up behind it
+        if len(mock_create.call_args_list) == 1:
+            assert others_waiting.wait(5)
+        return embedding_response(input)
+
+    mock_create.side_effect = create
+    results = {}
+
+    def embed(text):
+        results[text] = embedding.get_embedding(text)
+
+    first = threading.Thread(target=embed, args=("x",))
+    first.start()
+    while mock_create.call_count == 0:
+        time.sleep(0.01)
+    threads = [threading.Thread(target=embed, args=("x" * length,)) for length in range(2, 6)]
+    for thread in threads:
+        thread.start()
+    coalescer = next(iter(EmbeddingCoalescer._coalescers.values()))
+    while len(coalescer.pending) < 4:
+        time.sleep(0.01)
+    others_waiting.set()
+    for thread in [first] + threads:
+        thread.join()
+
+    assert results == {"x" * length: [float(length)] for length in range(1, 6)}
+    assert [sorted(call.kwargs["input"]) for call in mock_create.call_args_list] == [
+        ["x"], ["xx", "xxx", "xxxx", "xxxxx"]]
+
+
+def test_lone_get_embedding_call_is_not_delayed(mock_create):
+    embedding = OpenAiEmbedding(api_key="sk-test")
+
+    with patch("superagi.vector_store.embedding.openai.time.sleep") as mock_sleep:
+        assert embedding.get_embedding("abc") == [3.0]
+
+    mock_sleep.assert_not_called()
+    mock_create.assert_called_once()
+
+
+def test_get_embedding_returns_the_error_of_the_batch(mock_create):
+    mock_create.side_effect = RuntimeError("api down")
+    embedding = OpenAiEmbedding(api_key="sk-test")
+    embedding.coalesce_window = 0
+
+    assert isinstance(embedding.get_embedding("text")["error"], RuntimeError)
+
+
+def test_get_embedding_async_is_awaited(mock_create):
+    async def acreate(input, **kwargs):
+        return embedding_response(input)
+
+    with patch("superagi.vector_store.embedding.openai.openai.Embedding.acreate", side_effect=acreate) as mock_acreate:
+        embedding = OpenAiEmbedding(api_key="sk-test")
+        assert asyncio.run(embedding.get_embedding_async("abc")) == [3.0]
+        assert mock_acreate.call_args.kwargs["api_key"] == "sk-test"
+    mock_create.assert_not_called()
+
+
+def test_pinecone_add_texts_embeds_in_one_request(mock_create):
+    index = MagicMock(spec=pinecone.index.Index)
+    store = Pinecone(index, OpenAiEmbedding(api_key="sk-test"), "text")
+
+    ids = store.add_texts(["first", "second text"], ids=["1", "2"])
+
+    assert ids == ["1", "2"]
+    mock_create.assert_called_once()
+    vectors = index.upsert.call_args.args[0]
+    assert vectors == [("1", [5.0], {"text": "first"}), ("2", [11.0], {"text": "second text"})]